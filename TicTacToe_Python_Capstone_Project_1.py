@@ -30,18 +30,31 @@ import sys
 import json
 import random
 import time
+import threading
+import atexit
 import traceback
-import inspect
 import pygame
+from array import array
 from typing import Optional, Dict, Tuple
-from collections import deque
-from game_utils import has_unsaved_shape_changes
+from game_utils import has_unsaved_shape_changes, make_minimax, move_order, symmetry_permutations, canonical_position, permute_bits
+
+# Optional faster JSON backend for settings I/O; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # -------------------------
 # Basic setup
 # -------------------------
 VERSION = "1.0"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Process-wide facts, resolved once at import. SDL_VIDEODRIVER must therefore
+# be set before this module is imported (as headless tests already do).
+IS_FROZEN = bool(getattr(sys, 'frozen', False))
+# PyInstaller places files in _MEIPASS (onefile) or next to the exe (onedir)
+RESOURCE_BASE = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable)) if IS_FROZEN else BASE_DIR
+IS_HEADLESS = os.environ.get('SDL_VIDEODRIVER', '').lower() == 'dummy'
 
 # -------------------------
 # Game messages (varied for engagement)
@@ -98,12 +111,7 @@ def resource_path(*parts):
     """Get file path that works in both source and PyInstaller exe.
     Usage: resource_path('assets', 'sounds')
     """
-    if getattr(sys, 'frozen', False):
-        # PyInstaller places files in _MEIPASS (onefile) or next to the exe (onedir)
-        base = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
-    else:
-        base = BASE_DIR
-    return os.path.join(base, *parts)
+    return os.path.join(RESOURCE_BASE, *parts)
 
 
 # --- Default configuration and globals ---
@@ -127,6 +135,11 @@ DEFAULT_TEXT_COLOR = (255, 255, 255)
 DEFAULT_LINE_COLOR = (200, 200, 200)
 DEFAULT_EFFECT_VOLUME = 1.0
 DEFAULT_MUSIC_VOLUME = 1.0
+# Mixer buffer in samples (used by _ensure_mixer). SDL's 512 underruns (crackles)
+# on some Linux/PipeWire setups; 1024 adds ~11 ms of latency, which nobody notices
+# on a click sound. Overridable via "audio_buffer" in settings.json (e.g. 512 on
+# Windows, 2048 on Linux).
+DEFAULT_AUDIO_BUFFER = 1024
 DEFAULT_X_SHAPE = "X"
 DEFAULT_O_SHAPE = "O"
 SHAPE_OPTIONS = ["X", "O", "Square", "Triangle", "Diamond"]
@@ -154,6 +167,11 @@ TEXT_COLOR = DEFAULT_TEXT_COLOR
 LINE_COLOR = DEFAULT_LINE_COLOR
 EFFECT_VOLUME = DEFAULT_EFFECT_VOLUME
 MUSIC_VOLUME = DEFAULT_MUSIC_VOLUME
+AUDIO_BUFFER = DEFAULT_AUDIO_BUFFER
+# session scores (loaded from settings.json when present)
+x_wins = 0
+o_wins = 0
+draws = 0
 X_SHAPE = DEFAULT_X_SHAPE
 O_SHAPE = DEFAULT_O_SHAPE
 
@@ -195,6 +213,13 @@ THEMES = {
         "line_color": (100, 255, 100)
     }
 }
+# Frozen view of THEMES for the settings screen, which reads every preset on
+# every redraw: one (name, x, o, bg, text, line) tuple per theme, looked up by
+# index. THEMES stays the editable/public mapping.
+_THEMES = tuple(
+    (name, t["x_color"], t["o_color"], t["bg_color"], t["text_color"], t["line_color"])
+    for name, t in THEMES.items()
+)
 
 # Asset/settings paths
 SOUND_DIR = resource_path('assets', 'sounds')
@@ -209,10 +234,18 @@ settings_collapsed = {
     "text_color": True
 }
 
+# compute_board_layout() results by (WIDTH, HEIGHT, BOARD_ROWS, BOARD_COLS); the
+# key covers every input, so entries never go stale. Callers only read the dict.
+_LAYOUT_CACHE: Dict[tuple, dict] = {}
+
 def compute_board_layout() -> dict:
     """Calculate board layout based on window size and board dimensions.
     Returns SQUARE_SIZE, BOARD_LEFT, BOARD_TOP, CIRCLE_RADIUS, CIRCLE_WIDTH, CROSS_WIDTH.
     """
+    key = (WIDTH, HEIGHT, BOARD_ROWS, BOARD_COLS)
+    layout = _LAYOUT_CACHE.get(key)
+    if layout is not None:
+        return layout
     # Choose square size to fit comfortably within the window while leaving space for UI
     max_board_w = int(WIDTH * 0.72)
     max_board_h = int(HEIGHT * 0.66)
@@ -229,7 +262,7 @@ def compute_board_layout() -> dict:
     circle_radius = max(10, square // 3)
     circle_width = max(3, square // 12)
     cross_width = max(4, square // 10)
-    return {
+    layout = _LAYOUT_CACHE[key] = {
         'SQUARE_SIZE': square,
         'BOARD_LEFT': left,
         'BOARD_TOP': top,
@@ -237,6 +270,7 @@ def compute_board_layout() -> dict:
         'CIRCLE_WIDTH': circle_width,
         'CROSS_WIDTH': cross_width,
     }
+    return layout
 
 
 # Initialize pygame font module early so FONT_* are available for debug rendering.
@@ -298,7 +332,7 @@ def set_display_mode(w: int, h: int, full: bool = False, force_use_scaled: Optio
     # and use a logical surface so tests can import safely.
 
     try:
-        if os.environ.get('SDL_VIDEODRIVER', '').lower() == 'dummy':
+        if IS_HEADLESS:
             try:
                 logical_surf = pygame.Surface((int(w), int(h)))
                 physical_display = None
@@ -346,13 +380,12 @@ def set_display_mode(w: int, h: int, full: bool = False, force_use_scaled: Optio
     # decide flags
     # Avoid attempting real fullscreen flags when running with the dummy video driver
     # (headless test environments) because drivers like 'dummy' don't support them.
-    avoid_real_fullscreen = os.environ.get('SDL_VIDEODRIVER', '').lower() == 'dummy'
-    flags = pygame.FULLSCREEN if full and not avoid_real_fullscreen else pygame.RESIZABLE
+    flags = pygame.FULLSCREEN if full and not IS_HEADLESS else pygame.RESIZABLE
 
     # If running under the dummy driver, avoid any attempt at real fullscreen
     # and always use a logical surface; this guarantees headless tests won't fail
     # on platforms without real display support.
-    if avoid_real_fullscreen and full:
+    if IS_HEADLESS and full:
         try:
             logical_surf = pygame.Surface((int(w), int(h)))
             physical_display = None
@@ -569,19 +602,8 @@ def toggle_fullscreen():
                 pygame.time.delay(50)
             except Exception:
                 pass
-            # Multiple clears to ensure compositor drops old content
-            try:
-                for i in range(3):
-                    ds = pygame.display.get_surface()
-                    if ds is not None:
-                        ds.fill(BG_COLOR)
-                        pygame.display.flip()
-                        try:
-                            pygame.time.delay(16)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+            # Clear so the compositor drops old content
+            blank_display(3)
             try:
                 draw_menu_with_shape_choices(
                     globals().get('X_SHAPE', None),
@@ -621,19 +643,8 @@ def toggle_fullscreen():
                     force_reinit_display()
                 except Exception:
                     pass
-            # Clear the physical display a few times to drop stale content
-            try:
-                ds = pygame.display.get_surface()
-                if ds is not None:
-                    for _ in range(3):
-                        ds.fill(BG_COLOR)
-                        pygame.display.flip()
-                        try:
-                            pygame.time.delay(20)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+            # Clear the physical display to drop stale content
+            blank_display(3)
             try:
                 draw_menu_with_shape_choices(
                     globals().get('X_SHAPE', None),
@@ -683,18 +694,20 @@ VERBOSE_LOGS = False
 # in-memory history of recent calls to force_reinit_display() and log callsites
 # and stack snippets when rapid/repeated calls are observed. This is purely
 # diagnostic and does not change behavior (no cooldown or early-return).
+# The history is a fixed ring of call timestamps, calling code objects and
+# line numbers, so recording a call allocates nothing.
 _REINIT_INSTRUMENT = True
-_REINIT_HISTORY = deque(maxlen=64)
+_REINIT_RING_SIZE = 64
+_REINIT_RING_TS = array('q', [0] * _REINIT_RING_SIZE)
+_REINIT_RING_CALLER = [None] * _REINIT_RING_SIZE
+_REINIT_RING_LINE = array('l', [0] * _REINIT_RING_SIZE)
+_REINIT_RING_IDX = 0
 _REINIT_RAPID_MS = 800
 # Lightweight cooldown: ignore repeated reinit requests within this window (ms).
 # This is enabled now to prevent renderer thrashing. Instrumentation still logs
 # skipped calls when `_REINIT_INSTRUMENT` is True.
 _LAST_REINIT_MS = 0
 _REINIT_COOLDOWN_MS = 800
-# Per-caller last reinit timestamps to debounce repeated calls from the same location
-_LAST_REINIT_MS_BY_CALLER = {}
-# Per-caller last reinit timestamps to debounce repeated calls from the same location
-_LAST_REINIT_MS_BY_CALLER = {}
 # module-level clock for main loops
 clock = pygame.time.Clock()
 
@@ -709,6 +722,30 @@ _BLANK_FLIPS_PRE = 3
 _BLANK_FLIPS_POST = 3
 _BLANK_DELAY_MS = 40
 _ENABLE_RESIZE_TRICK = False  # keep disabled by default; only enable when diagnosing
+# Repeated blank flips (with delays) were needed on older drivers to make the
+# compositor drop stale window contents. Each one costs a full-window fill, a
+# present and a sleep, so by default a single blank flip is used instead.
+_ENABLE_COMPOSITOR_NUDGE = False
+
+
+def blank_display(flips: int = 1):
+    """Clear the real display surface to BG_COLOR and flip it.
+
+    Only when _ENABLE_COMPOSITOR_NUDGE is set is this repeated `flips` times
+    with _BLANK_DELAY_MS between flips.
+    """
+    try:
+        ds = pygame.display.get_surface()
+        if ds is None:
+            return
+        count = max(1, flips) if _ENABLE_COMPOSITOR_NUDGE else 1
+        for i in range(count):
+            ds.fill(BG_COLOR)
+            pygame.display.flip()
+            if i + 1 < count and _BLANK_DELAY_MS > 0:
+                pygame.time.delay(_BLANK_DELAY_MS)
+    except Exception:
+        pass
 
 
 # Logical surface and scaling helper (fallback when pygame.SCALED is not available)
@@ -716,6 +753,60 @@ logical_surf = None
 physical_display = None
 use_scaled = getattr(pygame, 'SCALED', 0) != 0
 
+# Manual-scaling target: a preallocated buffer the logical surface is scaled
+# into and where it lands on the display, rebuilt only when sizes change
+_SCALED_BUFFER = None
+_SCALE_DEST = None
+_SCALE_KEY = None
+# 1 / scale factor of the current target, for mapping display -> logical coords
+_SCALE_INV = 1.0
+# Letterbox strips of the display left uncovered by _SCALE_DEST (empty when the
+# scaled image covers the whole display, e.g. fullscreen 'cover' scaling)
+_SCALE_BANDS = ()
+# Manual scaling uses pygame.transform.scale (SDL_SoftStretch), 2-3x faster
+# than smoothscale at typical window sizes; set True for filtered upscaling
+HQ_UPSCALE = False
+# Snap manual scaling to a whole-number factor (letterboxing the rest) so every
+# logical pixel maps to the same number of display pixels; the scale factor is
+# only fractional when the display is smaller than the logical surface
+PIXEL_PERFECT_SCALE = False
+
+
+def manual_scale_target(phys_w: int, phys_h: int):
+    """Return (buffer, dest_rect) for scaling logical_surf onto the display.
+
+    Fullscreen uses 'cover' scaling (fills the display, may crop); windowed
+    uses 'contain' (letterboxed, never crops); PIXEL_PERFECT_SCALE rounds
+    either down to a whole-number factor. The buffer shares
+    logical_surf's pixel format so scale/smoothscale can write into it directly.
+    """
+    global _SCALED_BUFFER, _SCALE_DEST, _SCALE_KEY, _SCALE_INV, _SCALE_BANDS
+    log_w, log_h = logical_surf.get_size()
+    key = (phys_w, phys_h, log_w, log_h, fullscreen, PIXEL_PERFECT_SCALE, logical_surf.get_bitsize())
+    if key != _SCALE_KEY or _SCALED_BUFFER is None:
+        scale_w = phys_w / log_w
+        scale_h = phys_h / log_h
+        scale = max(scale_w, scale_h) if fullscreen else min(scale_w, scale_h)
+        if PIXEL_PERFECT_SCALE and scale >= 1:
+            scale = int(scale)
+        target_w = max(1, int(log_w * scale))
+        target_h = max(1, int(log_h * scale))
+        _SCALED_BUFFER = pygame.Surface((target_w, target_h), 0, logical_surf)
+        # center the scaled surface on the physical display
+        _SCALE_DEST = pygame.Rect((phys_w - target_w) // 2, (phys_h - target_h) // 2, target_w, target_h)
+        _SCALE_INV = 1.0 / scale
+        # strips around the (clipped) image: top, bottom, left, right
+        c = _SCALE_DEST.clip(pygame.Rect(0, 0, phys_w, phys_h))
+        bands = (
+            pygame.Rect(0, 0, phys_w, c.top),
+            pygame.Rect(0, c.bottom, phys_w, phys_h - c.bottom),
+            pygame.Rect(0, c.top, c.left, c.height),
+            pygame.Rect(c.right, c.top, phys_w - c.right, c.height),
+        )
+        _SCALE_BANDS = tuple(b for b in bands if b.width > 0 and b.height > 0)
+        _SCALE_KEY = key
+    return _SCALED_BUFFER, _SCALE_DEST
+
 # Lightweight status HUD (e.g., "Applying display…") drawn in present()
 _STATUS_MSG = ""
 _STATUS_EXPIRE_MS = 0
@@ -734,303 +825,247 @@ def show_status(msg: str, duration_ms: int = 800):
         _STATUS_EXPIRE_MS = 0
 
 
-def present():
-    """Present the current frame. If SCALED is available pygame handles scaling; otherwise
-    blit the logical surface to the physical display and flip.
-    """
-    try:
-        # decrement input-skip frames (centralized so all loops benefit)
-        # also reference post-reinit counters and cleared flag as module globals
-        global _SKIP_INPUT_FRAMES, _POST_REINIT_FRAMES, _CLEARED_AFTER_REINIT
+# last time (ticks) a throttled present() diagnostic line was printed
+_PRESENT_LAST_LOG_MS = 0
+# whether the previous present() drew the status HUD (its removal needs a full frame)
+_STATUS_DRAWN = False
+
+
+def _present_overlays():
+    """Draw the Ctrl+D info HUD and the transient status HUD onto the logical frame
+    with one Surface.blits() call. Returns the status HUD's rect, or None when it
+    isn't shown."""
+    target = logical_surf if logical_surf is not None else screen
+    if target is None:
+        return None
+    batch = []
+    # optional on-screen debug overlay, top-left
+    if DEBUG_DISPLAY_OVERLAY:
         try:
-            if _SKIP_INPUT_FRAMES > 0:
-                _SKIP_INPUT_FRAMES -= 1
-                # occasional debug print to help diagnose missed clicks
-                if VERBOSE_LOGS:
-                    try:
-                        now = pygame.time.get_ticks()
-                        if getattr(present, '_last_input_skip_dbg_ms', 0) + 500 < now:
-                            print(f"[INPUT-BLOCK] skipping input frames, remaining={_SKIP_INPUT_FRAMES}")
-                            present._last_input_skip_dbg_ms = now
-                    except Exception:
-                        pass
+            # logical size: size of logical_surf or screen when SCALED in use
+            logical_size = (WIDTH, HEIGHT) if logical_surf is not None else target.get_size()
+            physical_size = physical_display.get_size() if physical_display is not None else target.get_size()
+            status_lines = [f"logical={logical_size[0]}x{logical_size[1]}", f"physical={physical_size[0]}x{physical_size[1]}", f"SCALED={bool(use_scaled)}", f"display_ok={bool(display_initialized)}"]
+            info_surf, bg = debug_label(" | ".join(status_lines), 12, 8, 160)
+            batch += ((bg, (8, 8)), (info_surf, (14, 12)))
         except Exception:
             pass
-        # decrement overlay suppression counter when present() runs each frame
+    # transient status HUD (e.g., "Applying display…")
+    status_rect = None
+    try:
+        font = FONT_MED or FONT
+        if _STATUS_MSG and font and (pygame.time.get_ticks() <= _STATUS_EXPIRE_MS or _STATUS_EXPIRE_MS == 0):
+            # text and backing are reused for as long as the message stays up
+            msg_surf = render_cached(_STATUS_MSG, font, (255,255,255))
+            pad_w, pad_h = 24, 14
+            bg = backing(msg_surf.get_width()+pad_w, msg_surf.get_height()+pad_h, (0,0,0,170))
+            x = WIDTH//2 - bg.get_width()//2
+            y = HEIGHT - bg.get_height() - 20
+            batch += ((bg, (x, y)), (msg_surf, (x + pad_w//2, y + pad_h//2)))
+            status_rect = pygame.Rect(x, y, bg.get_width(), bg.get_height())
+    except Exception:
+        pass
+    if batch:
+        try:
+            target.blits(batch, doreturn=False)
+        except Exception:
+            return None
+    return status_rect
+
+
+def _present_scaled(update_rects, status_rect, status_cleared):
+    """SCALED path: pygame scales for us. Update just update_rects (plus the status
+    HUD) when they are small, skip an empty list, otherwise flip the whole frame."""
+    # throttled info for debugging
+    if __debug__ and VERBOSE_LOGS:
+        global _PRESENT_LAST_LOG_MS
+        now = pygame.time.get_ticks()
+        if _PRESENT_LAST_LOG_MS + 1000 < now:
+            print(f"[PRESENT] using SCALED flip logical={WIDTH}x{HEIGHT}")
+            _PRESENT_LAST_LOG_MS = now
+    if update_rects is not None and not DEBUG_DISPLAY_OVERLAY and not status_cleared:
+        if status_rect is not None:
+            update_rects = list(update_rects) + [status_rect]
+        # an empty list means nothing changed: no SDL call at all
+        if not update_rects:
+            return
+        # past about a quarter of the window a single flip is cheaper than
+        # SDL copying the rects one by one
+        if sum(r.w * r.h for r in update_rects) * 4 < WIDTH * HEIGHT:
+            pygame.display.update(update_rects)
+            return
+    pygame.display.flip()
+
+
+def _draw_display_diagnostics(disp, log_w, log_h, phys_w, phys_h):
+    """Size label and mouse crosshair drawn straight onto the display surface, so
+    they show even if logical-to-physical bookkeeping is off on this platform."""
+    dbg, dbg_bg = debug_label(f"logical={log_w}x{log_h} phys={phys_w}x{phys_h}", 8, 6, 255)
+    disp.blits(((dbg_bg, (8, 8)), (dbg, (12, 10))), doreturn=False)
+    # Skip the crosshair for the first few frames after a reinit so the
+    # initial flips are not polluted by overlays.
+    if _POST_REINIT_FRAMES <= 0:
+        pmx, pmy = pygame.mouse.get_pos()
+        # bright red crosshair
+        pygame.draw.line(disp, (255,48,48), (pmx-12, pmy), (pmx+12, pmy), 3)
+        pygame.draw.line(disp, (255,48,48), (pmx, pmy-12), (pmx, pmy+12), 3)
+        pygame.draw.circle(disp, (255,200,200), (pmx, pmy), 4)
+
+
+def _post_reinit_nudge():
+    """Extra compositor nudges after the first frames following a reinit; both are
+    opt-in (_ENABLE_COMPOSITOR_NUDGE, _ENABLE_RESIZE_TRICK)."""
+    if _ENABLE_COMPOSITOR_NUDGE:
+        blank_display(_BLANK_FLIPS_POST)
+    # optional resize nudge: re-apply the same mode to force the window
+    # manager/compositor to recompose the window
+    if _ENABLE_RESIZE_TRICK:
         try:
-            global _POST_REINIT_FRAMES
-            if _POST_REINIT_FRAMES > 0:
-                _POST_REINIT_FRAMES -= 1
+            cur = pygame.display.get_surface()
+            if cur is not None:
+                w, h = cur.get_size()
+                pygame.display.set_mode((w, h))
+                pygame.time.delay(30)
+                pygame.display.set_mode((w, h))
         except Exception:
             pass
-        # allow updating the module-level physical_display as a fallback
-        global physical_display
-        # throttled present debug: print branch and surface identities occasionally
-        if VERBOSE_LOGS:
-            try:
-                now = pygame.time.get_ticks()
-                if getattr(present, '_last_debug_ms', 0) + 500 < now:
-                    try:
-                        ds = pygame.display.get_surface()
-                        print(f"[PRESENT-INFO] branch_info use_scaled={use_scaled} display_ok={display_initialized} fullscreen={fullscreen}")
-                        print(f"  ids: screen={id(screen)} logical={id(logical_surf)} physical={id(physical_display)} disp_get={id(ds)}")
-                        try:
-                            print(f"  sizes: WIDTHxHEIGHT={WIDTH}x{HEIGHT} screen_get={(getattr(screen,'get_size',lambda: (None,None))())} logical_get={(logical_surf.get_size() if logical_surf else None)} phys_get={(physical_display.get_size() if physical_display else None)} disp_get={(ds.get_size() if ds else None)}")
-                        except Exception:
-                            pass
-                    except Exception:
-                        pass
-                    present._last_debug_ms = now
-            except Exception:
-                pass
-        # optional on-screen debug overlay
-        if DEBUG_DISPLAY_OVERLAY:
+
+
+def _present_manual():
+    """Manual-scaling path: scale logical_surf onto the display surface and flip.
+    Returns True when a frame was presented."""
+    global _CLEARED_AFTER_REINIT, _PRESENT_LAST_LOG_MS
+    # If we've just reinitialized and haven't yet performed a full-window clear,
+    # blank the window so the OS/compositor discards any old window contents
+    # before we begin blitting scaled frames.
+    if _POST_REINIT_FRAMES > 0 and not _CLEARED_AFTER_REINIT:
+        blank_display(_BLANK_FLIPS_PRE)
+        _CLEARED_AFTER_REINIT = True
+    # Prefer to query the current display surface from pygame each frame and
+    # blit into it. On some drivers the previously-held `physical_display`
+    # object may not be the active surface the compositor uses; using
+    # pygame.display.get_surface() reduces that mismatch.
+    disp_surface = pygame.display.get_surface()
+    if logical_surf is None or disp_surface is None:
+        return False
+    try:
+        phys_w, phys_h = disp_surface.get_size()
+        log_w, log_h = logical_surf.get_size()
+        # aspect-preserving scale (cover when fullscreen, contain when
+        # windowed) into a buffer reused across frames
+        scaled, dest = manual_scale_target(phys_w, phys_h)
+        if HQ_UPSCALE:
+            pygame.transform.smoothscale(logical_surf, dest.size, scaled)
+        else:
+            pygame.transform.scale(logical_surf, dest.size, scaled)
+        x, y = dest.topleft
+        # only the letterbox strips need BG_COLOR; the blit overwrites the
+        # rest, so a full-display fill would just be overdrawn
+        for band in _SCALE_BANDS:
+            disp_surface.fill(BG_COLOR, band)
+        disp_surface.blit(scaled, (x, y))
+        if DIAGNOSTIC_ON_FALLBACK or DEBUG_DISPLAY_OVERLAY:
             try:
-                # logical size: size of logical_surf or screen when SCALED in use
-                logical_size = (WIDTH, HEIGHT) if logical_surf is not None else getattr(screen, 'get_size', lambda: (WIDTH, HEIGHT))()
-                physical_size = physical_display.get_size() if physical_display is not None else getattr(screen, 'get_size', lambda: (WIDTH, HEIGHT))()
-                status_lines = [f"logical={logical_size[0]}x{logical_size[1]}", f"physical={physical_size[0]}x{physical_size[1]}", f"SCALED={bool(use_scaled)}", f"display_ok={bool(display_initialized)}"]
-                info_s = " | ".join(status_lines)
-                info_font = FONT_SMALL
-                info_surf = info_font.render(info_s, True, (255,255,255))
-                bg = pygame.Surface((info_surf.get_width()+12, info_surf.get_height()+8), pygame.SRCALPHA)
-                bg.fill((0,0,0,160))
-                # blit to top-left
-                if logical_surf is not None:
-                    logical_surf.blit(bg, (8, 8))
-                    logical_surf.blit(info_surf, (14, 12))
-                else:
-                    try:
-                        screen.blit(bg, (8,8))
-                        screen.blit(info_surf, (14,12))
-                    except Exception:
-                        pass
+                _draw_display_diagnostics(disp_surface, log_w, log_h, phys_w, phys_h)
             except Exception:
                 pass
-        # transient status HUD (e.g., "Applying display…")
+        # throttled info for debugging the fallback path and mapping issues
+        if __debug__ and VERBOSE_LOGS:
+            now = pygame.time.get_ticks()
+            if _PRESENT_LAST_LOG_MS + 1000 < now:
+                print(f"[PRESENT] manual blit logical={log_w}x{log_h} -> phys={phys_w}x{phys_h} (x={x},y={y})")
+                _PRESENT_LAST_LOG_MS = now
+        pygame.display.flip()
+        # limited to the post-reinit period to avoid delaying normal frames
+        if _POST_REINIT_FRAMES > 0:
+            _post_reinit_nudge()
+        return True
+    except Exception:
+        pass
+    # fallback to an unscaled blit at logical size if anything fails. WIDTH x HEIGHT
+    # is logical_surf's own size, so it is blitted directly rather than copied
+    # through a scale call (and a fresh Surface) every frame.
+    try:
+        scaled = logical_surf
+        if scaled.get_size() != (WIDTH, HEIGHT):
+            scaled = pygame.transform.scale(logical_surf, (WIDTH, HEIGHT))
+        # attempt to blit to whatever surface pygame currently exposes
         try:
-            if _STATUS_MSG and (pygame.time.get_ticks() <= _STATUS_EXPIRE_MS or _STATUS_EXPIRE_MS == 0):
-                txt = _STATUS_MSG
-                font = FONT_MED or FONT
-                if font:
-                    msg_surf = font.render(txt, True, (255,255,255))
-                    pad_w, pad_h = 24, 14
-                    bg = pygame.Surface((msg_surf.get_width()+pad_w, msg_surf.get_height()+pad_h), pygame.SRCALPHA)
-                    bg.fill((0,0,0,170))
-                    target = logical_surf if logical_surf is not None else screen
-                    if target is not None:
-                        x = WIDTH//2 - bg.get_width()//2
-                        y = HEIGHT - bg.get_height() - 20
-                        try:
-                            target.blit(bg, (x, y))
-                            target.blit(msg_surf, (x + pad_w//2, y + pad_h//2))
-                        except Exception:
-                            pass
+            disp_surface.blit(scaled, (0, 0))
         except Exception:
-            pass
+            if physical_display is not None:
+                physical_display.blit(scaled, (0, 0))
+        pygame.display.flip()
+        return True
+    except Exception:
+        return False
+
+
+def present(update_rects=None):
+    """Present the current frame. If SCALED is available pygame handles scaling; otherwise
+    blit the logical surface to the physical display and flip.
+
+    update_rects optionally lists the only logical-surface areas that changed since the
+    last present; the SCALED path then updates just those (plus the status HUD drawn
+    here), and nothing at all for an empty list. It still flips the whole frame when the
+    rects cover a quarter of the window or more, while the debug overlay is on, or right
+    after the status HUD goes away. The manual scaling path skips an empty list too but
+    otherwise always presents the whole frame.
+    """
+    global _SKIP_INPUT_FRAMES, _POST_REINIT_FRAMES, _STATUS_DRAWN
+    try:
+        # decrement input-skip frames (centralized so all loops benefit)
+        if _SKIP_INPUT_FRAMES > 0:
+            _SKIP_INPUT_FRAMES -= 1
+            # occasional debug print to help diagnose missed clicks
+            if __debug__ and VERBOSE_LOGS:
+                now = pygame.time.get_ticks()
+                if getattr(present, '_last_input_skip_dbg_ms', 0) + 500 < now:
+                    print(f"[INPUT-BLOCK] skipping input frames, remaining={_SKIP_INPUT_FRAMES}")
+                    present._last_input_skip_dbg_ms = now
+        # decrement overlay suppression counter when present() runs each frame
+        if _POST_REINIT_FRAMES > 0:
+            _POST_REINIT_FRAMES -= 1
+        # VERBOSE_LOGS prints are guarded with __debug__ so `python -O` (and the
+        # optimize=1 PyInstaller build) compiles them out of the per-frame path.
+        # throttled present debug: print branch and surface identities occasionally
+        if __debug__ and VERBOSE_LOGS:
+            now = pygame.time.get_ticks()
+            if getattr(present, '_last_debug_ms', 0) + 500 < now:
+                ds = pygame.display.get_surface()
+                print(f"[PRESENT-INFO] branch_info use_scaled={use_scaled} display_ok={display_initialized} fullscreen={fullscreen}")
+                print(f"  ids: screen={id(screen)} logical={id(logical_surf)} physical={id(physical_display)} disp_get={id(ds)}")
+                print(f"  sizes: WIDTHxHEIGHT={WIDTH}x{HEIGHT} screen_get={(getattr(screen,'get_size',lambda: (None,None))())} logical_get={(logical_surf.get_size() if logical_surf else None)} phys_get={(physical_display.get_size() if physical_display else None)} disp_get={(ds.get_size() if ds else None)}")
+                present._last_debug_ms = now
+    except Exception:
+        pass
+    try:
+        status_rect = _present_overlays()
+        # the frame after the status HUD disappears must be presented whole so
+        # the area it covered is refreshed
+        status_cleared = _STATUS_DRAWN and status_rect is None
+        _STATUS_DRAWN = status_rect is not None
         # only rely on pygame's SCALED handling if we successfully initialized a real display
         # and not in diagnostic fallback mode. When SCALED+display works we can flip directly.
         if use_scaled and display_initialized and not DIAGNOSTIC_ON_FALLBACK:
-            # throttled info for debugging
-            if VERBOSE_LOGS:
-                try:
-                    now = pygame.time.get_ticks()
-                    if getattr(present, '_last_log_ms', 0) + 1000 < now:
-                        print(f"[PRESENT] using SCALED flip logical={WIDTH}x{HEIGHT}")
-                        present._last_log_ms = now
-                except Exception:
-                    pass
-            pygame.display.flip(); return
-        # If we've just reinitialized and haven't yet performed a full-window clear,
-        # perform multiple blank flips+update to ensure the OS/compositor discards
-        # any old window contents before we begin blitting scaled frames. This
-        # helps on platforms where a single flip isn't reliable.
-        try:
-            if _POST_REINIT_FRAMES > 0 and not _CLEARED_AFTER_REINIT:
-                try:
-                    for _ in range(max(1, _BLANK_FLIPS_PRE)):
-                        ds = pygame.display.get_surface()
-                        if ds is not None:
-                            try:
-                                ds.fill(BG_COLOR)
-                                pygame.display.flip()
-                                try:
-                                    pygame.display.update()
-                                except Exception:
-                                    pass
-                            except Exception:
-                                pass
-                        try:
-                            pygame.time.delay(_BLANK_DELAY_MS)
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-                _CLEARED_AFTER_REINIT = True
-        except Exception:
-            pass
-        # Prefer to query the current display surface from pygame each frame and
-        # blit into it. On some drivers the previously-held `physical_display`
-        # object may not be the active surface the compositor uses; using
-        # pygame.display.get_surface() reduces that mismatch.
-        try:
-            disp_surface = pygame.display.get_surface()
-        except Exception:
-            disp_surface = None
-
-        if logical_surf is not None and disp_surface is not None:
-            try:
-                phys_w, phys_h = disp_surface.get_size()
-                log_w, log_h = logical_surf.get_size()
-                # diagnostic print for mapping issues (throttled by present._last_log_ms)
-                try:
-                    now = pygame.time.get_ticks()
-                    if getattr(present, '_last_log_ms', 0) + 1000 < now:
-                        print(f"[PRESENT-DBG] manual blit sizes logical={log_w}x{log_h} phys={phys_w}x{phys_h}")
-                        present._last_log_ms = now
-                except Exception:
-                    pass
-                # If fullscreen, offer a stretch-to-fit mode that exactly fills the display
-                # (no aspect preservation). This guarantees no black margins. Otherwise
-                # use aspect-preserving scaling (cover/contain based on fullscreen state).
-                # compute aspect-preserving scale
-                scale_w = phys_w / log_w
-                scale_h = phys_h / log_h
-                # When fullscreen, prefer a 'cover' behavior so the image fills the display
-                # (this may crop top/bottom). In windowed mode we use 'contain' to avoid cropping.
-                if fullscreen:
-                    scale = max(scale_w, scale_h)
-                else:
-                    scale = min(scale_w, scale_h)
-                target_w = max(1, int(log_w * scale))
-                target_h = max(1, int(log_h * scale))
-                scaled = pygame.transform.smoothscale(logical_surf, (target_w, target_h))
-                # center the scaled surface on the physical display
-                x = (phys_w - target_w) // 2
-                y = (phys_h - target_h) // 2
-                # fill background (letterbox color = BG_COLOR) on the real
-                # display surface from pygame (disp_surface).
-                try:
-                    disp_surface.fill(BG_COLOR)
-                except Exception:
-                    pass
-                disp_surface.blit(scaled, (x, y))
-                # also try to draw a tiny diagnostic overlay directly to the actual
-                # display surface so it is visible even if logical-to-physical
-                # bookkeeping is inconsistent on this platform.
-                try:
-                    disp_direct = disp_surface
-                    # Only draw diagnostic overlay directly when the display surface
-                    # we're returned is the same object we've been using as
-                    # disp_surface. Avoid drawing to other surfaces which may be
-                    # intermediate or logical surfaces that cause visual duplication.
-                    if disp_direct is not None:
-                        try:
-                            dbg = FONT_SMALL.render(f"logical={log_w}x{log_h} phys={phys_w}x{phys_h}", True, (255,255,255))
-                            dbg_bg = pygame.Surface((dbg.get_width()+8, dbg.get_height()+6))
-                            dbg_bg.fill((0,0,0))
-                            disp_direct.blit(dbg_bg, (8, 8))
-                            disp_direct.blit(dbg, (12, 10))
-                            # draw a diagnostic crosshair at the physical mouse position
-                            try:
-                                # Skip drawing the diagnostic crosshair for the first
-                                # few frames after a reinit so the initial flips are
-                                # not polluted by overlays.
-                                if (DIAGNOSTIC_ON_FALLBACK or DEBUG_DISPLAY_OVERLAY) and _POST_REINIT_FRAMES <= 0:
-                                    pmx, pmy = pygame.mouse.get_pos()
-                                    # bright red crosshair
-                                    pygame.draw.line(disp_direct, (255,48,48), (pmx-12, pmy), (pmx+12, pmy), 3)
-                                    pygame.draw.line(disp_direct, (255,48,48), (pmx, pmy-12), (pmx, pmy+12), 3)
-                                    pygame.draw.circle(disp_direct, (255,200,200), (pmx, pmy), 4)
-                            except Exception:
-                                pass
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-                # throttled info for debugging fallback path
-                try:
-                    now = pygame.time.get_ticks()
-                    if getattr(present, '_last_log_ms', 0) + 1000 < now:
-                        print(f"[PRESENT] manual blit logical={log_w}x{log_h} -> phys={phys_w}x{phys_h} (x={x},y={y})")
-                        present._last_log_ms = now
-                except Exception:
-                    pass
-                pygame.display.flip()
-                # After flipping the drawn content, if we're in the special
-                # post-reinit window, perform a few extra blank flips+update to
-                # nudge the compositor into accepting the new buffer. This is
-                # intentionally limited to the post-reinit period to avoid
-                # delaying normal frame presentation.
-                try:
-                    if _POST_REINIT_FRAMES > 0:
-                        for _ in range(max(1, _BLANK_FLIPS_POST)):
-                            try:
-                                ds2 = pygame.display.get_surface()
-                                if ds2 is not None:
-                                    ds2.fill(BG_COLOR)
-                                    pygame.display.flip()
-                                    try:
-                                        pygame.display.update()
-                                    except Exception:
-                                        pass
-                            except Exception:
-                                pass
-                            try:
-                                pygame.time.delay(_BLANK_DELAY_MS)
-                            except Exception:
-                                pass
-                        # optional resize nudge: toggle set_mode to same size to force
-                        # the window manager/compositor to recompose the window.
-                        try:
-                            if _ENABLE_RESIZE_TRICK:
-                                try:
-                                    cur = pygame.display.get_surface()
-                                    if cur is not None:
-                                        w, h = cur.get_size()
-                                        # re-apply same mode flags briefly
-                                        try:
-                                            pygame.display.set_mode((w, h))
-                                            pygame.time.delay(30)
-                                            pygame.display.set_mode((w, h))
-                                        except Exception:
-                                            pass
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-                return
-            except Exception:
-                # fallback to scaling to logical size if anything fails
-                try:
-                    scaled = pygame.transform.smoothscale(logical_surf, (WIDTH, HEIGHT))
-                    # attempt to blit to whatever surface pygame currently exposes
-                    try:
-                        ds_fb = pygame.display.get_surface()
-                        if ds_fb is not None:
-                            ds_fb.blit(scaled, (0, 0))
-                        else:
-                            if physical_display is not None:
-                                physical_display.blit(scaled, (0, 0))
-                    except Exception:
-                        if physical_display is not None:
-                            physical_display.blit(scaled, (0, 0))
-                    pygame.display.flip()
-                    return
-                except Exception:
-                    pass
-        # final fallback: attempt a flip on whatever surface exists
-        try:
-            pygame.display.flip()
-        except Exception:
-            pass
+            _present_scaled(update_rects, status_rect, status_cleared)
+            return
+        # An empty list means nothing changed, so the last scaled frame is still
+        # what's on screen: skip the scale, blit and flip. Not while the
+        # mouse-following diagnostics are drawn or right after a reinit.
+        if (update_rects is not None and not update_rects and status_rect is None
+                and not status_cleared and _POST_REINIT_FRAMES <= 0
+                and not DEBUG_DISPLAY_OVERLAY and not DIAGNOSTIC_ON_FALLBACK):
+            return
+        if _present_manual():
+            return
     except Exception:
-        try:
-            pygame.display.flip()
-        except Exception:
-            pass
+        pass
+    # final fallback: attempt a flip on whatever surface exists
+    try:
+        pygame.display.flip()
+    except Exception:
+        pass
 
 
 def map_mouse_pos(pos):
@@ -1053,33 +1088,13 @@ def map_mouse_pos(pos):
             pass
         # only map when we have a separate logical surface and a physical display
         if logical_surf is not None and physical_display is not None and not use_scaled:
-            phys_w, phys_h = physical_display.get_size()
+            # same scale and letterbox offset present() uses, cached until the
+            # display or logical size changes
+            dest = manual_scale_target(*physical_display.get_size())[1]
             log_w, log_h = logical_surf.get_size()
-            # small diagnostic print to help debug mapping mismatches
-            try:
-                now = pygame.time.get_ticks()
-                if getattr(map_mouse_pos, '_last_dbg_ms', 0) + 1000 < now:
-                    print(f"[MAP-DBG] mapping pm=({mx},{my}) phys={phys_w}x{phys_h} log={log_w}x{log_h}")
-                    map_mouse_pos._last_dbg_ms = now
-            except Exception:
-                pass
-            # same math as present(): compute scale and letterbox offset
-            scale_w = phys_w / log_w
-            scale_h = phys_h / log_h
-            if fullscreen:
-                scale = max(scale_w, scale_h)
-            else:
-                scale = min(scale_w, scale_h)
-            target_w = max(1, int(log_w * scale))
-            target_h = max(1, int(log_h * scale))
-            offset_x = (phys_w - target_w) // 2
-            offset_y = (phys_h - target_h) // 2
-            # convert physical -> logical
-            lx = int((mx - offset_x) / scale)
-            ly = int((my - offset_y) / scale)
-            # clamp to logical surface bounds
-            lx = max(0, min(log_w - 1, lx))
-            ly = max(0, min(log_h - 1, ly))
+            # convert physical -> logical, clamped to the logical surface bounds
+            lx = max(0, min(log_w - 1, int((mx - dest.x) * _SCALE_INV)))
+            ly = max(0, min(log_h - 1, int((my - dest.y) * _SCALE_INV)))
             return (lx, ly)
     except Exception:
         pass
@@ -1092,11 +1107,10 @@ def force_reinit_display():
     re-initializing the display subsystem and re-calling set_display_mode with the
     current logical size and fullscreen flag.
     """
-    global display_initialized, _LAST_REINIT_MS
+    global display_initialized, _LAST_REINIT_MS, _REINIT_RING_IDX
     # If running in a headless test environment (SDL_VIDEODRIVER=dummy), skip
     # aggressive reinitialization to avoid flaky behavior during automated tests.
     try:
-        env_dummy = os.environ.get('SDL_VIDEODRIVER', '').lower() == 'dummy'
         driver_dummy = False
         try:
             # pygame.display.get_driver() may raise if display not initialized
@@ -1106,78 +1120,51 @@ def force_reinit_display():
                 driver_dummy = False
         except Exception:
             driver_dummy = False
-        if env_dummy or (not pygame.display.get_init()) or driver_dummy:
+        if IS_HEADLESS or (not pygame.display.get_init()) or driver_dummy:
             if _REINIT_INSTRUMENT:
                 print("[REINIT-INSTRUMENT] force_reinit_display no-op under headless/dummy driver or uninitialized display")
             return False
     except Exception:
         pass
     try:
-        # Instrumentation: capture caller and stack snippet for diagnostics
+        # global cooldown: skip if a reinit occurred very recently from any caller
         try:
-            # global cooldown: skip if a reinit occurred very recently from any caller
+            now_ms = int(time.time() * 1000)
+            if _LAST_REINIT_MS and (now_ms - _LAST_REINIT_MS) < _REINIT_COOLDOWN_MS:
+                if _REINIT_INSTRUMENT:
+                    print(f"[REINIT-INSTRUMENT] global cooldown active; skipping reinit (delta={now_ms - _LAST_REINIT_MS}ms)")
+                return False
+            _LAST_REINIT_MS = now_ms
+        except Exception:
+            pass
+        # Instrumentation: record the call in the ring; caller names and stack
+        # snippets are only formatted when verbose logging is on
+        if _REINIT_INSTRUMENT:
             try:
-                now_ms_gc = int(time.time() * 1000)
-                global _LAST_REINIT_MS
-                if _LAST_REINIT_MS and (now_ms_gc - _LAST_REINIT_MS) < _REINIT_COOLDOWN_MS:
-                    if _REINIT_INSTRUMENT:
-                        print(f"[REINIT-INSTRUMENT] global cooldown active; skipping reinit (delta={now_ms_gc - _LAST_REINIT_MS}ms)")
-                    return False
+                frame = sys._getframe(1)
+                caller = frame.f_code
+                idx = _REINIT_RING_IDX % _REINIT_RING_SIZE
+                prev_ts = _REINIT_RING_TS[idx - 1]
+                _REINIT_RING_TS[idx] = now_ms
+                _REINIT_RING_CALLER[idx] = caller
+                _REINIT_RING_LINE[idx] = frame.f_lineno
+                del frame
+                _REINIT_RING_IDX += 1
+                if VERBOSE_LOGS:
+                    print(f"[REINIT-INSTRUMENT] force_reinit_display called by {os.path.basename(caller.co_filename)}:{_REINIT_RING_LINE[idx]} in {caller.co_name}")
+                    if _REINIT_RING_IDX >= 2 and now_ms - prev_ts <= _REINIT_RAPID_MS:
+                        count = min(_REINIT_RING_IDX, _REINIT_RING_SIZE)
+                        print(f"[REINIT-INSTRUMENT] rapid reinit detected: {count} entries (last callers):")
+                        for back in range(min(count, 4) - 1, -1, -1):
+                            j = (idx - back) % _REINIT_RING_SIZE
+                            code = _REINIT_RING_CALLER[j]
+                            print(f"  - {now_ms - _REINIT_RING_TS[j]}ms ago: {os.path.basename(code.co_filename)}:{_REINIT_RING_LINE[j]} in {code.co_name}")
+                        print("  Recent stack (most recent call):")
+                        for line in traceback.format_stack(limit=8)[-6:]:
+                            for l in line.rstrip().splitlines():
+                                print("    "+l)
             except Exception:
                 pass
-            if _REINIT_INSTRUMENT:
-                frm = None
-                try:
-                    frm = inspect.stack()[1]
-                except Exception:
-                    pass
-                caller_line = "<unknown>"
-                if frm is not None:
-                    try:
-                        caller_line = f"{os.path.basename(frm.filename)}:{frm.lineno} in {frm.function}"
-                    except Exception:
-                        pass
-                # print concise one-line caller info for immediate visibility
-                if VERBOSE_LOGS:
-                    try:
-                        print(f"[REINIT-INSTRUMENT] force_reinit_display called by {caller_line}")
-                    except Exception:
-                        pass
-                # per-caller debounce: skip repeated requests from same file:line:function
-                try:
-                    now_ms = int(time.time() * 1000)
-                    caller_key = caller_line
-                    last_for_caller = _LAST_REINIT_MS_BY_CALLER.get(caller_key, 0)
-                    if last_for_caller and (now_ms - last_for_caller) < _REINIT_COOLDOWN_MS:
-                        if _REINIT_INSTRUMENT:
-                            print(f"[REINIT-INSTRUMENT] skipping reinit from same caller due to cooldown ({now_ms - last_for_caller}ms) caller={caller_key}")
-                        return False
-                    # update per-caller and global timestamps
-                    _LAST_REINIT_MS_BY_CALLER[caller_key] = now_ms
-                    _LAST_REINIT_MS = now_ms
-                except Exception:
-                    pass
-                # now record a richer entry for later rapid-call analysis
-                try:
-                    stack = traceback.format_stack(limit=8)
-                    entry = {'ts': now_ms, 'caller': caller_line, 'stack': stack}
-                    _REINIT_HISTORY.append(entry)
-                    if len(_REINIT_HISTORY) >= 2:
-                        last = _REINIT_HISTORY[-2]
-                        if now_ms - last['ts'] <= _REINIT_RAPID_MS:
-                            if VERBOSE_LOGS:
-                                print(f"[REINIT-INSTRUMENT] rapid reinit detected: {len(_REINIT_HISTORY)} entries (last callers):")
-                                for e in list(_REINIT_HISTORY)[-4:]:
-                                    t_rel = (e['ts'] - _REINIT_HISTORY[0]['ts'])
-                                    print(f"  - {t_rel}ms: {e['caller']}")
-                                print("  Recent stack (most recent call):")
-                                for line in _REINIT_HISTORY[-1]['stack'][-6:]:
-                                    for l in line.rstrip().splitlines():
-                                        print("    "+l)
-                except Exception:
-                    pass
-        except Exception:
-            pass
         if VERBOSE_LOGS:
             print("[INFO] force_reinit_display: reinitializing display subsystem...")
         # try graceful re-init first
@@ -1189,11 +1176,12 @@ def force_reinit_display():
             pygame.display.init()
         except Exception:
             pass
-        # small delay to allow driver to settle on some platforms
-        try:
-            pygame.time.delay(60)
-        except Exception:
-            pass
+        # small delay to allow driver to settle, only for the compositor nudge
+        if _ENABLE_COMPOSITOR_NUDGE:
+            try:
+                pygame.time.delay(60)
+            except Exception:
+                pass
         # attempt to set the desired mode again
         try:
             set_display_mode(WIDTH, HEIGHT, full=fullscreen)
@@ -1241,16 +1229,10 @@ def force_reinit_display():
                 # perform an immediate full-window clear+flip to ensure the
                 # compositor/OS discards any previous window contents before
                 # we redraw the logical surface.
-                try:
-                    ds = pygame.display.get_surface()
-                    if ds is not None:
-                        try:
-                            ds.fill(BG_COLOR)
-                            pygame.display.flip()
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
+                blank_display()
+                # that blank is the post-reinit clear, so present() doesn't need to
+                # blank again before the first frame (unless the nudge wants more)
+                _CLEARED_AFTER_REINIT = not _ENABLE_COMPOSITOR_NUDGE
                 # If we appear to be at the main menu (not running any game),
                 # perform a full menu redraw onto the logical surface so the
                 # subsequent present() shows a complete, consistent UI. Do
@@ -1276,37 +1258,27 @@ def force_reinit_display():
                     present()
                 except Exception:
                     pass
-                # perform an additional full clear+flip and short delay after present
-                # give the OS/compositor a blank frame before the game loop resumes.
-                # Fixes transient/stale content on some platforms.
-                try:
-                    ds2 = pygame.display.get_surface()
-                    if ds2 is not None:
-                        try:
-                            ds2.fill(BG_COLOR)
-                            pygame.display.flip()
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
-                try:
-                    pygame.time.delay(40)
-                except Exception:
-                    pass
+                # with the compositor nudge enabled, give the OS/compositor a
+                # blank frame and a short settle before presenting again.
+                # Fixes transient/stale content on some older drivers.
+                if _ENABLE_COMPOSITOR_NUDGE:
+                    blank_display()
+                    try:
+                        pygame.time.delay(_BLANK_DELAY_MS)
+                    except Exception:
+                        pass
                 # clear any events generated during redraw so the caller loop
                 # doesn't process them immediately and cause duplicate drawing
                 try:
                     pygame.event.clear()
                 except Exception:
                     pass
-                try:
-                    pygame.time.delay(40)
-                except Exception:
-                    pass
-                try:
-                    present()
-                except Exception:
-                    pass
+                if _ENABLE_COMPOSITOR_NUDGE:
+                    try:
+                        pygame.time.delay(_BLANK_DELAY_MS)
+                        present()
+                    except Exception:
+                        pass
             except Exception:
                 pass
             return True
@@ -1319,15 +1291,100 @@ def force_reinit_display():
         display_initialized = False
         return False
 
+# -------------------------
+# Bitboards (one bit per cell, index = row * BOARD_COLS + col)
+# -------------------------
+x_bits = 0
+o_bits = 0
+FULL_MASK = 0
+# Winning-line masks for the current board size, in the same order the old
+# row/column/diagonal scans used (rows, columns, "\" diagonals, "/" diagonals).
+# Kept as a tuple of ints on purpose: iterating an array.array('H') re-boxes
+# every element on read and measured ~20% slower in check_win().
+WIN_MASKS: Tuple[int, ...] = ()
+# mask -> list of (row, col) cells along that line, in line order
+MASK_TO_CELLS: Dict[int, list] = {}
+_MASKS_KEY = None
+# Classic 3x3 lines written out in octal (one digit per row, low digit = row 0):
+# rows, columns, "\" diagonal, "/" diagonal; matches build_win_masks() order.
+WIN_MASKS_3X3 = (0o007, 0o070, 0o700, 0o111, 0o222, 0o444, 0o421, 0o124)
+# memoized alpha-beta search for the current geometry (see game_utils.make_minimax)
+_minimax_bits = None
+BOARD_SYMMETRIES: Tuple[Tuple[int, ...], ...] = ()
+# Hard-AI answers for the current geometry, keyed on the canonical (x_bits, o_bits)
+# of the position (see hard_move_key) and holding the answer's cell index in that
+# canonical orientation, so rotated/reflected positions share one entry. Filled by
+# precompute_best_moves() at startup for 3x3 and on demand otherwise.
+BEST_MOVE: Dict[Tuple[int, int], Optional[int]] = {}
+_BEST_MOVE_LIMIT = 200000
+
+def _cells_to_mask(cells):
+    m = 0
+    for r, c in cells:
+        m |= 1 << (r * BOARD_COLS + c)
+    return m
+
+def build_win_masks():
+    """Precompute WIN_MASKS / MASK_TO_CELLS / FULL_MASK for the current board size."""
+    global WIN_MASKS, MASK_TO_CELLS, FULL_MASK, _MASKS_KEY, _minimax_bits, BOARD_SYMMETRIES
+    key = (BOARD_ROWS, BOARD_COLS, WIN_LEN)
+    if key == _MASKS_KEY:
+        return
+    if key == (3, 3, 3):
+        masks = list(WIN_MASKS_3X3)
+    else:
+        masks = []
+        for r in range(BOARD_ROWS):
+            for start_c in range(0, BOARD_COLS - WIN_LEN + 1):
+                masks.append(_cells_to_mask([(r, start_c + i) for i in range(WIN_LEN)]))
+        for c in range(BOARD_COLS):
+            for start_r in range(0, BOARD_ROWS - WIN_LEN + 1):
+                masks.append(_cells_to_mask([(start_r + i, c) for i in range(WIN_LEN)]))
+        for start_r in range(0, BOARD_ROWS - WIN_LEN + 1):
+            for start_c in range(0, BOARD_COLS - WIN_LEN + 1):
+                masks.append(_cells_to_mask([(start_r + i, start_c + i) for i in range(WIN_LEN)]))
+        for start_r in range(0, BOARD_ROWS - WIN_LEN + 1):
+            for start_c in range(WIN_LEN - 1, BOARD_COLS):
+                masks.append(_cells_to_mask([(start_r + i, start_c - i) for i in range(WIN_LEN)]))
+    # every line runs top-to-bottom / left-to-right, so decoding the set bits in
+    # ascending order yields the cells in line order
+    n = BOARD_ROWS * BOARD_COLS
+    mask_to_cells = {m: [divmod(i, BOARD_COLS) for i in range(n) if (m >> i) & 1] for m in masks}
+    WIN_MASKS = tuple(masks)
+    MASK_TO_CELLS = mask_to_cells
+    FULL_MASK = (1 << (BOARD_ROWS * BOARD_COLS)) - 1
+    # search core (and its transposition cache) bound to this board geometry
+    _minimax_bits = make_minimax(WIN_MASKS, FULL_MASK, WIN_LEN, move_order(BOARD_ROWS, BOARD_COLS))
+    # rotations/reflections, used to skip equivalent root moves in ai_move_hard()
+    BOARD_SYMMETRIES = symmetry_permutations(BOARD_ROWS) if BOARD_ROWS == BOARD_COLS else ()
+    BEST_MOVE.clear()
+    _MASKS_KEY = key
+
+def set_cell(row, col, mark):
+    """Set (or clear, with mark=None) a board cell and keep the bitboards in sync."""
+    global x_bits, o_bits
+    bit = 1 << (row * BOARD_COLS + col)
+    x_bits &= ~bit
+    o_bits &= ~bit
+    if mark == "X":
+        x_bits |= bit
+    elif mark == "O":
+        o_bits |= bit
+    board[row][col] = mark
+
 # Game state
 def new_board():
     """Recreate the global board structure to match BOARD_ROWS and BOARD_COLS."""
-    global board
+    global board, x_bits, o_bits
     board = [[None] * BOARD_COLS for _ in range(BOARD_ROWS)]
+    x_bits = 0
+    o_bits = 0
+    build_win_masks()
 
 # initialize board
 new_board()
 game_mode = None  # "PVP", "AI_EASY", "AI_MEDIUM", "AI_HARD"
+AI_MODES = ("AI_EASY", "AI_MEDIUM", "AI_HARD")
 player = "X"
 
 # Move history for undo feature
@@ -1351,80 +1408,122 @@ SOUNDS: Dict[str, Optional[pygame.mixer.Sound]] = {}
 LOADED_SOUNDS: Dict[str, bool] = {}
 bgm_available = False
 
+SOUND_EXTS = ('', '.wav', '.ogg', '.mp3')
+# File names in SOUND_DIR, read with one directory scan instead of stat-ing
+# every candidate extension of every sound; refreshed by init_sounds().
+SOUND_FILES = set()
+
+def scan_sound_dir():
+    global SOUND_FILES
+    try:
+        with os.scandir(SOUND_DIR) as it:
+            SOUND_FILES = {e.name for e in it if e.is_file()}
+    except OSError:
+        SOUND_FILES = set()
+
 def candidates_for(name: str):
     base = os.path.join(SOUND_DIR, name)
-    exts = ['', '.wav', '.ogg', '.mp3']
-    return [base + e for e in exts]
+    return [base + e for e in SOUND_EXTS]
+
+def existing_sound_paths(name: str):
+    """candidates_for(name) restricted to files present in SOUND_FILES."""
+    return [os.path.join(SOUND_DIR, name + e) for e in SOUND_EXTS if name + e in SOUND_FILES]
 
 def safe_load_sound_by_name(name: str) -> Optional[pygame.mixer.Sound]:
-    for path in candidates_for(name):
-        if os.path.exists(path):
-            try:
-                return pygame.mixer.Sound(path)
-            except Exception as e:
-                print(f"Warning loading sound {path}: {e}")
+    for path in existing_sound_paths(name):
+        try:
+            return pygame.mixer.Sound(path)
+        except Exception as e:
+            print(f"Warning loading sound {path}: {e}")
     return None
 
 def verify_sounds_exist(sound_dir, expected_files):
+    """Print an OK/MISSING line per expected sound; returns how many were found."""
     print("\n[INFO] Verifying sound assets...")
+    found = 0
     for filename in expected_files:
-        ok = any(os.path.exists(cand) for cand in candidates_for(filename))
+        ok = bool(existing_sound_paths(filename))
+        found += ok
         status = "OK" if ok else "MISSING"
         print(f"  [{status}] {filename}")
+    return found
+
+def _ensure_mixer():
+    """Open the audio device on first use. An idle SDL mixer still runs its
+    audio thread, so main() leaves it closed until init_sounds() finds
+    something to play. Returns True if the mixer is usable."""
+    if pygame.mixer.get_init():
+        return True
+    try:
+        pygame.mixer.pre_init(44100, -16, 2, AUDIO_BUFFER)
+        pygame.mixer.init()
+    except Exception as e:
+        print(f"[WARN] pygame.mixer.init() failed: {e}; continuing without audio.")
+        return False
+    return bool(pygame.mixer.get_init())
 
 def init_sounds():
     global bgm_available
     expected_files = ["move", "move_ai", "win", "draw", "menu_select", "lose", "bgm"]
-    verify_sounds_exist(SOUND_DIR, expected_files)
+    scan_sound_dir()
+    found = verify_sounds_exist(SOUND_DIR, expected_files)
     # If the mixer isn't initialized we must not attempt to create Sound objects or
     # use pygame.mixer.music — doing so raises 'mixer not initialized'. Skip loading
-    # when mixer isn't available and mark sounds as missing.
-    if not pygame.mixer.get_init():
-        print("[WARN] init_sounds: pygame.mixer not initialized, skipping sound load.")
+    # when there is nothing to load or the mixer can't be opened, and mark sounds
+    # as missing; play_sound() and start_bgm() are then no-ops.
+    if not found or not _ensure_mixer():
+        if not found:
+            print("[INFO] init_sounds: no sound assets found, audio stays off.")
+        else:
+            print("[WARN] init_sounds: pygame.mixer not initialized, skipping sound load.")
         for name in ['move','move_ai','win','draw','menu','lose']:
             SOUNDS[name] = None; LOADED_SOUNDS[name] = False
         bgm_available = False
         return
-    # load each expected sound and record success/failure
-    SOUNDS['move'] = safe_load_sound_by_name("move"); LOADED_SOUNDS['move'] = bool(SOUNDS['move'])
-    SOUNDS['move_ai'] = safe_load_sound_by_name("move_ai") or SOUNDS['move']; LOADED_SOUNDS['move_ai'] = bool(SOUNDS['move_ai'])
-    SOUNDS['win'] = safe_load_sound_by_name("win"); LOADED_SOUNDS['win'] = bool(SOUNDS['win'])
-    SOUNDS['draw'] = safe_load_sound_by_name("draw"); LOADED_SOUNDS['draw'] = bool(SOUNDS['draw'])
-    SOUNDS['menu'] = safe_load_sound_by_name("menu_select"); LOADED_SOUNDS['menu'] = bool(SOUNDS['menu'])
-    SOUNDS['lose'] = safe_load_sound_by_name("lose"); LOADED_SOUNDS['lose'] = bool(SOUNDS['lose'])
+    # Effects are decoded fully into memory, so they load on a background
+    # thread; play_sound() simply no-ops for a key that isn't ready yet.
+    # Effect volume is applied to the playback channel in play_sound(), so the
+    # Sound objects themselves stay at full volume.
+    threading.Thread(target=_load_effect_sounds, name="sound-loader", daemon=True).start()
 
-    # Initial effect volumes
-    for k, s in SOUNDS.items():
-        if s:
-            try:
-                s.set_volume(EFFECT_VOLUME)
-            except Exception:
-                pass
     # bgm
-    # load bgm separately and record availability
+    # load bgm separately and record availability (music.load only opens the
+    # stream, so it stays on the main thread and start_bgm() works right away)
     bgm_available = False
-    for cand in candidates_for("bgm"):
-        if os.path.exists(cand):
-            try:
-                pygame.mixer.music.load(cand)
-                pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                bgm_available = True
-            except Exception as e:
-                print(f"Warning: couldn't load background music: {e}")
-            break
+    for cand in existing_sound_paths("bgm"):
+        try:
+            pygame.mixer.music.load(cand)
+            pygame.mixer.music.set_volume(MUSIC_VOLUME)
+            bgm_available = True
+        except Exception as e:
+            print(f"Warning: couldn't load background music: {e}")
+        break
 
-    # print a concise load summary
-    print("[INFO] Sound load summary:")
-    for k in ['move','move_ai','win','draw','menu','lose']:
-        print(f"  {k}: {'LOADED' if LOADED_SOUNDS.get(k) else 'MISSING'}")
-    print(f"  bgm: {'AVAILABLE' if bgm_available else 'MISSING'}")
+    print(f"[INFO] bgm: {'AVAILABLE' if bgm_available else 'MISSING'}")
+
+def _load_effect_sounds():
+    """Worker for init_sounds(): load each effect and record success/failure.
+    Single-key dict assignments are atomic, so the main thread can read SOUNDS
+    at any time. No summary is printed here: it would interleave with the main
+    thread's startup logs, and init_sounds() already lists the assets found."""
+    SOUNDS['move'] = safe_load_sound_by_name("move"); LOADED_SOUNDS['move'] = bool(SOUNDS['move'])
+    SOUNDS['move_ai'] = safe_load_sound_by_name("move_ai") or SOUNDS['move']; LOADED_SOUNDS['move_ai'] = bool(SOUNDS['move_ai'])
+    SOUNDS['win'] = safe_load_sound_by_name("win"); LOADED_SOUNDS['win'] = bool(SOUNDS['win'])
+    SOUNDS['draw'] = safe_load_sound_by_name("draw"); LOADED_SOUNDS['draw'] = bool(SOUNDS['draw'])
+    SOUNDS['menu'] = safe_load_sound_by_name("menu_select"); LOADED_SOUNDS['menu'] = bool(SOUNDS['menu'])
+    SOUNDS['lose'] = safe_load_sound_by_name("lose"); LOADED_SOUNDS['lose'] = bool(SOUNDS['lose'])
 
 def play_sound(key, rel_volume=1.0):
     snd = SOUNDS.get(key)
     if snd:
         try:
-            snd.set_volume(max(0.0, min(1.0, EFFECT_VOLUME * rel_volume)))
-            snd.play()
+            # set the volume on the channel before playing so EFFECT_VOLUME changes
+            # never need to touch every loaded Sound
+            ch = pygame.mixer.find_channel(True)
+            if ch is None:
+                return
+            ch.set_volume(max(0.0, min(1.0, EFFECT_VOLUME * rel_volume)))
+            ch.play(snd)
         except Exception as e:
             print(f"Sound play error for {key}: {e}")
 
@@ -1432,7 +1531,9 @@ def start_bgm(loop=True):
     try:
         global bgm_available
         if not bgm_available:
-            print("background music was not found.")
+            if not getattr(start_bgm, '_missing_reported', False):
+                print("background music was not found.")
+                start_bgm._missing_reported = True
             return False
         if pygame.mixer.music.get_busy():
             return True
@@ -1443,6 +1544,22 @@ def start_bgm(loop=True):
         print("BGM play error:", e)
         return False
 
+# last music volume handed to SDL, in whole percent; see apply_music_volume()
+_last_music_pct = None
+
+def apply_music_volume():
+    """Push MUSIC_VOLUME to the music stream. Slider drags call this on every
+    motion event, so SDL is only called when the whole-percent value changes."""
+    global _last_music_pct
+    pct = int(MUSIC_VOLUME * 100)
+    if pct == _last_music_pct:
+        return
+    try:
+        pygame.mixer.music.set_volume(MUSIC_VOLUME)
+        _last_music_pct = pct
+    except Exception:
+        pass
+
 def stop_bgm(fade_ms=300):
     try:
         pygame.mixer.music.fadeout(fade_ms)
@@ -1497,7 +1614,7 @@ def how_to_play_screen():
                 color = TEXT_COLOR
                 font = FONT_SMALL
             
-            text_surf = font.render(line, True, color)
+            text_surf = render_cached(line, font, color)
             screen.blit(text_surf, (WIDTH//2 - text_surf.get_width()//2, y))
             y += 26 if line else 10
         
@@ -1525,7 +1642,7 @@ def how_to_play_screen():
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                save_settings()
+                flush_settings()
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -1547,53 +1664,129 @@ def how_to_play_screen():
 # -------------------------
 def load_settings():
     global EFFECT_VOLUME, MUSIC_VOLUME, X_COLOR, O_COLOR, BG_COLOR, TEXT_COLOR, x_wins, o_wins, draws, GAME_SIZE, BOARD_ROWS, BOARD_COLS, WIN_LEN
-    if os.path.exists(SETTINGS_FILE):
-        try:
+    global AUDIO_BUFFER
+    try:
+        if orjson is not None:
+            with open(SETTINGS_FILE, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
             with open(SETTINGS_FILE, "r") as f:
                 data = json.load(f)
-            EFFECT_VOLUME = float(data.get("effect_volume", DEFAULT_EFFECT_VOLUME))
-            MUSIC_VOLUME = float(data.get("music_volume", DEFAULT_MUSIC_VOLUME))
-            X_COLOR = tuple(data.get("x_color", DEFAULT_X_COLOR))
-            O_COLOR = tuple(data.get("o_color", DEFAULT_O_COLOR))
-            # shapes
-            X_SHAPE = data.get("x_shape", DEFAULT_X_SHAPE)
-            O_SHAPE = data.get("o_shape", DEFAULT_O_SHAPE)
-            BG_COLOR = tuple(data.get("bg_color", DEFAULT_BG_COLOR))
-            TEXT_COLOR = tuple(data.get("text_color", DEFAULT_TEXT_COLOR))
-            x_wins = int(data.get("x_wins", 0))
-            o_wins = int(data.get("o_wins", 0))
-            draws = int(data.get("draws", 0))
-            # board size
-            b = int(data.get("board_size", DEFAULT_BOARD_SIZE))
-            if b in (3,4):
-                GAME_SIZE = b
-                BOARD_ROWS = b; BOARD_COLS = b; WIN_LEN = b
-        except Exception as e:
-            print("Warning: couldn't load settings:", e)
+        EFFECT_VOLUME = float(data.get("effect_volume", DEFAULT_EFFECT_VOLUME))
+        MUSIC_VOLUME = float(data.get("music_volume", DEFAULT_MUSIC_VOLUME))
+        AUDIO_BUFFER = int(data.get("audio_buffer", DEFAULT_AUDIO_BUFFER))
+        X_COLOR = tuple(data.get("x_color", DEFAULT_X_COLOR))
+        O_COLOR = tuple(data.get("o_color", DEFAULT_O_COLOR))
+        # shapes
+        X_SHAPE = data.get("x_shape", DEFAULT_X_SHAPE)
+        O_SHAPE = data.get("o_shape", DEFAULT_O_SHAPE)
+        BG_COLOR = tuple(data.get("bg_color", DEFAULT_BG_COLOR))
+        TEXT_COLOR = tuple(data.get("text_color", DEFAULT_TEXT_COLOR))
+        x_wins = int(data.get("x_wins", 0))
+        o_wins = int(data.get("o_wins", 0))
+        draws = int(data.get("draws", 0))
+        # board size
+        b = int(data.get("board_size", DEFAULT_BOARD_SIZE))
+        if b in (3,4):
+            GAME_SIZE = b
+            BOARD_ROWS = b; BOARD_COLS = b; WIN_LEN = b
+    except FileNotFoundError:
+        # first run: keep the defaults
+        pass
+    except Exception as e:
+        print("Warning: couldn't load settings:", e)
+
+# Set when a setting changes in a way that is not saved immediately (slider
+# drags, volume keys); flush_settings() writes once at a natural stopping point.
+_settings_dirty = False
+
+def mark_settings_dirty():
+    global _settings_dirty
+    _settings_dirty = True
+
+def flush_settings():
+    """Write settings only if something changed since the last save."""
+    if _settings_dirty:
+        save_settings()
 
 def save_settings():
+    global _settings_dirty
+    data = {
+        "effect_volume": EFFECT_VOLUME,
+        "music_volume": MUSIC_VOLUME,
+        "audio_buffer": AUDIO_BUFFER,
+        "x_color": X_COLOR,
+        "o_color": O_COLOR,
+        "x_shape": X_SHAPE,
+        "o_shape": O_SHAPE,
+        "bg_color": BG_COLOR,
+        "text_color": TEXT_COLOR,
+        "board_size": GAME_SIZE,
+        "x_wins": x_wins,
+        "o_wins": o_wins,
+        "draws": draws
+    }
+    # write to a sibling temp file and swap it in, so a crash or a full disk
+    # mid-write can't leave a truncated settings.json behind
+    tmp_path = SETTINGS_FILE + ".tmp"
     try:
-        with open(SETTINGS_FILE, "w") as f:
-            json.dump({
-                "effect_volume": EFFECT_VOLUME,
-                "music_volume": MUSIC_VOLUME,
-                "x_color": X_COLOR,
-                "o_color": O_COLOR,
-                "x_shape": X_SHAPE,
-                "o_shape": O_SHAPE,
-                "bg_color": BG_COLOR,
-                "text_color": TEXT_COLOR,
-                "board_size": GAME_SIZE,
-                "x_wins": x_wins,
-                "o_wins": o_wins,
-                "draws": draws
-            }, f, indent=2)
+        if orjson is not None:
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+        os.replace(tmp_path, SETTINGS_FILE)
+        _settings_dirty = False
     except Exception as e:
         print("Warning: couldn't save settings:", e)
 
 # -------------------------
 # Helpers (drawing/logic)
 # -------------------------
+def to_display_format(surf):
+    """Return surf converted to the display's pixel format (keeping per-pixel
+    alpha) so repeated blits skip a per-pixel format conversion. Before a video
+    mode exists (or on failure) surf is returned unchanged."""
+    try:
+        return surf.convert_alpha()
+    except Exception:
+        return surf
+
+# Solid translucent backings for HUD text, keyed on (w, h, rgba); small and
+# cleared when full since only a handful of sizes are live at once.
+_BG_POOL: Dict[tuple, "pygame.Surface"] = {}
+_BG_POOL_MAX = 16
+
+def backing(w, h, rgba):
+    """Return a cached w x h surface filled with rgba. Shared: don't draw on it."""
+    key = (w, h, rgba)
+    bg = _BG_POOL.get(key)
+    if bg is None:
+        if len(_BG_POOL) >= _BG_POOL_MAX:
+            _BG_POOL.clear()
+        bg = pygame.Surface((w, h), pygame.SRCALPHA)
+        bg.fill(rgba)
+        bg = _BG_POOL[key] = to_display_format(bg)
+    return bg
+
+# Full-window translucent black layers used to dim the frame behind dialogs and
+# the "AI Thinking..." box, keyed on (size, alpha) so each is allocated and
+# filled once per window size instead of on every use.
+_DIM_LAYERS: Dict[tuple, "pygame.Surface"] = {}
+
+def dim_layer(alpha):
+    """Return a cached WIDTH x HEIGHT black surface with the given alpha."""
+    key = ((WIDTH, HEIGHT), alpha)
+    layer = _DIM_LAYERS.get(key)
+    if layer is None:
+        if len(_DIM_LAYERS) >= 8:
+            _DIM_LAYERS.clear()
+        layer = _DIM_LAYERS[key] = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        layer.fill((0, 0, 0, alpha))
+        layer = _DIM_LAYERS[key] = to_display_format(layer)
+    return layer
+
 def confirmation_dialog(message, button_yes="Yes", button_no="Cancel"):
     """Display a modal confirmation dialog. Returns True if Yes, False if No/Cancel."""
     dialog_w = 500
@@ -1609,11 +1802,11 @@ def confirmation_dialog(message, button_yes="Yes", button_no="Cancel"):
     no_rect = pygame.Rect(dialog_x + dialog_w // 2 + btn_gap // 2, btn_y, btn_w, btn_h)
     
     pressed_button = None
+
+    overlay = dim_layer(180)
     
     while True:
         # Darken background
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
         screen.blit(overlay, (0, 0))
         
         # Draw dialog box
@@ -1654,7 +1847,7 @@ def confirmation_dialog(message, button_yes="Yes", button_no="Cancel"):
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                save_settings()
+                flush_settings()
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -1679,24 +1872,73 @@ def confirmation_dialog(message, button_yes="Yes", button_no="Cancel"):
         
         clock.tick(60)
 
+# Rendered label cache for render_cached(); menus and the settings screen
+# redraw the same few dozen strings every frame at 60 Hz. Fonts are created
+# once at startup, so id(font) is a stable key.
+_TEXT_CACHE: Dict[tuple, "pygame.Surface"] = {}
+_TEXT_CACHE_MAX = 256
+
+def render_cached(text, font, color):
+    """Return font.render(text, True, color), reusing an earlier surface when possible.
+    The result is shared: callers must not modify it (e.g. set_alpha)."""
+    key = (text, id(font), tuple(color))
+    surf_text = _TEXT_CACHE.get(key)
+    if surf_text is None:
+        surf_text = to_display_format(font.render(text, True, color))
+        if len(_TEXT_CACHE) >= _TEXT_CACHE_MAX:
+            _TEXT_CACHE.clear()
+        _TEXT_CACHE[key] = surf_text
+    return surf_text
+
 def draw_text_center(text, font, color, surface, x, y):
     """Draw text centered at the specified (x, y) position."""
-    surf_text = font.render(text, True, color)
+    surf_text = render_cached(text, font, color)
     rect = surf_text.get_rect(center=(x, y))
     surface.blit(surf_text, rect)
 
+def debug_label(text, pad_w, pad_h, alpha):
+    """(text_surf, backing) for a white diagnostic label on a black backing of the
+    given alpha. Both are reused for as long as the text stays the same."""
+    surf_text = render_cached(text, FONT_SMALL, (255, 255, 255))
+    return surf_text, backing(surf_text.get_width() + pad_w, surf_text.get_height() + pad_h, (0, 0, 0, alpha))
+
+# Pre-rendered static layer: background, grid and the score line. Rebuilt only
+# when anything it depends on (window size, colors, board size or layout,
+# scores) changes.
+_GRID_SURF = None
+_GRID_KEY = None
+
+def _grid_surface():
+    global _GRID_SURF, _GRID_KEY
+    key = (screen.get_size(), BG_COLOR, LINE_COLOR, BOARD_ROWS, BOARD_COLS, BOARD_LEFT, BOARD_TOP, SQUARE_SIZE,
+           x_wins, o_wins, draws, TEXT_COLOR, WIDTH)
+    if _GRID_SURF is None or _GRID_KEY != key:
+        surf = pygame.Surface(key[0])
+        try:
+            surf = surf.convert()
+        except Exception:
+            pass
+        surf.fill(BG_COLOR)
+        # vertical lines
+        for c in range(1, BOARD_COLS):
+            x = BOARD_LEFT + c * SQUARE_SIZE
+            pygame.draw.line(surf, LINE_COLOR, (x, BOARD_TOP), (x, BOARD_TOP + BOARD_ROWS * SQUARE_SIZE), 4)
+        # horizontal lines
+        for r in range(1, BOARD_ROWS):
+            y = BOARD_TOP + r * SQUARE_SIZE
+            pygame.draw.line(surf, LINE_COLOR, (BOARD_LEFT, y), (BOARD_LEFT + BOARD_COLS * SQUARE_SIZE, y), 4)
+        # centered top scoreboard
+        if FONT_MED is not None:
+            txt = f"Player 1 Wins: {x_wins}    Player 2 Wins: {o_wins}    Draws: {draws}"
+            score_surf = FONT_MED.render(txt, True, TEXT_COLOR)
+            surf.blit(score_surf, score_surf.get_rect(center=(WIDTH // 2, 36)))
+        _GRID_SURF = surf
+        _GRID_KEY = key
+    return _GRID_SURF
+
 def draw_lines():
-    """Draw the grid lines for the current board size and layout."""
-    # background fill
-    screen.fill(BG_COLOR)
-    # vertical lines
-    for c in range(1, BOARD_COLS):
-        x = BOARD_LEFT + c * SQUARE_SIZE
-        pygame.draw.line(screen, LINE_COLOR, (x, BOARD_TOP), (x, BOARD_TOP + BOARD_ROWS * SQUARE_SIZE), 4)
-    # horizontal lines
-    for r in range(1, BOARD_ROWS):
-        y = BOARD_TOP + r * SQUARE_SIZE
-        pygame.draw.line(screen, LINE_COLOR, (BOARD_LEFT, y), (BOARD_LEFT + BOARD_COLS * SQUARE_SIZE, y), 4)
+    """Draw the background, grid lines and score line for the current board size and layout."""
+    screen.blit(_grid_surface(), (0, 0))
 
 def reset_board():
     global _SKIP_INPUT_FRAMES, _POST_REINIT_FRAMES, _CLEARED_AFTER_REINIT
@@ -1839,86 +2081,185 @@ def reset_board():
         
         clock.tick(60)
 
-def draw_figures():
-    """Draw all placed figures on the board using the selected shapes for X and O."""
+# Per-cell pixel geometry: CELL_GEOM[r][c] = (cx, cy, x0, y0, x1, y1), the cell
+# center plus its bounds inset by the figure padding. Rebuilt lazily whenever the
+# board size or layout changes, like the cached grid surface.
+CELL_GEOM = []
+_CELL_GEOM_KEY = None
+
+def cell_geometry():
+    global CELL_GEOM, _CELL_GEOM_KEY
+    key = (BOARD_ROWS, BOARD_COLS, BOARD_LEFT, BOARD_TOP, SQUARE_SIZE)
+    if _CELL_GEOM_KEY != key:
+        half = SQUARE_SIZE // 2
+        pad = max(8, SQUARE_SIZE // 10)
+        geom = []
+        for r in range(BOARD_ROWS):
+            cy = BOARD_TOP + r * SQUARE_SIZE + half
+            row = []
+            for c in range(BOARD_COLS):
+                cx = BOARD_LEFT + c * SQUARE_SIZE + half
+                row.append((cx, cy, cx - half + pad, cy - half + pad, cx + half - pad, cy + half - pad))
+            geom.append(row)
+        CELL_GEOM = geom
+        _CELL_GEOM_KEY = key
+    return CELL_GEOM
+
+# Logical pixel -> board column/row tables for click hit-testing; 255 marks
+# pixels outside the board. Rebuilt on the same triggers as CELL_GEOM.
+_PIX_TO_COL = bytearray()
+_PIX_TO_ROW = bytearray()
+_PIX_TO_CELL_KEY = None
+
+def _pixel_axis_table(length, start, cells):
+    table = bytearray(b"\xff" * length)
+    for i in range(cells):
+        lo = max(0, start + i * SQUARE_SIZE)
+        hi = min(length, start + (i + 1) * SQUARE_SIZE)
+        if lo < hi:
+            table[lo:hi] = bytes((i,)) * (hi - lo)
+    return table
+
+def cell_at(mx, my):
+    """Return (row, col) of the board cell under logical (mx, my), or None."""
+    global _PIX_TO_COL, _PIX_TO_ROW, _PIX_TO_CELL_KEY
+    key = (BOARD_ROWS, BOARD_COLS, BOARD_LEFT, BOARD_TOP, SQUARE_SIZE, WIDTH, HEIGHT)
+    if _PIX_TO_CELL_KEY != key:
+        _PIX_TO_COL = _pixel_axis_table(WIDTH, BOARD_LEFT, BOARD_COLS)
+        _PIX_TO_ROW = _pixel_axis_table(HEIGHT, BOARD_TOP, BOARD_ROWS)
+        _PIX_TO_CELL_KEY = key
+    if 0 <= mx < len(_PIX_TO_COL) and 0 <= my < len(_PIX_TO_ROW):
+        col = _PIX_TO_COL[mx]
+        row = _PIX_TO_ROW[my]
+        if col != 255 and row != 255:
+            return row, col
+    return None
+
+# Pre-rendered figure sprites keyed on (shape, color); cleared whenever the
+# square size or stroke widths change.
+_FIGURE_SPRITES: Dict[tuple, "pygame.Surface"] = {}
+_FIGURE_SPRITES_KEY = None
+
+def _figure_sprite(shape, color):
+    """Return a SQUARE_SIZE x SQUARE_SIZE transparent surface with the figure drawn once."""
+    global _FIGURE_SPRITES_KEY
+    size_key = (SQUARE_SIZE, CIRCLE_RADIUS, CIRCLE_WIDTH, CROSS_WIDTH)
+    if _FIGURE_SPRITES_KEY != size_key:
+        _FIGURE_SPRITES.clear()
+        _FIGURE_SPRITES_KEY = size_key
+    sprite = _FIGURE_SPRITES.get((shape, color))
+    if sprite is not None:
+        return sprite
+    sprite = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+    half = SQUARE_SIZE // 2
+    pad = max(8, SQUARE_SIZE // 10)
+    x_center = y_center = half
+    x0 = y0 = pad
+    x1 = y1 = 2 * half - pad  # matches center + half - pad for odd square sizes
+    if shape == "O":
+        pygame.draw.circle(sprite, color, (x_center, y_center), CIRCLE_RADIUS, CIRCLE_WIDTH)
+    elif shape == "X":
+        # X strokes use a slightly larger inset than the other shapes
+        dx = max(12, SQUARE_SIZE // 8) - pad
+        pygame.draw.line(sprite, color, (x0 + dx, y0 + dx), (x1 - dx, y1 - dx), CROSS_WIDTH)
+        pygame.draw.line(sprite, color, (x0 + dx, y1 - dx), (x1 - dx, y0 + dx), CROSS_WIDTH)
+    elif shape == "Square":
+        pygame.draw.rect(sprite, color, pygame.Rect(x0, y0, x1 - x0, y1 - y0), CIRCLE_WIDTH)
+    elif shape == "Triangle":
+        points = [(x_center, y0), (x0, y1), (x1, y1)]
+        pygame.draw.polygon(sprite, color, points, CIRCLE_WIDTH)
+    elif shape == "Diamond":
+        points = [(x_center, y0), (x0, y_center), (x_center, y1), (x1, y_center)]
+        pygame.draw.polygon(sprite, color, points, CIRCLE_WIDTH)
+    try:
+        sprite = sprite.convert_alpha()
+    except Exception:
+        pass
+    _FIGURE_SPRITES[(shape, color)] = sprite
+    return sprite
+
+def draw_figures(surface=None):
+    """Draw all placed figures on the board (onto surface, default the screen) using
+    the selected shapes for X and O."""
+    if surface is None:
+        surface = screen
+    geom = cell_geometry()
+    half = SQUARE_SIZE // 2
+    x_sprite = _figure_sprite(X_SHAPE, X_COLOR)
+    o_sprite = _figure_sprite(O_SHAPE, O_COLOR)
+    # collect every placement and hand them to SDL in one blits() call
+    placements = []
     for r in range(BOARD_ROWS):
+        board_row = board[r]
+        geom_row = geom[r]
         for c in range(BOARD_COLS):
-            x_center = BOARD_LEFT + c * SQUARE_SIZE + SQUARE_SIZE // 2
-            y_center = BOARD_TOP + r * SQUARE_SIZE + SQUARE_SIZE // 2
-            mark = board[r][c]
+            mark = board_row[c]
             if mark is None:
                 continue
-            # choose color and shape for this mark
-            if mark == "O":
-                color = O_COLOR
-                shape = O_SHAPE
-            else:
-                color = X_COLOR
-                shape = X_SHAPE
-
-            # small helper sizes
-            half = SQUARE_SIZE // 2
-            pad = max(8, SQUARE_SIZE // 10)
-
-            if shape == "O":
-                pygame.draw.circle(screen, color, (x_center, y_center), CIRCLE_RADIUS, CIRCLE_WIDTH)
-            elif shape == "X":
-                padx = max(12, SQUARE_SIZE // 8)
-                pygame.draw.line(screen, color,
-                                 (x_center - half + padx, y_center - half + padx),
-                                 (x_center + half - padx, y_center + half - padx),
-                                 CROSS_WIDTH)
-                pygame.draw.line(screen, color,
-                                 (x_center - half + padx, y_center + half - padx),
-                                 (x_center + half - padx, y_center - half + padx),
-                                 CROSS_WIDTH)
-            elif shape == "Square":
-                rect = pygame.Rect(x_center - half + pad, y_center - half + pad, (half - pad)*2, (half - pad)*2)
-                pygame.draw.rect(screen, color, rect, CIRCLE_WIDTH)
-            elif shape == "Triangle":
-                points = [
-                    (x_center, y_center - half + pad),
-                    (x_center - half + pad, y_center + half - pad),
-                    (x_center + half - pad, y_center + half - pad)
-                ]
-                pygame.draw.polygon(screen, color, points, CIRCLE_WIDTH)
-            elif shape == "Diamond":
-                points = [
-                    (x_center, y_center - half + pad),
-                    (x_center - half + pad, y_center),
-                    (x_center, y_center + half - pad),
-                    (x_center + half - pad, y_center)
-                ]
-                pygame.draw.polygon(screen, color, points, CIRCLE_WIDTH)
+            x_center, y_center = geom_row[c][:2]
+            placements.append((o_sprite if mark == "O" else x_sprite, (x_center - half, y_center - half)))
+    if placements:
+        surface.blits(placements, doreturn=False)
+
+# Static layer plus placed figures, rebuilt only after a move, undo or any
+# change to the layer or the figure sprites.
+_BOARD_SURF = None
+_BOARD_KEY = None
+
+def draw_board():
+    """Same result as draw_lines() followed by draw_figures(), from a cached surface."""
+    global _BOARD_SURF, _BOARD_KEY
+    grid = _grid_surface()
+    key = (id(grid), _GRID_KEY, x_bits, o_bits, X_SHAPE, O_SHAPE, X_COLOR, O_COLOR,
+           CIRCLE_RADIUS, CIRCLE_WIDTH, CROSS_WIDTH)
+    if _BOARD_SURF is None or _BOARD_KEY != key:
+        surf = grid.copy()
+        draw_figures(surf)
+        _BOARD_SURF = surf
+        _BOARD_KEY = key
+    screen.blit(_BOARD_SURF, (0, 0))
 
 def animate_piece_placement(row, col, mark):
-    """Animate a piece being placed with a scale-up effect."""
+    """Animate a piece being placed with a scale-up effect.
+
+    The rest of the frame (grid, other pieces, scoreboard) is drawn once; later
+    frames only restore and present the animated cell.
+    """
     animation_frames = 8
+    shape = X_SHAPE if mark == "X" else O_SHAPE
+    color = X_COLOR if mark == "X" else O_COLOR
+    x_center = BOARD_LEFT + col * SQUARE_SIZE + SQUARE_SIZE // 2
+    y_center = BOARD_TOP + row * SQUARE_SIZE + SQUARE_SIZE // 2
+    # thick strokes can reach a little past the cell edge
+    cell_rect = pygame.Rect(BOARD_LEFT + col * SQUARE_SIZE, BOARD_TOP + row * SQUARE_SIZE,
+                            SQUARE_SIZE, SQUARE_SIZE).inflate(CIRCLE_WIDTH, CIRCLE_WIDTH)
+    base = None
     for frame in range(animation_frames):
         scale = (frame + 1) / animation_frames
-        screen.fill(BG_COLOR)
-        draw_lines()
-        
-        # Draw all existing pieces
-        for r in range(BOARD_ROWS):
-            for c in range(BOARD_COLS):
-                if board[r][c] and not (r == row and c == col):
-                    # Draw normal pieces
-                    shape = X_SHAPE if board[r][c] == "X" else O_SHAPE
-                    color = X_COLOR if board[r][c] == "X" else O_COLOR
-                    x_center = BOARD_LEFT + c * SQUARE_SIZE + SQUARE_SIZE // 2
-                    y_center = BOARD_TOP + r * SQUARE_SIZE + SQUARE_SIZE // 2
-                    draw_shape_at(x_center, y_center, shape, color, 1.0)
+        if base is None:
+            # the cached grid layer covers the whole screen, background included
+            draw_lines()
+            
+            # Draw all existing pieces
+            for r in range(BOARD_ROWS):
+                for c in range(BOARD_COLS):
+                    if board[r][c] and not (r == row and c == col):
+                        # Draw normal pieces
+                        shape_rc = X_SHAPE if board[r][c] == "X" else O_SHAPE
+                        color_rc = X_COLOR if board[r][c] == "X" else O_COLOR
+                        draw_shape_at(BOARD_LEFT + c * SQUARE_SIZE + SQUARE_SIZE // 2,
+                                      BOARD_TOP + r * SQUARE_SIZE + SQUARE_SIZE // 2,
+                                      shape_rc, color_rc, 1.0)
+            display_scoreboard()
+            base = screen.copy()
+            update_rects = None
+        else:
+            screen.blit(base, cell_rect, cell_rect)
+            update_rects = [cell_rect]
         
         # Draw animating piece with scale
-        shape = X_SHAPE if mark == "X" else O_SHAPE
-        color = X_COLOR if mark == "X" else O_COLOR
-        x_center = BOARD_LEFT + col * SQUARE_SIZE + SQUARE_SIZE // 2
-        y_center = BOARD_TOP + row * SQUARE_SIZE + SQUARE_SIZE // 2
         draw_shape_at(x_center, y_center, shape, color, scale)
-        
-        display_scoreboard()
-        present()
+        present(update_rects)
         pygame.time.delay(20)
 
 def draw_shape_at(x_center, y_center, shape, color, scale=1.0):
@@ -1955,7 +2296,7 @@ def draw_shape_at(x_center, y_center, shape, color, scale=1.0):
 
 def mark_square(row, col, mark, animate=True):
     global move_history, move_count
-    board[row][col] = mark
+    set_cell(row, col, mark)
     move_history.append((row, col, mark))
     move_count += 1
     
@@ -1971,7 +2312,7 @@ def undo_last_move():
         return False
     
     # In AI modes, undo both AI and player moves (2 moves)
-    if game_mode in ["AI_EASY", "AI_MEDIUM", "AI_HARD"]:
+    if game_mode in AI_MODES:
         moves_to_undo = min(2, len(move_history))
     else:
         moves_to_undo = 1
@@ -1979,7 +2320,7 @@ def undo_last_move():
     for _ in range(moves_to_undo):
         if move_history:
             row, col, mark = move_history.pop()
-            board[row][col] = None
+            set_cell(row, col, None)
             move_count -= 1
             # Restore player turn
             player = mark
@@ -1989,29 +2330,36 @@ def undo_last_move():
     
     return True
 
-def display_undo_feedback():
-    """Display undo feedback message if within the feedback duration."""
+def display_undo_feedback(now=None):
+    """Display undo feedback message if within the feedback duration.
+    now is the frame's get_ticks() value when the caller already has it."""
     global _undo_feedback_time
-    now = pygame.time.get_ticks()
+    if not _undo_feedback_time:
+        return
+    if now is None:
+        now = pygame.time.get_ticks()
     if now - _undo_feedback_time < _UNDO_FEEDBACK_DURATION_MS:
         # Calculate fade-out alpha
         elapsed = now - _undo_feedback_time
         alpha = int(255 * (1 - elapsed / _UNDO_FEEDBACK_DURATION_MS))
         
         # Draw feedback message at top center
-        msg = "Move undone"
-        msg_surf = FONT_MED.render(msg, True, (100, 255, 100))
+        # rendered once and kept on the function: set_alpha() changes the
+        # surface, so it can't come from the shared render_cached() pool
+        msg_surf = getattr(display_undo_feedback, '_msg_surf', None)
+        if msg_surf is None:
+            msg_surf = display_undo_feedback._msg_surf = to_display_format(FONT_MED.render("Move undone", True, (100, 255, 100)))
         msg_surf.set_alpha(alpha)
         msg_rect = msg_surf.get_rect(center=(WIDTH // 2, 30))
         screen.blit(msg_surf, msg_rect)
 
 def draw_tooltip(text, x, y):
-    """Draw a tooltip at the specified position."""
+    """Draw a tooltip at the specified position. Returns the rect it covers (None if nothing drawn)."""
     if not text:
-        return
+        return None
     
     # Render text
-    tooltip_surf = FONT_SMALL.render(text, True, (255, 255, 255))
+    tooltip_surf = render_cached(text, FONT_SMALL, (255, 255, 255))
     padding = 8
     tooltip_w = tooltip_surf.get_width() + padding * 2
     tooltip_h = tooltip_surf.get_height() + padding * 2
@@ -2029,98 +2377,194 @@ def draw_tooltip(text, x, y):
     
     # Draw text
     screen.blit(tooltip_surf, (tooltip_x + padding, tooltip_y + padding))
+    return tooltip_rect
 
 def available_square(row, col):
-    return 0 <= row < BOARD_ROWS and 0 <= col < BOARD_COLS and board[row][col] is None
+    return 0 <= row < BOARD_ROWS and 0 <= col < BOARD_COLS and not ((x_bits | o_bits) >> (row * BOARD_COLS + col)) & 1
 
 def is_board_full():
-    return all(board[r][c] is not None for r in range(BOARD_ROWS) for c in range(BOARD_COLS))
+    return (x_bits | o_bits) == FULL_MASK
 
 def get_winning_line(player_mark):
     """
     Check if the specified player has a winning line.
     Returns a list of (row, col) tuples representing the winning cells, or None.
-    Checks horizontal, vertical, and diagonal lines.
+    Tests the player's bitboard against the precomputed WIN_MASKS.
     """
-    # Horizontal checks
-    for r in range(BOARD_ROWS):
-        for start_c in range(0, BOARD_COLS - WIN_LEN + 1):
-            cells = [(r, start_c + i) for i in range(WIN_LEN)]
-            if all(board[r][start_c + i] == player_mark for i in range(WIN_LEN)):
-                return cells
-    # Vertical checks
-    for c in range(BOARD_COLS):
-        for start_r in range(0, BOARD_ROWS - WIN_LEN + 1):
-            if all(board[start_r + i][c] == player_mark for i in range(WIN_LEN)):
-                return [(start_r + i, c) for i in range(WIN_LEN)]
-    # Diagonals (top-left -> bottom-right)
-    for start_r in range(0, BOARD_ROWS - WIN_LEN + 1):
-        for start_c in range(0, BOARD_COLS - WIN_LEN + 1):
-            if all(board[start_r + i][start_c + i] == player_mark for i in range(WIN_LEN)):
-                return [(start_r + i, start_c + i) for i in range(WIN_LEN)]
-    # Diagonals (top-right -> bottom-left)
-    for start_r in range(0, BOARD_ROWS - WIN_LEN + 1):
-        for start_c in range(WIN_LEN - 1, BOARD_COLS):
-            if all(board[start_r + i][start_c - i] == player_mark for i in range(WIN_LEN)):
-                return [(start_r + i, start_c - i) for i in range(WIN_LEN)]
+    bits = x_bits if player_mark == "X" else o_bits
+    for m in WIN_MASKS:
+        if bits & m == m:
+            return MASK_TO_CELLS[m]
     return None
 
 def cell_center(rc):
     """Return the pixel coordinates of the center of a board cell."""
     r, c = rc
-    return (BOARD_LEFT + c * SQUARE_SIZE + SQUARE_SIZE // 2, BOARD_TOP + r * SQUARE_SIZE + SQUARE_SIZE // 2)
-
-def draw_winning_line(cells, flash_times=HIGHLIGHT_FLASHES, flash_delay=HIGHLIGHT_DELAY_MS):
-    if not cells: return
-    start = cell_center(cells[0])
-    end = cell_center(cells[-1])
-    for i in range(flash_times):
-        draw_lines(); draw_figures(); display_scoreboard()
-        if i % 2 == 0:
-            pygame.draw.line(screen, HIGHLIGHT_COLOR, start, end, HIGHLIGHT_WIDTH)
-        present(); pygame.time.delay(flash_delay)
+    return cell_geometry()[r][c][:2]
 
-def draw_pulsing_circles(cells, pulses=PULSE_PULSES, total_ms=PULSE_TOTAL_MS, steps=PULSE_STEPS, line_width=PULSE_LINE_WIDTH):
-    if not cells: return
-    centers = [cell_center(c) for c in cells]
+# -------------------------
+# End-of-game animation (non-blocking)
+# -------------------------
+# One pre-rendered ring per pulse step, shared by every end animation until the
+# square size or ring style changes.
+_PULSE_RINGS = []
+_PULSE_RINGS_KEY = None
+
+def pulse_rings():
+    """Return [(ring_surface, offset), ...] for each pulse step, smallest first."""
+    global _PULSE_RINGS, _PULSE_RINGS_KEY
+    steps = max(1, PULSE_STEPS)
     min_r = CIRCLE_RADIUS + 6
     max_r = int(SQUARE_SIZE * 0.45)
-    ms_per_half = max(8, total_ms // 2)
-    ms_per_step = max(8, ms_per_half // max(1, steps - 1))
-    for _ in range(pulses):
+    key = (steps, min_r, max_r, HIGHLIGHT_COLOR, PULSE_LINE_WIDTH)
+    if _PULSE_RINGS_KEY != key:
+        rings = []
         for s in range(steps):
             r = min_r + (max_r - min_r) * s // max(1, steps - 1)
-            draw_lines(); draw_figures(); display_scoreboard()
-            for c in centers:
-                pygame.draw.circle(screen, HIGHLIGHT_COLOR, c, r, line_width)
-            present(); pygame.time.delay(ms_per_step)
-        for s in reversed(range(steps)):
-            r = min_r + (max_r - min_r) * s // max(1, steps - 1)
-            draw_lines(); draw_figures(); display_scoreboard()
-            for c in centers:
-                pygame.draw.circle(screen, HIGHLIGHT_COLOR, c, r, line_width)
-            present(); pygame.time.delay(ms_per_step)
+            ring = pygame.Surface((2 * r + 2, 2 * r + 2), pygame.SRCALPHA)
+            pygame.draw.circle(ring, HIGHLIGHT_COLOR, (r + 1, r + 1), r, PULSE_LINE_WIDTH)
+            try:
+                ring = ring.convert_alpha()
+            except Exception:
+                pass
+            rings.append((ring, r + 1))
+        _PULSE_RINGS = rings
+        _PULSE_RINGS_KEY = key
+    return _PULSE_RINGS
+
+def start_end_animation(cells, hold_ms, on_settle=None, now_ms=None):
+    """Create the state for the end-of-game animation.
+
+    With winning cells this flashes the winning line, pulses rings on the
+    winning cells and then holds the final board for hold_ms; for a draw it
+    only holds. on_settle() runs once when the hold phase begins. Drive it
+    with advance_end_animation() once per frame.
+    """
+    anim = {
+        "start_ms": pygame.time.get_ticks() if now_ms is None else now_ms,
+        "cells": cells or [],
+        "on_settle": on_settle,
+        "hold_ms": hold_ms,
+        "flash_ms": 0,
+        "pulse_ms": 0,
+        "done": False,
+        # snapshot of the static frame (grid, figures, scoreboard) under the effect
+        "base": None,
+        "base_key": None,
+        # screen area the effect can touch; see update_rects below
+        "region": None,
+        # rects to hand to present() for the frame just drawn (None = whole frame)
+        "update_rects": None,
+    }
+    if anim["cells"]:
+        steps = max(1, PULSE_STEPS)
+        ms_per_half = max(8, PULSE_TOTAL_MS // 2)
+        ms_per_step = max(8, ms_per_half // max(1, steps - 1))
+        max_r = int(SQUARE_SIZE * 0.45)
+        # every pulse step is a plain blit of a cached ring
+        rings = pulse_rings()
+        centers = [cell_center(c) for c in anim["cells"]]
+        (x0, y0), (x1, y1) = centers[0], centers[-1]
+        region = pygame.Rect(min(x0, x1), min(y0, y1), abs(x1 - x0) + 1, abs(y1 - y0) + 1)
+        region.inflate_ip(2 * HIGHLIGHT_WIDTH, 2 * HIGHLIGHT_WIDTH)
+        for cx, cy in centers:
+            region.union_ip(pygame.Rect(cx - max_r - 2, cy - max_r - 2, 2 * max_r + 4, 2 * max_r + 4))
+        anim.update(
+            centers=centers,
+            region=region,
+            rings=rings,
+            ms_per_step=ms_per_step,
+            flash_ms=HIGHLIGHT_FLASHES * HIGHLIGHT_DELAY_MS,
+            pulse_ms=PULSE_PULSES * 2 * steps * ms_per_step,
+        )
+    return anim
+
+def finish_game(winner, win_line=None):
+    """Start the end of a decided game. winner is "X"/"O" with its winning cells,
+    or None for a draw. Returns (end animation, end-screen message); the score
+    is counted when the animation settles (draws count immediately)."""
+    if winner is None:
+        handle_draw()
+        return start_end_animation(None, 400), get_draw_message()  # Brief pause for draw
+    # Brief celebratory pause before the end screen
+    return start_end_animation(win_line, 600, lambda: handle_win(winner)), get_win_message(winner, game_mode)
+
+def advance_end_animation(anim, now_ms):
+    """Draw the animation frame for now_ms. Returns True once the animation has finished."""
+    if anim["done"]:
+        return True
+    elapsed = now_ms - anim["start_ms"]
+    flash_ms, pulse_ms = anim["flash_ms"], anim["pulse_ms"]
+    if elapsed >= flash_ms + pulse_ms and anim["on_settle"] is not None:
+        on_settle, anim["on_settle"] = anim["on_settle"], None
+        on_settle()
+    if elapsed >= flash_ms + pulse_ms + anim["hold_ms"]:
+        anim["done"] = True
+        return True
+
+    # The board under the effect only changes when the scores update (on_settle),
+    # the scoreboard clock ticks over a second or the window is recreated, so
+    # it is drawn once per change and blitted back on every other frame.
+    base_key = (id(screen), screen.get_size(), x_wins, o_wins, draws,
+                (now_ms - game_start_time) // 1000 if game_start_time > 0 else 0)
+    if anim["base"] is None or anim["base_key"] != base_key:
+        draw_board(); display_scoreboard()
+        anim["base"] = screen.copy()
+        anim["base_key"] = base_key
+        anim["update_rects"] = None
+    else:
+        screen.blit(anim["base"], (0, 0))
+        # nothing outside the effect's area differs from the previous frame
+        anim["update_rects"] = [anim["region"]] if anim["region"] is not None else []
+    if elapsed < flash_ms:
+        # winning line blinks on even flash slots
+        if (elapsed // HIGHLIGHT_DELAY_MS) % 2 == 0:
+            start, end = anim["centers"][0], anim["centers"][-1]
+            pygame.draw.line(screen, HIGHLIGHT_COLOR, start, end, HIGHLIGHT_WIDTH)
+    elif elapsed < flash_ms + pulse_ms:
+        # rings grow then shrink, PULSE_PULSES times
+        steps = len(anim["rings"])
+        idx = ((elapsed - flash_ms) // anim["ms_per_step"]) % (2 * steps)
+        ring, off = anim["rings"][idx if idx < steps else 2 * steps - 1 - idx]
+        for cx, cy in anim["centers"]:
+            screen.blit(ring, (cx - off, cy - off))
+    return False
 
 def check_win(player_mark):
     """Check if the specified player has won. Returns True if winning line exists."""
-    return get_winning_line(player_mark) is not None
+    return bits_have_line(x_bits if player_mark == "X" else o_bits)
+
+def bits_have_line(bits):
+    """True if the bitboard covers any winning line."""
+    # plain loop: measurably cheaper than any() over a generator for 8-10 masks
+    for m in WIN_MASKS:
+        if bits & m == m:
+            return True
+    return False
+
+# game clock text, re-rendered once per second rather than every frame;
+# _TIME_RECT is where it was last drawn
+_TIME_SURF = None
+_TIME_KEY = None
+_TIME_RECT = None
 
 def display_scoreboard():
-    # Centered top scoreboard
-    txt = f"Player 1 Wins: {x_wins}    Player 2 Wins: {o_wins}    Draws: {draws}"
-    draw_text_center(txt, FONT_MED, TEXT_COLOR, screen, WIDTH // 2, 36)
-    
+    """Draw the per-frame parts of the header: game clock and AI notice.
+    The score line itself is part of the static layer drawn by draw_lines()."""
+    global _TIME_SURF, _TIME_KEY, _TIME_RECT
     # Display elapsed time in top-right corner
     if game_start_time > 0:
         elapsed_seconds = (pygame.time.get_ticks() - game_start_time) // 1000
-        minutes = elapsed_seconds // 60
-        seconds = elapsed_seconds % 60
-        time_txt = f"Time: {minutes:02d}:{seconds:02d}"
-        time_surf = FONT_MED.render(time_txt, True, (180, 180, 180))
-        screen.blit(time_surf, (WIDTH - time_surf.get_width() - 10, 10))
+        if _TIME_SURF is None or _TIME_KEY != elapsed_seconds:
+            minutes = elapsed_seconds // 60
+            seconds = elapsed_seconds % 60
+            time_txt = f"Time: {minutes:02d}:{seconds:02d}"
+            _TIME_SURF = to_display_format(FONT_MED.render(time_txt, True, (180, 180, 180)))
+            _TIME_KEY = elapsed_seconds
+        _TIME_RECT = screen.blit(_TIME_SURF, (WIDTH - _TIME_SURF.get_width() - 10, 10))
     
     # Display AI mode notices and move counter - moved to top below scoreboard
-    if game_mode in ["AI_EASY", "AI_MEDIUM", "AI_HARD"]:
+    if game_mode in AI_MODES:
         if game_mode == "AI_HARD":
             notice = "AI Hard Mode - Please allow for longer loading time"  # Always show full message
             notice_font = FONT_MED  # Use FONT_MED for better visibility
@@ -2138,21 +2582,58 @@ def display_scoreboard():
         # Display notice at top, below the scoreboard (scoreboard is at y=36) with brighter color
         draw_text_center(notice, notice_font, (255, 255, 100), screen, WIDTH // 2, 65)
 
-def display_volume_hud_if_needed():
+def timed_overlays_active(now):
+    """True while any time-limited overlay (volume HUD, undo toast, status line,
+    debug overlay, post-reinit counters) needs the screen redrawn every frame."""
+    return bool(
+        (_volume_changed_time and now - _volume_changed_time <= _VOLUME_HUD_DURATION_MS)
+        or (_undo_feedback_time and now - _undo_feedback_time < _UNDO_FEEDBACK_DURATION_MS)
+        or (_STATUS_MSG and (_STATUS_EXPIRE_MS == 0 or now <= _STATUS_EXPIRE_MS))
+        or DEBUG_DISPLAY_OVERLAY
+        or _SKIP_INPUT_FRAMES > 0 or _POST_REINIT_FRAMES > 0
+    )
+
+# Volume HUD text: the two labels plus one "NN%" surface per percentage, each
+# rendered the first time it is shown, so dragging a volume back and forth
+# stops costing a font render per step.
+_HUD_LABELS = [None, None]
+_PCT_SURFS = [None] * 101
+
+def _pct_surf(pct):
+    surf = _PCT_SURFS[pct]
+    if surf is None:
+        surf = _PCT_SURFS[pct] = to_display_format(FONT_SMALL.render(f"{pct}%", True, (255,255,255)))
+    return surf
+# translucent HUD backing, created on first use and reused every frame after
+_HUD_SURF = None
+
+def display_volume_hud_if_needed(now=None):
+    """Draw the volume HUD while it is within its display time. now is the
+    frame's get_ticks() value when the caller already has it."""
     global _volume_changed_time
     if _volume_changed_time == 0:
         return
-    elapsed = pygame.time.get_ticks() - _volume_changed_time
+    if now is None:
+        now = pygame.time.get_ticks()
+    elapsed = now - _volume_changed_time
     if elapsed > _VOLUME_HUD_DURATION_MS:
         return
+    global _HUD_SURF
     hud_w, hud_h = 240, 56
-    hud_surf = pygame.Surface((hud_w, hud_h), pygame.SRCALPHA)
-    hud_surf.fill((0, 0, 0, 180))
-    screen.blit(hud_surf, (WIDTH - hud_w - 10, 12))
-    ev_text = FONT_SMALL.render(f"Effects: {int(EFFECT_VOLUME*100)}%", True, (255,255,255))
-    mv_text = FONT_SMALL.render(f"Music:   {int(MUSIC_VOLUME*100)}%", True, (255,255,255))
-    screen.blit(ev_text, (WIDTH - hud_w + 8, 18))
-    screen.blit(mv_text, (WIDTH - hud_w + 8, 36))
+    if _HUD_SURF is None:
+        _HUD_SURF = pygame.Surface((hud_w, hud_h), pygame.SRCALPHA)
+        _HUD_SURF.fill((0, 0, 0, 180))
+        _HUD_SURF = to_display_format(_HUD_SURF)
+    screen.blit(_HUD_SURF, (WIDTH - hud_w - 10, 12))
+    if _HUD_LABELS[0] is None:
+        _HUD_LABELS[0] = to_display_format(FONT_SMALL.render("Effects: ", True, (255,255,255)))
+        _HUD_LABELS[1] = to_display_format(FONT_SMALL.render("Music:   ", True, (255,255,255)))
+    x = WIDTH - hud_w + 8
+    ev_label, mv_label = _HUD_LABELS
+    screen.blit(ev_label, (x, 18))
+    screen.blit(_pct_surf(int(clamp01(EFFECT_VOLUME) * 100)), (x + ev_label.get_width(), 18))
+    screen.blit(mv_label, (x, 36))
+    screen.blit(_pct_surf(int(clamp01(MUSIC_VOLUME) * 100)), (x + mv_label.get_width(), 36))
 
 # -------------------------
 # Win/draw handlers
@@ -2168,18 +2649,45 @@ def handle_win(player_mark):
             play_sound('lose')
         else:
             play_sound('win')
+    mark_settings_dirty()
 
 def handle_draw():
     global draws
     draws += 1
     play_sound('draw')
+    mark_settings_dirty()
 
 # -------------------------
 # AI (Easy, Medium, Hard)
 # -------------------------
+def empty_cells(xb, ob):
+    """(row, col) of every free cell in the position, in board order. Walks the
+    free-cell bitboard instead of comparing every board entry against None."""
+    free = FULL_MASK & ~(xb | ob)
+    cells = []
+    while free:
+        low = free & -free
+        cells.append(divmod(low.bit_length() - 1, BOARD_COLS))
+        free ^= low
+    return cells
+
+def completing_cell(bits, other):
+    """(row, col) of the first free cell, in board order, that would complete a
+    line for bits (other = the opponent's bits), or None. One pass over
+    WIN_MASKS: a line is one move from done when exactly one of its cells is
+    missing from bits and that cell isn't taken by the opponent."""
+    hits = 0
+    for m in WIN_MASKS:
+        rest = m & ~bits
+        if rest and not rest & (rest - 1) and not rest & other:
+            hits |= rest
+    if not hits:
+        return None
+    return divmod((hits & -hits).bit_length() - 1, BOARD_COLS)
+
 def ai_move_easy():
     """AI Easy mode: Make a random move from available squares."""
-    empty = [(r, c) for r in range(BOARD_ROWS) for c in range(BOARD_COLS) if board[r][c] is None]
+    empty = empty_cells(x_bits, o_bits)
     if empty:
         r, c = random.choice(empty)
         mark_square(r, c, "O", animate=True)
@@ -2193,104 +2701,21 @@ def ai_move_medium():
     """
     # 60% of the time, play smart (check for wins/blocks)
     if random.random() < 0.6:
-        # Check if AI can win immediately
-        for r in range(BOARD_ROWS):
-            for c in range(BOARD_COLS):
-                if board[r][c] is None:
-                    board[r][c] = "O"
-                    if check_win("O"):
-                        mark_square(r, c, "O", animate=True)
-                        play_sound('move_ai')
-                        return
-                    board[r][c] = None
-        
-        # Check if AI must block player from winning
-        for r in range(BOARD_ROWS):
-            for c in range(BOARD_COLS):
-                if board[r][c] is None:
-                    board[r][c] = "X"
-                    if check_win("X"):
-                        board[r][c] = None
-                        mark_square(r, c, "O", animate=True)
-                        play_sound('move_ai')
-                        return
-                    board[r][c] = None
+        # Check if AI can win immediately, else if it must block the player
+        cell = completing_cell(o_bits, x_bits) or completing_cell(x_bits, o_bits)
+        if cell is not None:
+            mark_square(cell[0], cell[1], "O", animate=True)
+            play_sound('move_ai')
+            return
     
     # Otherwise (or if no smart move found), play randomly
     ai_move_easy()
 
-def evaluate():
-    """Evaluate the board state. Returns 1 if AI wins, -1 if player wins, 0 otherwise."""
-    if check_win("O"): return 1
-    if check_win("X"): return -1
-    return 0
-
-def heuristic_eval():
-    """
-    Heuristic evaluation for non-terminal board states.
-    Used when depth limit is reached in minimax to estimate position quality.
-    Returns a score based on potential winning lines and board control.
-    """
-    # For 4x4 boards, evaluate based on potential winning lines
-    score = 0
-    
-    # Helper to evaluate a line (row, column, or diagonal)
-    def eval_line(cells):
-        o_count = cells.count("O")
-        x_count = cells.count("X")
-        empty = cells.count(None)
-        
-        # Line with only O's and empty spaces is an opportunity
-        if o_count > 0 and x_count == 0:
-            if o_count == WIN_LEN - 1 and empty == 1:
-                return 0.5  # One move from winning
-            elif o_count == WIN_LEN - 2 and empty == 2:
-                return 0.2  # Two moves from winning
-            else:
-                return 0.05 * o_count
-        
-        # Line with only X's and empty spaces is a threat
-        elif x_count > 0 and o_count == 0:
-            if x_count == WIN_LEN - 1 and empty == 1:
-                return -0.5  # Opponent one move from winning
-            elif x_count == WIN_LEN - 2 and empty == 2:
-                return -0.2  # Opponent two moves from winning
-            else:
-                return -0.05 * x_count
-        
-        return 0
-    
-    # Evaluate rows
-    for r in range(BOARD_ROWS):
-        for c in range(BOARD_COLS - WIN_LEN + 1):
-            line = [board[r][c + i] for i in range(WIN_LEN)]
-            score += eval_line(line)
-    
-    # Evaluate columns
-    for c in range(BOARD_COLS):
-        for r in range(BOARD_ROWS - WIN_LEN + 1):
-            line = [board[r + i][c] for i in range(WIN_LEN)]
-            score += eval_line(line)
-    
-    # Evaluate diagonals (top-left to bottom-right)
-    for r in range(BOARD_ROWS - WIN_LEN + 1):
-        for c in range(BOARD_COLS - WIN_LEN + 1):
-            line = [board[r + i][c + i] for i in range(WIN_LEN)]
-            score += eval_line(line)
-    
-    # Evaluate diagonals (top-right to bottom-left)
-    for r in range(BOARD_ROWS - WIN_LEN + 1):
-        for c in range(WIN_LEN - 1, BOARD_COLS):
-            line = [board[r + i][c - i] for i in range(WIN_LEN)]
-            score += eval_line(line)
-    
-    return score
-
-def minimax(depth, is_maximizing, alpha=-999, beta=999, max_depth=None):
+def minimax(x_bits, o_bits, is_maximizing, alpha=-999, beta=999, depth=0, max_depth=None):
     """Minimax with alpha-beta pruning and depth limiting for larger boards."""
     # Dynamic depth limit based on board size and number of empty squares
     if max_depth is None:
-        empty_count = sum(1 for r in range(BOARD_ROWS) for c in range(BOARD_COLS) if board[r][c] is None)
+        empty_count = BOARD_ROWS * BOARD_COLS - bin(x_bits | o_bits).count("1")
         if BOARD_ROWS >= 4:
             # For 4x4, limit depth based on how full the board is
             if empty_count > 12:
@@ -2303,72 +2728,18 @@ def minimax(depth, is_maximizing, alpha=-999, beta=999, max_depth=None):
                 max_depth = 10  # End game: full search (few positions left)
         else:
             max_depth = 15  # 3x3: can afford deeper search
-    
-    score = evaluate()
-    if score != 0: 
-        # Favor quicker wins/losses by adjusting score based on depth
-        return score * (10 - depth) if score > 0 else score * (depth - 10)
-    if is_board_full(): 
-        return 0
-    
-    # Depth limit reached: use heuristic evaluation
-    if depth >= max_depth:
-        return heuristic_eval()
-    
-    if is_maximizing:
-        best = -999
-        for r in range(BOARD_ROWS):
-            for c in range(BOARD_COLS):
-                if board[r][c] is None:
-                    board[r][c] = "O"
-                    best = max(best, minimax(depth+1, False, alpha, beta, max_depth))
-                    board[r][c] = None
-                    alpha = max(alpha, best)
-                    if beta <= alpha:
-                        break  # Beta cutoff
-            if beta <= alpha:
-                break  # Beta cutoff
-        return best
-    else:
-        best = 999
-        for r in range(BOARD_ROWS):
-            for c in range(BOARD_COLS):
-                if board[r][c] is None:
-                    board[r][c] = "X"
-                    best = min(best, minimax(depth+1, True, alpha, beta, max_depth))
-                    board[r][c] = None
-                    beta = min(beta, best)
-                    if beta <= alpha:
-                        break  # Alpha cutoff
-            if beta <= alpha:
-                break  # Alpha cutoff
-        return best
-
-def ai_move_hard():
-    """AI using minimax with alpha-beta pruning and move ordering."""
-    # Quick win/block check first (huge speedup for common cases)
-    # Check if AI can win immediately
-    for r in range(BOARD_ROWS):
-        for c in range(BOARD_COLS):
-            if board[r][c] is None:
-                board[r][c] = "O"
-                if check_win("O"):
-                    mark_square(r, c, "O", animate=True)
-                    play_sound('move_ai')
-                    return
-                board[r][c] = None
-    
-    # Check if AI must block player from winning
-    for r in range(BOARD_ROWS):
-        for c in range(BOARD_COLS):
-            if board[r][c] is None:
-                board[r][c] = "X"
-                if check_win("X"):
-                    board[r][c] = None
-                    mark_square(r, c, "O", animate=True)
-                    play_sound('move_ai')
-                    return
-                board[r][c] = None
+    return _minimax_bits(x_bits, o_bits, is_maximizing, alpha, beta, depth, max_depth)
+
+def best_hard_move(xb, ob):
+    """Choose the hard AI's (row, col) for the position (xb, ob) with O to play.
+    Pure function of the bitboards; returns None on a full board."""
+    empties = empty_cells(xb, ob)
+
+    # Quick win/block check first (huge speedup for common cases):
+    # win immediately if possible, otherwise block the player's winning cell
+    cell = completing_cell(ob, xb) or completing_cell(xb, ob)
+    if cell is not None:
+        return cell
     
     # Use minimax with alpha-beta pruning for remaining cases
     best_score = -999
@@ -2376,10 +2747,8 @@ def ai_move_hard():
     alpha = -999
     beta = 999
     
-    # Collect all possible moves
-    moves = [(r, c) for r in range(BOARD_ROWS) for c in range(BOARD_COLS) if board[r][c] is None]
-    
     # Move ordering: prioritize center and corners for better pruning
+    moves = list(empties)
     center = BOARD_ROWS // 2
     def move_priority(move):
         r, c = move
@@ -2392,17 +2761,87 @@ def ai_move_hard():
             return 2
     
     moves.sort(key=move_priority)
+
+    # Symmetry reduction: on symmetric positions (e.g. the empty board) several
+    # moves lead to the same position up to rotation/reflection and score the
+    # same, so only the first of each is searched.
+    if BOARD_SYMMETRIES:
+        seen = set()
+        distinct = []
+        for r, c in moves:
+            child = canonical_position(xb, ob | (1 << (r * BOARD_COLS + c)), BOARD_SYMMETRIES)
+            if child not in seen:
+                seen.add(child)
+                distinct.append((r, c))
+        moves = distinct
     
     for r, c in moves:
-        board[r][c] = "O"
-        score = minimax(0, False, alpha, beta)
-        board[r][c] = None
+        score = minimax(xb, ob | (1 << (r * BOARD_COLS + c)), False, alpha, beta)
         if score > best_score:
             best_score = score
             best_move = (r, c)
         alpha = max(alpha, best_score)
         if beta <= alpha:
             break  # Prune remaining moves
+    return best_move
+
+def hard_move_key(xb, ob):
+    """Return (canonical position, permutation taking this position to it) for the
+    BEST_MOVE table; the permutation is None on boards without symmetries."""
+    if not BOARD_SYMMETRIES:
+        return (xb, ob), None
+    best_key = None
+    best_perm = None
+    for perm in BOARD_SYMMETRIES:
+        key = (permute_bits(xb, perm), permute_bits(ob, perm))
+        if best_key is None or key < best_key:
+            best_key, best_perm = key, perm
+    return best_key, best_perm
+
+def lookup_hard_move(xb, ob):
+    """Hard-AI answer (row, col) for the position, searched once per symmetry class."""
+    key, perm = hard_move_key(xb, ob)
+    if key in BEST_MOVE:
+        idx = BEST_MOVE[key]
+        if idx is None:
+            return None
+        if perm is not None:
+            idx = perm.index(idx)
+        return divmod(idx, BOARD_COLS)
+    move = best_hard_move(xb, ob)
+    if len(BEST_MOVE) >= _BEST_MOVE_LIMIT:
+        BEST_MOVE.clear()
+    if move is None:
+        BEST_MOVE[key] = None
+    else:
+        idx = move[0] * BOARD_COLS + move[1]
+        BEST_MOVE[key] = perm[idx] if perm is not None else idx
+    return move
+
+def precompute_best_moves():
+    """Fill BEST_MOVE for every position the hard AI can face on the current board,
+    with X moving first and O answering with its own choice. Only practical for 3x3
+    (a few hundred positions); 4x4 positions are memoized as they are reached."""
+    def visit(xb, ob):
+        occupied = xb | ob
+        for i in range(BOARD_ROWS * BOARD_COLS):
+            bit = 1 << i
+            if occupied & bit:
+                continue
+            nxb = xb | bit
+            if bits_have_line(nxb) or (nxb | ob) == FULL_MASK or hard_move_key(nxb, ob)[0] in BEST_MOVE:
+                continue
+            # symmetric positions share an entry, so only one of each is expanded
+            move = lookup_hard_move(nxb, ob)
+            nob = ob | (1 << (move[0] * BOARD_COLS + move[1]))
+            if not bits_have_line(nob) and (nxb | nob) != FULL_MASK:
+                visit(nxb, nob)
+    visit(0, 0)
+
+def ai_move_hard():
+    """AI using minimax with alpha-beta pruning and move ordering; answers are
+    looked up in (and recorded to) the BEST_MOVE table."""
+    best_move = lookup_hard_move(x_bits, o_bits)
     
     if best_move:
         mark_square(best_move[0], best_move[1], "O", animate=True)
@@ -2411,28 +2850,6 @@ def ai_move_hard():
 # -------------------------
 # Menu & screens
 # -------------------------
-def draw_menu():
-    screen.fill(BG_COLOR)
-    draw_text_center("Tic Tac Toe", FONT_LARGE, TEXT_COLOR, screen, WIDTH//2, 60)
-    options = [
-        "Player vs Player",
-        "Player vs AI (Easy)",
-        "Player vs AI (Hard)",
-        "Settings",
-        "Quit"
-    ]
-    y = 160
-    option_rects = []
-    for o in options:
-        txt_surf = FONT.render(o, True, TEXT_COLOR)
-        rect = txt_surf.get_rect(center=(WIDTH//2, y))
-        screen.blit(txt_surf, rect)
-        option_rects.append(rect)
-        y += 52
-    present()
-    return option_rects
-
-
 def draw_menu_with_shape_choices(sel_x_shape, sel_o_shape, flash_rects=None, tooltip_text=None, tooltip_expiry=0, do_present=True):
     """Draw the main menu. Returns option_rects (list of button rectangles)."""
     if VERBOSE_LOGS:
@@ -2492,15 +2909,15 @@ def draw_menu_with_shape_choices(sel_x_shape, sel_o_shape, flash_rects=None, too
         # Add difficulty descriptions for AI modes
         if idx == 1:  # AI Easy
             desc = "(Random moves)"
-            desc_surf = FONT_SMALL.render(desc, True, (150, 150, 200))
+            desc_surf = render_cached(desc, FONT_SMALL, (150, 150, 200))
             screen.blit(desc_surf, (rect.centerx - desc_surf.get_width()//2, rect.bottom + 4))
         elif idx == 2:  # AI Medium
             desc = "(Balanced strategy)"
-            desc_surf = FONT_SMALL.render(desc, True, (220, 160, 100))
+            desc_surf = render_cached(desc, FONT_SMALL, (220, 160, 100))
             screen.blit(desc_surf, (rect.centerx - desc_surf.get_width()//2, rect.bottom + 4))
         elif idx == 3:  # AI Hard
             desc = "(Optimal minimax)"
-            desc_surf = FONT_SMALL.render(desc, True, (180, 100, 180))
+            desc_surf = render_cached(desc, FONT_SMALL, (180, 100, 180))
             screen.blit(desc_surf, (rect.centerx - desc_surf.get_width()//2, rect.bottom + 4))
         
         y += btn_h + gap_y
@@ -2515,12 +2932,12 @@ def draw_menu_with_shape_choices(sel_x_shape, sel_o_shape, flash_rects=None, too
     
     # Display version number at bottom left
     version_text = f"v{VERSION}"
-    version_surf = FONT_SMALL.render(version_text, True, (120, 120, 120))
+    version_surf = render_cached(version_text, FONT_SMALL, (120, 120, 120))
     screen.blit(version_surf, (10, HEIGHT - 25))
     
     # Display keyboard shortcuts hint at bottom center
     controls_text = "Controls: F11 (Fullscreen) | ESC (Menu/Back) | Ctrl+Z (Undo)"
-    controls_surf = FONT_SMALL.render(controls_text, True, (120, 120, 120))
+    controls_surf = render_cached(controls_text, FONT_SMALL, (120, 120, 120))
     controls_rect = controls_surf.get_rect(center=(WIDTH//2, HEIGHT - 15))
     screen.blit(controls_surf, controls_rect)
 
@@ -2537,11 +2954,9 @@ def draw_menu_with_shape_choices(sel_x_shape, sel_o_shape, flash_rects=None, too
                     log_w, log_h = logical_surf.get_size()
                     if VERBOSE_LOGS:
                         print(f"[DRAW-MENU] manual blit sizes logical={log_w}x{log_h} -> phys={phys_w}x{phys_h}")
+                    # the stretched frame covers the whole display, so there is
+                    # nothing left for a background fill to clear
                     scaled = pygame.transform.smoothscale(logical_surf, (phys_w, phys_h))
-                    try:
-                        phys.fill(BG_COLOR)
-                    except Exception:
-                        pass
                     phys.blit(scaled, (0, 0))
                     pygame.display.flip()
                     manual_done = True
@@ -2568,8 +2983,6 @@ def draw_menu_with_shape_choices(sel_x_shape, sel_o_shape, flash_rects=None, too
 # Simple utilities for settings UI
 # -------------------------
 def clamp01(x): return max(0.0, min(1.0, x))
-def rels_to_rgb(rels): return (int(rels[0]*255), int(rels[1]*255), int(rels[2]*255))
-def rgb_to_rels(rgb): return [rgb[0]/255.0, rgb[1]/255.0, rgb[2]/255.0]
 def clamp_byte(v): return max(0, min(255, int(v)))
 
 def luminance(color: Tuple[int,int,int]) -> float:
@@ -2587,21 +3000,14 @@ def change_volume(delta: float):
     global EFFECT_VOLUME, MUSIC_VOLUME, _volume_changed_time, _last_volume_click_time
     EFFECT_VOLUME = clamp01(EFFECT_VOLUME + delta)
     MUSIC_VOLUME = clamp01(MUSIC_VOLUME + delta)
-    try:
-        for k, s in SOUNDS.items():
-            if s: s.set_volume(EFFECT_VOLUME)
-    except Exception:
-        pass
-    try:
-        pygame.mixer.music.set_volume(MUSIC_VOLUME)
-    except Exception:
-        pass
-    _volume_changed_time = pygame.time.get_ticks()
-    # play single click sound once now
+    apply_music_volume()
     now = pygame.time.get_ticks()
+    _volume_changed_time = now
+    mark_settings_dirty()
+    # play single click sound once now
     if now - _last_volume_click_time > _VOLUME_CLICK_THROTTLE_MS:
         _last_volume_click_time = now
-        play_sound('menu_select')
+        play_sound('menu')
 
 # -------------------------
 # Settings screen
@@ -2628,7 +3034,7 @@ def settings_screen():
     input_text = ""
     original_input_value = ""  # Store original value in case user clicks away
     active_color = None
-    music_on = True if pygame.mixer.music.get_busy() else False
+    music_on = bool(pygame.mixer.get_init() and pygame.mixer.music.get_busy())
     pressed_button = None
 
     # Compact layout tuning
@@ -2650,38 +3056,52 @@ def settings_screen():
         ("Black text", (0,0,0))
     ]
 
-    # Current slider values
-    x_rels = rgb_to_rels(X_COLOR)
-    o_rels = rgb_to_rels(O_COLOR)
-    bg_rels = rgb_to_rels(BG_COLOR)
-
     # Preview shapes (commit on Save)
     preview_x_shape = X_SHAPE
     preview_o_shape = O_SHAPE
 
-    def update_color_from_mouse(target, idx, mx, base_x, slider_w):
+    # Colors are edited as 0-255 int triples directly; the sliders derive their
+    # fill from the channel value, so no parallel float state is kept.
+    def current_color(target):
         if target == "X":
-            rel = clamp01((mx - base_x) / slider_w)
-            x_rels[idx] = rel
-            return rels_to_rgb(x_rels)
+            return X_COLOR
         elif target == "O":
-            rel = clamp01((mx - base_x) / slider_w)
-            o_rels[idx] = rel
-            return rels_to_rgb(o_rels)
-        else:  # BG
-            rel = clamp01((mx - base_x) / slider_w)
-            bg_rels[idx] = rel
-            return rels_to_rgb(bg_rels)
+            return O_COLOR
+        return BG_COLOR
+
+    def with_channel(target, idx, v):
+        rgb = list(current_color(target)); rgb[idx] = v
+        return tuple(rgb)
+
+    def update_color_from_mouse(target, idx, mx, base_x, slider_w):
+        return with_channel(target, idx, int(clamp01((mx - base_x) / slider_w) * 255))
 
     def set_color(target, rgb):
-        nonlocal x_rels, o_rels, bg_rels
         global X_COLOR, O_COLOR, BG_COLOR
         if target == "X":
-            X_COLOR = tuple(rgb); x_rels = rgb_to_rels(X_COLOR)
+            X_COLOR = tuple(rgb)
         elif target == "O":
-            O_COLOR = tuple(rgb); o_rels = rgb_to_rels(O_COLOR)
+            O_COLOR = tuple(rgb)
         else:
-            BG_COLOR = tuple(rgb); bg_rels = rgb_to_rels(BG_COLOR)
+            BG_COLOR = tuple(rgb)
+        mark_settings_dirty()
+
+    def apply_drag(mx):
+        """Move the slider being dragged to mouse x (applied once per frame)."""
+        global EFFECT_VOLUME, MUSIC_VOLUME
+        if dragging == "eff" and "eff_slider" in all_rects:
+            EFFECT_VOLUME = clamp01((mx - all_rects["eff_slider"].x) / all_rects["eff_slider"].w)
+            mark_settings_dirty()
+        elif dragging == "mus" and "mus_slider" in all_rects:
+            MUSIC_VOLUME = clamp01((mx - all_rects["mus_slider"].x) / all_rects["mus_slider"].w)
+            mark_settings_dirty()
+            apply_music_volume()
+        elif isinstance(dragging, tuple) and "sliders" in all_rects:
+            target, idx = dragging
+            if target in all_rects["sliders"] and idx < len(all_rects["sliders"][target]):
+                rect, base_x = all_rects["sliders"][target][idx]
+                new_color = update_color_from_mouse(target, idx, mx, base_x, rect.w)
+                set_color(target, new_color)
 
     def commit_numeric_input(target, idx, txt):
         if not txt: return
@@ -2689,606 +3109,614 @@ def settings_screen():
             v = clamp_byte(int(txt))
         except Exception:
             return
-        if target == "X":
-            c = list(X_COLOR); c[idx] = v; set_color("X", tuple(c))
-        elif target == "O":
-            c = list(O_COLOR); c[idx] = v; set_color("O", tuple(c))
-        else:
-            c = list(BG_COLOR); c[idx] = v; set_color("BG", tuple(c))
+        set_color(target, with_channel(target, idx, v))
+
+    # Tab strip geometry only depends on the window width; rebuilt when it changes
+    tab_y = margin_top + 50
+    tab_names = ["Appearance", "Audio", "Game"]
+    tab_w = 140
+    tab_h = 36
+    tab_gap = 12
+    total_tab_w = len(tab_names) * tab_w + (len(tab_names) - 1) * tab_gap
+    tab_rects = []
+    tab_rects_width = None
 
     # Main loop
+    # set by any handled event; idle frames (no input, mouse still, no timed
+    # overlay) skip the redraw and present entirely
+    dirty = True
+    last_frame_key = None
+    overlay_was_active = False
     while running:
-        screen.fill(BG_COLOR)
         mouse_pos = map_mouse_pos(pygame.mouse.get_pos())
-        hand_cursor = False
-
-        # Draw title
-        draw_text_center("Settings", FONT_LARGE, TEXT_COLOR, screen, WIDTH//2, margin_top)
-
-        # Tab navigation
-        tab_y = margin_top + 50
-        tab_names = ["Appearance", "Audio", "Game"]
-        tab_w = 140
-        tab_h = 36
-        tab_gap = 12
-        total_tab_w = len(tab_names) * tab_w + (len(tab_names) - 1) * tab_gap
-        tab_start_x = WIDTH // 2 - total_tab_w // 2
-        tab_rects = []
+        now = pygame.time.get_ticks()
+        frame_key = (mouse_pos, screen.get_size(), id(screen))
+        overlay_active = timed_overlays_active(now)
+        redraw = dirty or overlay_active or overlay_was_active or frame_key != last_frame_key
+        if redraw:
+            dirty = False
+            last_frame_key = frame_key
+            overlay_was_active = overlay_active
+            screen.fill(BG_COLOR)
+            hand_cursor = False
+
+            # Draw title
+            draw_text_center("Settings", FONT_LARGE, TEXT_COLOR, screen, WIDTH//2, margin_top)
+
+            # Tab navigation
+            if tab_rects_width != WIDTH:
+                tab_start_x = WIDTH // 2 - total_tab_w // 2
+                tab_rects = [(pygame.Rect(tab_start_x + idx * (tab_w + tab_gap), tab_y, tab_w, tab_h), tab_name)
+                             for idx, tab_name in enumerate(tab_names)]
+                tab_rects_width = WIDTH
         
-        for idx, tab_name in enumerate(tab_names):
-            tx = tab_start_x + idx * (tab_w + tab_gap)
-            tr = pygame.Rect(tx, tab_y, tab_w, tab_h)
-            tab_rects.append((tr, tab_name))
-            
-            # Active tab highlighted
-            if tab_name == settings_current_tab:
-                pygame.draw.rect(screen, (80, 140, 80), tr, border_radius=8)
-                pygame.draw.rect(screen, (255, 255, 255), tr, 3, border_radius=8)
-            else:
-                pygame.draw.rect(screen, (50, 50, 50), tr, border_radius=8)
-                pygame.draw.rect(screen, (140, 140, 140), tr, 2, border_radius=8)
+            for tr, tab_name in tab_rects:
+                # Active tab highlighted
+                if tab_name == settings_current_tab:
+                    pygame.draw.rect(screen, (80, 140, 80), tr, border_radius=8)
+                    pygame.draw.rect(screen, (255, 255, 255), tr, 3, border_radius=8)
+                else:
+                    pygame.draw.rect(screen, (50, 50, 50), tr, border_radius=8)
+                    pygame.draw.rect(screen, (140, 140, 140), tr, 2, border_radius=8)
             
-            # Hover effect
-            if tr.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=8)
-                hand_cursor = True
+                # Hover effect
+                if tr.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=8)
+                    hand_cursor = True
             
-            draw_text_center(tab_name, FONT_MED, (255, 255, 255), screen, tr.centerx, tr.centery)
+                draw_text_center(tab_name, FONT_MED, (255, 255, 255), screen, tr.centerx, tr.centery)
 
-        # Content area starts below tabs
-        content_y = tab_y + tab_h + 30
+            # Content area starts below tabs
+            content_y = tab_y + tab_h + 30
         
-        # Storage for interactive elements
-        all_rects = {
-            "sliders": {},
-            "inputs": {},
-            "buttons": []
-        }
-
-        # === APPEARANCE TAB ===
-        if settings_current_tab == "Appearance":
-            current_y = content_y
+            # Storage for interactive elements
+            all_rects = {
+                "sliders": {},
+                "inputs": {},
+                "buttons": []
+            }
+
+            # === APPEARANCE TAB ===
+            if settings_current_tab == "Appearance":
+                current_y = content_y
             
-            # Collapsible section: Color Customization
-            section_header_y = current_y
-            header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
-            # Better visibility: darker background when collapsed, lighter when expanded
-            header_bg = (50, 50, 70) if settings_collapsed["colors"] else (40, 60, 40)
-            pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
+                # Collapsible section: Color Customization
+                section_header_y = current_y
+                header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
+                # Better visibility: darker background when collapsed, lighter when expanded
+                header_bg = (50, 50, 70) if settings_collapsed["colors"] else (40, 60, 40)
+                pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
             
-            # Better hover feedback
-            if header_rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
-                hand_cursor = True
-            else:
-                # Different border color when collapsed vs expanded
-                border_color = (150, 150, 180) if settings_collapsed["colors"] else (120, 180, 120)
-                pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
+                # Better hover feedback
+                if header_rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
+                    hand_cursor = True
+                else:
+                    # Different border color when collapsed vs expanded
+                    border_color = (150, 150, 180) if settings_collapsed["colors"] else (120, 180, 120)
+                    pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
             
-            # Collapse/expand arrow with better visibility
-            arrow = "▼" if not settings_collapsed["colors"] else "▶"
-            arrow_color = (255, 200, 100) if settings_collapsed["colors"] else (150, 255, 150)
-            draw_text_center(f"{arrow} Color Customization (RGB Sliders)", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
-            all_rects["buttons"].append((header_rect, "toggle_colors"))
-            current_y += 42
-
-            if not settings_collapsed["colors"]:
-                # Two-column layout: Player 1 Color (left) | Player 2 Color (right), BG below
-                col_left = int(WIDTH * 0.30)
-                col_right = int(WIDTH * 0.70)
-                slider_w = int(WIDTH * 0.22)
-                slider_v_gap = 32  # Reduced vertical spacing
+                # Collapse/expand arrow with better visibility
+                arrow = "▼" if not settings_collapsed["colors"] else "▶"
+                arrow_color = (255, 200, 100) if settings_collapsed["colors"] else (150, 255, 150)
+                draw_text_center(f"{arrow} Color Customization (RGB Sliders)", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
+                all_rects["buttons"].append((header_rect, "toggle_colors"))
+                current_y += 42
+
+                if not settings_collapsed["colors"]:
+                    # Two-column layout: Player 1 Color (left) | Player 2 Color (right), BG below
+                    col_left = int(WIDTH * 0.30)
+                    col_right = int(WIDTH * 0.70)
+                    slider_w = int(WIDTH * 0.22)
+                    slider_v_gap = 32  # Reduced vertical spacing
                 
-                # Player 1 Color section
-                draw_text_center("Player 1 Color", FONT_SMALL, X_COLOR, screen, col_left, current_y)
-                # Player 2 Color section
-                draw_text_center("Player 2 Color", FONT_SMALL, O_COLOR, screen, col_right, current_y)
-                current_y += 28
-
-                x_sliders = []
-                o_sliders = []
-                x_inputs = []
-                o_inputs = []
+                    # Player 1 Color section
+                    draw_text_center("Player 1 Color", FONT_SMALL, X_COLOR, screen, col_left, current_y)
+                    # Player 2 Color section
+                    draw_text_center("Player 2 Color", FONT_SMALL, O_COLOR, screen, col_right, current_y)
+                    current_y += 28
+
+                    x_sliders = []
+                    o_sliders = []
+                    x_inputs = []
+                    o_inputs = []
                 
-                for i, lbl in enumerate(["R", "G", "B"]):
-                    row_y = current_y + i * slider_v_gap
+                    for i, lbl in enumerate(["R", "G", "B"]):
+                        row_y = current_y + i * slider_v_gap
                     
-                    # X slider (left)
-                    x_base = col_left - slider_w // 2
-                    x_rect = pygame.Rect(x_base, row_y, slider_w, slider_h)
-                    pygame.draw.rect(screen, (70, 70, 70), x_rect, border_radius=4)
-                    pygame.draw.rect(screen, (255, 255, 255), x_rect, 1, border_radius=4)
-                    fill_x = int(x_rect.w * x_rels[i])
-                    pygame.draw.rect(screen, X_COLOR, (x_rect.x, x_rect.y, fill_x, x_rect.h))
+                        # X slider (left)
+                        x_base = col_left - slider_w // 2
+                        x_rect = pygame.Rect(x_base, row_y, slider_w, slider_h)
+                        pygame.draw.rect(screen, (70, 70, 70), x_rect, border_radius=4)
+                        pygame.draw.rect(screen, (255, 255, 255), x_rect, 1, border_radius=4)
+                        fill_x = x_rect.w * X_COLOR[i] // 255
+                        pygame.draw.rect(screen, X_COLOR, (x_rect.x, x_rect.y, fill_x, x_rect.h))
                     
-                    # Slider handle
-                    handle_x_pos = (x_rect.x + fill_x, x_rect.y + x_rect.h // 2)
-                    handle_radius = 10
-                    handle_color = (255, 255, 255)
-                    if isinstance(dragging, tuple) and dragging[0] == "X" and dragging[1] == i:
-                        handle_color = HIGHLIGHT_COLOR
-                        handle_radius = 12
-                    pygame.draw.circle(screen, handle_color, handle_x_pos, handle_radius)
-                    if x_rect.collidepoint(mouse_pos):
-                        hand_cursor = True
+                        # Slider handle
+                        handle_x_pos = (x_rect.x + fill_x, x_rect.y + x_rect.h // 2)
+                        handle_radius = 10
+                        handle_color = (255, 255, 255)
+                        if isinstance(dragging, tuple) and dragging[0] == "X" and dragging[1] == i:
+                            handle_color = HIGHLIGHT_COLOR
+                            handle_radius = 12
+                        pygame.draw.circle(screen, handle_color, handle_x_pos, handle_radius)
+                        if x_rect.collidepoint(mouse_pos):
+                            hand_cursor = True
                     
-                    # Label
-                    draw_text_center(lbl, FONT_SMALL, TEXT_COLOR, screen, x_rect.x - 18, x_rect.y + x_rect.h // 2)
+                        # Label
+                        draw_text_center(lbl, FONT_SMALL, TEXT_COLOR, screen, x_rect.x - 18, x_rect.y + x_rect.h // 2)
                     
-                    # Value box
-                    val_x_rect = pygame.Rect(x_rect.right + 10, row_y - 6, 54, 24)
-                    pygame.draw.rect(screen, (30, 30, 30), val_x_rect)
-                    if val_x_rect.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), val_x_rect, 2)
-                        hand_cursor = True
-                    else:
-                        pygame.draw.rect(screen, (150, 150, 150), val_x_rect, 1)
-                    draw_text_center(str(int(X_COLOR[i])), FONT_SMALL, TEXT_COLOR, screen, val_x_rect.centerx, val_x_rect.centery)
+                        # Value box
+                        val_x_rect = pygame.Rect(x_rect.right + 10, row_y - 6, 54, 24)
+                        pygame.draw.rect(screen, (30, 30, 30), val_x_rect)
+                        if val_x_rect.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), val_x_rect, 2)
+                            hand_cursor = True
+                        else:
+                            pygame.draw.rect(screen, (150, 150, 150), val_x_rect, 1)
+                        draw_text_center(str(int(X_COLOR[i])), FONT_SMALL, TEXT_COLOR, screen, val_x_rect.centerx, val_x_rect.centery)
                     
-                    x_sliders.append((x_rect, x_base))
-                    x_inputs.append(val_x_rect)
+                        x_sliders.append((x_rect, x_base))
+                        x_inputs.append(val_x_rect)
                     
-                    # O slider (right)
-                    o_base = col_right - slider_w // 2
-                    o_rect = pygame.Rect(o_base, row_y, slider_w, slider_h)
-                    pygame.draw.rect(screen, (70, 70, 70), o_rect, border_radius=4)
-                    pygame.draw.rect(screen, (255, 255, 255), o_rect, 1, border_radius=4)
-                    fill_o = int(o_rect.w * o_rels[i])
-                    pygame.draw.rect(screen, O_COLOR, (o_rect.x, o_rect.y, fill_o, o_rect.h))
+                        # O slider (right)
+                        o_base = col_right - slider_w // 2
+                        o_rect = pygame.Rect(o_base, row_y, slider_w, slider_h)
+                        pygame.draw.rect(screen, (70, 70, 70), o_rect, border_radius=4)
+                        pygame.draw.rect(screen, (255, 255, 255), o_rect, 1, border_radius=4)
+                        fill_o = o_rect.w * O_COLOR[i] // 255
+                        pygame.draw.rect(screen, O_COLOR, (o_rect.x, o_rect.y, fill_o, o_rect.h))
                     
-                    handle_o_pos = (o_rect.x + fill_o, o_rect.y + o_rect.h // 2)
-                    handle_o_color = (255, 255, 255)
-                    if isinstance(dragging, tuple) and dragging[0] == "O" and dragging[1] == i:
-                        handle_o_color = HIGHLIGHT_COLOR
-                        handle_radius = 12
-                    pygame.draw.circle(screen, handle_o_color, handle_o_pos, 10)
-                    if o_rect.collidepoint(mouse_pos):
-                        hand_cursor = True
+                        handle_o_pos = (o_rect.x + fill_o, o_rect.y + o_rect.h // 2)
+                        handle_o_color = (255, 255, 255)
+                        if isinstance(dragging, tuple) and dragging[0] == "O" and dragging[1] == i:
+                            handle_o_color = HIGHLIGHT_COLOR
+                            handle_radius = 12
+                        pygame.draw.circle(screen, handle_o_color, handle_o_pos, 10)
+                        if o_rect.collidepoint(mouse_pos):
+                            hand_cursor = True
                     
-                    draw_text_center(lbl, FONT_SMALL, TEXT_COLOR, screen, o_rect.x - 18, o_rect.y + o_rect.h // 2)
+                        draw_text_center(lbl, FONT_SMALL, TEXT_COLOR, screen, o_rect.x - 18, o_rect.y + o_rect.h // 2)
                     
-                    val_o_rect = pygame.Rect(o_rect.right + 10, row_y - 6, 54, 24)
-                    pygame.draw.rect(screen, (30, 30, 30), val_o_rect)
-                    if val_o_rect.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), val_o_rect, 2)
-                        hand_cursor = True
-                    else:
-                        pygame.draw.rect(screen, (150, 150, 150), val_o_rect, 1)
-                    draw_text_center(str(int(O_COLOR[i])), FONT_SMALL, TEXT_COLOR, screen, val_o_rect.centerx, val_o_rect.centery)
+                        val_o_rect = pygame.Rect(o_rect.right + 10, row_y - 6, 54, 24)
+                        pygame.draw.rect(screen, (30, 30, 30), val_o_rect)
+                        if val_o_rect.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), val_o_rect, 2)
+                            hand_cursor = True
+                        else:
+                            pygame.draw.rect(screen, (150, 150, 150), val_o_rect, 1)
+                        draw_text_center(str(int(O_COLOR[i])), FONT_SMALL, TEXT_COLOR, screen, val_o_rect.centerx, val_o_rect.centery)
                     
-                    o_sliders.append((o_rect, o_base))
-                    o_inputs.append(val_o_rect)
+                        o_sliders.append((o_rect, o_base))
+                        o_inputs.append(val_o_rect)
                 
-                all_rects["sliders"]["X"] = x_sliders
-                all_rects["sliders"]["O"] = o_sliders
-                all_rects["inputs"]["X"] = x_inputs
-                all_rects["inputs"]["O"] = o_inputs
+                    all_rects["sliders"]["X"] = x_sliders
+                    all_rects["sliders"]["O"] = o_sliders
+                    all_rects["inputs"]["X"] = x_inputs
+                    all_rects["inputs"]["O"] = o_inputs
                 
-                current_y += slider_v_gap * 3 + 20
+                    current_y += slider_v_gap * 3 + 20
                 
-                # Background Color (centered, below X and O)
-                draw_text_center("Background Color", FONT_SMALL, (255, 255, 255), screen, WIDTH // 2, current_y)
-                current_y += 28
+                    # Background Color (centered, below X and O)
+                    draw_text_center("Background Color", FONT_SMALL, (255, 255, 255), screen, WIDTH // 2, current_y)
+                    current_y += 28
                 
-                bg_sliders = []
-                bg_inputs = []
-                bg_base = WIDTH // 2 - slider_w // 2
+                    bg_sliders = []
+                    bg_inputs = []
+                    bg_base = WIDTH // 2 - slider_w // 2
                 
-                for i, lbl in enumerate(["R", "G", "B"]):
-                    row_y = current_y + i * slider_v_gap
-                    bg_rect = pygame.Rect(bg_base, row_y, slider_w, slider_h)
-                    pygame.draw.rect(screen, (70, 70, 70), bg_rect, border_radius=4)
-                    pygame.draw.rect(screen, (255, 255, 255), bg_rect, 1, border_radius=4)
-                    fill_bg = int(bg_rect.w * bg_rels[i])
-                    pygame.draw.rect(screen, BG_COLOR, (bg_rect.x, bg_rect.y, fill_bg, bg_rect.h))
+                    for i, lbl in enumerate(["R", "G", "B"]):
+                        row_y = current_y + i * slider_v_gap
+                        bg_rect = pygame.Rect(bg_base, row_y, slider_w, slider_h)
+                        pygame.draw.rect(screen, (70, 70, 70), bg_rect, border_radius=4)
+                        pygame.draw.rect(screen, (255, 255, 255), bg_rect, 1, border_radius=4)
+                        fill_bg = bg_rect.w * BG_COLOR[i] // 255
+                        pygame.draw.rect(screen, BG_COLOR, (bg_rect.x, bg_rect.y, fill_bg, bg_rect.h))
                     
-                    handle_bg_pos = (bg_rect.x + fill_bg, bg_rect.y + bg_rect.h // 2)
-                    handle_bg_color = (255, 255, 255)
-                    if isinstance(dragging, tuple) and dragging[0] == "BG" and dragging[1] == i:
-                        handle_bg_color = HIGHLIGHT_COLOR
-                        handle_radius = 12
-                    pygame.draw.circle(screen, handle_bg_color, handle_bg_pos, 10)
-                    if bg_rect.collidepoint(mouse_pos):
-                        hand_cursor = True
+                        handle_bg_pos = (bg_rect.x + fill_bg, bg_rect.y + bg_rect.h // 2)
+                        handle_bg_color = (255, 255, 255)
+                        if isinstance(dragging, tuple) and dragging[0] == "BG" and dragging[1] == i:
+                            handle_bg_color = HIGHLIGHT_COLOR
+                            handle_radius = 12
+                        pygame.draw.circle(screen, handle_bg_color, handle_bg_pos, 10)
+                        if bg_rect.collidepoint(mouse_pos):
+                            hand_cursor = True
                     
-                    draw_text_center(lbl, FONT_SMALL, TEXT_COLOR, screen, bg_rect.x - 18, bg_rect.y + bg_rect.h // 2)
+                        draw_text_center(lbl, FONT_SMALL, TEXT_COLOR, screen, bg_rect.x - 18, bg_rect.y + bg_rect.h // 2)
                     
-                    val_bg_rect = pygame.Rect(bg_rect.right + 10, row_y - 6, 54, 24)
-                    pygame.draw.rect(screen, (30, 30, 30), val_bg_rect)
-                    if val_bg_rect.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), val_bg_rect, 2)
-                        hand_cursor = True
-                    else:
-                        pygame.draw.rect(screen, (150, 150, 150), val_bg_rect, 1)
-                    draw_text_center(str(int(BG_COLOR[i])), FONT_SMALL, TEXT_COLOR, screen, val_bg_rect.centerx, val_bg_rect.centery)
+                        val_bg_rect = pygame.Rect(bg_rect.right + 10, row_y - 6, 54, 24)
+                        pygame.draw.rect(screen, (30, 30, 30), val_bg_rect)
+                        if val_bg_rect.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), val_bg_rect, 2)
+                            hand_cursor = True
+                        else:
+                            pygame.draw.rect(screen, (150, 150, 150), val_bg_rect, 1)
+                        draw_text_center(str(int(BG_COLOR[i])), FONT_SMALL, TEXT_COLOR, screen, val_bg_rect.centerx, val_bg_rect.centery)
                     
-                    bg_sliders.append((bg_rect, bg_base))
-                    bg_inputs.append(val_bg_rect)
+                        bg_sliders.append((bg_rect, bg_base))
+                        bg_inputs.append(val_bg_rect)
                 
-                all_rects["sliders"]["BG"] = bg_sliders
-                all_rects["inputs"]["BG"] = bg_inputs
+                    all_rects["sliders"]["BG"] = bg_sliders
+                    all_rects["inputs"]["BG"] = bg_inputs
                 
-                current_y += slider_v_gap * 3 + 30
+                    current_y += slider_v_gap * 3 + 30
                 
-                # Color presets row
-                draw_text_center(f"Quick Presets (Target: {active_color or 'All'})", FONT_SMALL, TEXT_COLOR, screen, WIDTH // 2, current_y)
-                current_y += 24
+                    # Color presets row
+                    draw_text_center(f"Quick Presets (Target: {active_color or 'All'})", FONT_SMALL, TEXT_COLOR, screen, WIDTH // 2, current_y)
+                    current_y += 24
                 
-                preset_w = 56
-                preset_h = 30
-                preset_gap = 10
-                total_preset_w = len(color_presets) * preset_w + (len(color_presets) - 1) * preset_gap
-                preset_start_x = WIDTH // 2 - total_preset_w // 2
-                preset_rects = []
+                    preset_w = 56
+                    preset_h = 30
+                    preset_gap = 10
+                    total_preset_w = len(color_presets) * preset_w + (len(color_presets) - 1) * preset_gap
+                    preset_start_x = WIDTH // 2 - total_preset_w // 2
+                    preset_rects = []
                 
-                for idx, (name, col) in enumerate(color_presets):
-                    px = preset_start_x + idx * (preset_w + preset_gap)
-                    pr = pygame.Rect(px, current_y, preset_w, preset_h)
-                    pygame.draw.rect(screen, col, pr)
-                    if pr.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), pr, 3)
-                        hand_cursor = True
-                    else:
-                        pygame.draw.rect(screen, (255, 255, 255), pr, 2)
-                    draw_text_center(name, FONT_SMALL, (0, 0, 0), screen, pr.centerx, pr.centery)
-                    preset_rects.append((pr, col))
+                    for idx, (name, col) in enumerate(color_presets):
+                        px = preset_start_x + idx * (preset_w + preset_gap)
+                        pr = pygame.Rect(px, current_y, preset_w, preset_h)
+                        pygame.draw.rect(screen, col, pr)
+                        if pr.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), pr, 3)
+                            hand_cursor = True
+                        else:
+                            pygame.draw.rect(screen, (255, 255, 255), pr, 2)
+                        draw_text_center(name, FONT_SMALL, (0, 0, 0), screen, pr.centerx, pr.centery)
+                        preset_rects.append((pr, col))
                 
-                all_rects["preset_colors"] = preset_rects
-                current_y += 50
-
-            # Collapsible section: Themes
-            section_header_y = current_y
-            header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
-            header_bg = (50, 50, 70) if settings_collapsed["themes"] else (60, 40, 60)
-            pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
+                    all_rects["preset_colors"] = preset_rects
+                    current_y += 50
+
+                # Collapsible section: Themes
+                section_header_y = current_y
+                header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
+                header_bg = (50, 50, 70) if settings_collapsed["themes"] else (60, 40, 60)
+                pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
             
-            if header_rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
-                hand_cursor = True
-            else:
-                border_color = (150, 150, 180) if settings_collapsed["themes"] else (180, 120, 180)
-                pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
+                if header_rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
+                    hand_cursor = True
+                else:
+                    border_color = (150, 150, 180) if settings_collapsed["themes"] else (180, 120, 180)
+                    pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
             
-            arrow = "▼" if not settings_collapsed["themes"] else "▶"
-            arrow_color = (255, 200, 100) if settings_collapsed["themes"] else (200, 150, 255)
-            draw_text_center(f"{arrow} Theme Presets", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
-            all_rects["buttons"].append((header_rect, "toggle_themes"))
-            current_y += 42
-
-            if not settings_collapsed["themes"]:
-                theme_w = 100
-                theme_h = 46  # Increased to show color swatches
-                theme_gap = 8
-                theme_names = list(THEMES.keys())
-                total_theme_w = len(theme_names) * theme_w + (len(theme_names) - 1) * theme_gap
-                theme_start_x = WIDTH // 2 - total_theme_w // 2
-                theme_rects = []
+                arrow = "▼" if not settings_collapsed["themes"] else "▶"
+                arrow_color = (255, 200, 100) if settings_collapsed["themes"] else (200, 150, 255)
+                draw_text_center(f"{arrow} Theme Presets", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
+                all_rects["buttons"].append((header_rect, "toggle_themes"))
+                current_y += 42
+
+                if not settings_collapsed["themes"]:
+                    theme_w = 100
+                    theme_h = 46  # Increased to show color swatches
+                    theme_gap = 8
+                    total_theme_w = len(_THEMES) * theme_w + (len(_THEMES) - 1) * theme_gap
+                    theme_start_x = WIDTH // 2 - total_theme_w // 2
+                    theme_rects = []
                 
-                for idx, theme_name in enumerate(theme_names):
-                    tx = theme_start_x + idx * (theme_w + theme_gap)
-                    tr = pygame.Rect(tx, current_y, theme_w, theme_h)
-                    
-                    # Get theme colors
-                    theme = THEMES[theme_name]
-                    x_col = theme["x_color"]
-                    o_col = theme["o_color"]
-                    bg_col = theme["bg_color"]
+                    for idx, (theme_name, x_col, o_col, bg_col, theme_text_col, _) in enumerate(_THEMES):
+                        tx = theme_start_x + idx * (theme_w + theme_gap)
+                        tr = pygame.Rect(tx, current_y, theme_w, theme_h)
                     
-                    # Draw background with theme's BG color
-                    pygame.draw.rect(screen, bg_col, tr, border_radius=6)
+                        # Draw background with theme's BG color
+                        pygame.draw.rect(screen, bg_col, tr, border_radius=6)
                     
-                    # Draw color preview swatches at bottom (3 small circles)
-                    swatch_y = tr.bottom - 10
-                    swatch_spacing = theme_w // 4
-                    swatch_start_x = tr.centerx - swatch_spacing
-                    for i, col in enumerate([x_col, bg_col, o_col]):
-                        swatch_x = swatch_start_x + i * swatch_spacing
-                        pygame.draw.circle(screen, col, (swatch_x, swatch_y), 6)
-                        pygame.draw.circle(screen, (255, 255, 255), (swatch_x, swatch_y), 6, 1)
+                        # Draw color preview swatches at bottom (3 small circles)
+                        swatch_y = tr.bottom - 10
+                        swatch_spacing = theme_w // 4
+                        swatch_start_x = tr.centerx - swatch_spacing
+                        for i, col in enumerate([x_col, bg_col, o_col]):
+                            swatch_x = swatch_start_x + i * swatch_spacing
+                            pygame.draw.circle(screen, col, (swatch_x, swatch_y), 6)
+                            pygame.draw.circle(screen, (255, 255, 255), (swatch_x, swatch_y), 6, 1)
                     
-                    # Hover effect
-                    if tr.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=6)
-                        hand_cursor = True
-                    else:
-                        pygame.draw.rect(screen, (140, 140, 140), tr, 2, border_radius=6)
+                        # Hover effect
+                        if tr.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=6)
+                            hand_cursor = True
+                        else:
+                            pygame.draw.rect(screen, (140, 140, 140), tr, 2, border_radius=6)
                     
-                    # Theme name at top
-                    draw_text_center(theme_name, FONT_SMALL, theme["text_color"], screen, tr.centerx, tr.top + 12)
-                    theme_rects.append((tr, theme_name))
+                        # Theme name at top
+                        draw_text_center(theme_name, FONT_SMALL, theme_text_col, screen, tr.centerx, tr.top + 12)
+                        theme_rects.append((tr, idx))
                 
-                all_rects["themes"] = theme_rects
-                current_y += 60
-
-            # Collapsible section: Player Shapes
-            section_header_y = current_y
-            header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
-            header_bg = (50, 50, 70) if settings_collapsed["shapes"] else (40, 50, 40)
-            pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
+                    all_rects["themes"] = theme_rects
+                    current_y += 60
+
+                # Collapsible section: Player Shapes
+                section_header_y = current_y
+                header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
+                header_bg = (50, 50, 70) if settings_collapsed["shapes"] else (40, 50, 40)
+                pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
             
-            if header_rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
-                hand_cursor = True
-            else:
-                border_color = (150, 150, 180) if settings_collapsed["shapes"] else (120, 180, 120)
-                pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
+                if header_rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
+                    hand_cursor = True
+                else:
+                    border_color = (150, 150, 180) if settings_collapsed["shapes"] else (120, 180, 120)
+                    pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
             
-            arrow = "▼" if not settings_collapsed["shapes"] else "▶"
-            arrow_color = (255, 200, 100) if settings_collapsed["shapes"] else (150, 255, 150)
-            draw_text_center(f"{arrow} Player Shapes", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
-            all_rects["buttons"].append((header_rect, "toggle_shapes"))
-            current_y += 42
-
-            if not settings_collapsed["shapes"]:
-                # Two-column: Player 1 left, Player 2 right
-                col_left = int(WIDTH * 0.30)
-                col_right = int(WIDTH * 0.70)
+                arrow = "▼" if not settings_collapsed["shapes"] else "▶"
+                arrow_color = (255, 200, 100) if settings_collapsed["shapes"] else (150, 255, 150)
+                draw_text_center(f"{arrow} Player Shapes", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
+                all_rects["buttons"].append((header_rect, "toggle_shapes"))
+                current_y += 42
+
+                if not settings_collapsed["shapes"]:
+                    # Two-column: Player 1 left, Player 2 right
+                    col_left = int(WIDTH * 0.30)
+                    col_right = int(WIDTH * 0.70)
                 
-                draw_text_center("Player 1", FONT_SMALL, TEXT_COLOR, screen, col_left, current_y)
-                draw_text_center("Player 2", FONT_SMALL, TEXT_COLOR, screen, col_right, current_y)
-                current_y += 28
+                    draw_text_center("Player 1", FONT_SMALL, TEXT_COLOR, screen, col_left, current_y)
+                    draw_text_center("Player 2", FONT_SMALL, TEXT_COLOR, screen, col_right, current_y)
+                    current_y += 28
                 
-                shape_w = 62
-                shape_h = 36
-                shape_gap = 8
-                total_shape_w = len(SHAPE_OPTIONS) * shape_w + (len(SHAPE_OPTIONS) - 1) * shape_gap
+                    shape_w = 62
+                    shape_h = 36
+                    shape_gap = 8
+                    total_shape_w = len(SHAPE_OPTIONS) * shape_w + (len(SHAPE_OPTIONS) - 1) * shape_gap
                 
-                shape_token_rects = []
+                    shape_token_rects = []
                 
-                # Player 1 shapes
-                sx1 = col_left - total_shape_w // 2
-                for idx, shape in enumerate(SHAPE_OPTIONS):
-                    tr = pygame.Rect(sx1 + idx * (shape_w + shape_gap), current_y, shape_w, shape_h)
-                    if shape == preview_x_shape:
-                        pygame.draw.rect(screen, (90, 160, 90), tr, border_radius=6)
-                        pygame.draw.rect(screen, (255, 255, 255), tr, 2, border_radius=6)
-                    else:
-                        pygame.draw.rect(screen, (40, 40, 40), tr, border_radius=6)
-                        pygame.draw.rect(screen, (120, 120, 120), tr, 2, border_radius=6)
-                    if tr.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=6)
-                        hand_cursor = True
-                    draw_text_center(shape, FONT_SMALL, (255, 255, 255), screen, tr.centerx, tr.centery)
-                    shape_token_rects.append((tr, 'X', shape))
+                    # Player 1 shapes
+                    sx1 = col_left - total_shape_w // 2
+                    for idx, shape in enumerate(SHAPE_OPTIONS):
+                        tr = pygame.Rect(sx1 + idx * (shape_w + shape_gap), current_y, shape_w, shape_h)
+                        if shape == preview_x_shape:
+                            pygame.draw.rect(screen, (90, 160, 90), tr, border_radius=6)
+                            pygame.draw.rect(screen, (255, 255, 255), tr, 2, border_radius=6)
+                        else:
+                            pygame.draw.rect(screen, (40, 40, 40), tr, border_radius=6)
+                            pygame.draw.rect(screen, (120, 120, 120), tr, 2, border_radius=6)
+                        if tr.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=6)
+                            hand_cursor = True
+                        draw_text_center(shape, FONT_SMALL, (255, 255, 255), screen, tr.centerx, tr.centery)
+                        shape_token_rects.append((tr, 'X', shape))
                 
-                # Player 2 shapes
-                sx2 = col_right - total_shape_w // 2
-                for idx, shape in enumerate(SHAPE_OPTIONS):
-                    tr = pygame.Rect(sx2 + idx * (shape_w + shape_gap), current_y, shape_w, shape_h)
-                    if shape == preview_o_shape:
-                        pygame.draw.rect(screen, (90, 160, 90), tr, border_radius=6)
-                        pygame.draw.rect(screen, (255, 255, 255), tr, 2, border_radius=6)
-                    else:
-                        pygame.draw.rect(screen, (40, 40, 40), tr, border_radius=6)
-                        pygame.draw.rect(screen, (120, 120, 120), tr, 2, border_radius=6)
-                    if tr.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=6)
-                        hand_cursor = True
-                    draw_text_center(shape, FONT_SMALL, (255, 255, 255), screen, tr.centerx, tr.centery)
-                    shape_token_rects.append((tr, 'O', shape))
+                    # Player 2 shapes
+                    sx2 = col_right - total_shape_w // 2
+                    for idx, shape in enumerate(SHAPE_OPTIONS):
+                        tr = pygame.Rect(sx2 + idx * (shape_w + shape_gap), current_y, shape_w, shape_h)
+                        if shape == preview_o_shape:
+                            pygame.draw.rect(screen, (90, 160, 90), tr, border_radius=6)
+                            pygame.draw.rect(screen, (255, 255, 255), tr, 2, border_radius=6)
+                        else:
+                            pygame.draw.rect(screen, (40, 40, 40), tr, border_radius=6)
+                            pygame.draw.rect(screen, (120, 120, 120), tr, 2, border_radius=6)
+                        if tr.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), tr, 3, border_radius=6)
+                            hand_cursor = True
+                        draw_text_center(shape, FONT_SMALL, (255, 255, 255), screen, tr.centerx, tr.centery)
+                        shape_token_rects.append((tr, 'O', shape))
                 
-                all_rects["shapes"] = shape_token_rects
-                current_y += 60
-
-            # Collapsible section: Text Color
-            section_header_y = current_y
-            header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
-            header_bg = (50, 50, 70) if settings_collapsed["text_color"] else (50, 40, 50)
-            pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
+                    all_rects["shapes"] = shape_token_rects
+                    current_y += 60
+
+                # Collapsible section: Text Color
+                section_header_y = current_y
+                header_rect = pygame.Rect(WIDTH // 2 - 300, section_header_y, 600, 32)
+                header_bg = (50, 50, 70) if settings_collapsed["text_color"] else (50, 40, 50)
+                pygame.draw.rect(screen, header_bg, header_rect, border_radius=6)
             
-            if header_rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
-                hand_cursor = True
-            else:
-                border_color = (150, 150, 180) if settings_collapsed["text_color"] else (180, 120, 150)
-                pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
+                if header_rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), header_rect, 3, border_radius=6)
+                    hand_cursor = True
+                else:
+                    border_color = (150, 150, 180) if settings_collapsed["text_color"] else (180, 120, 150)
+                    pygame.draw.rect(screen, border_color, header_rect, 2, border_radius=6)
             
-            arrow = "▼" if not settings_collapsed["text_color"] else "▶"
-            arrow_color = (255, 200, 100) if settings_collapsed["text_color"] else (200, 150, 200)
-            draw_text_center(f"{arrow} Text Color", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
-            all_rects["buttons"].append((header_rect, "toggle_text_color"))
-            current_y += 42
-
-            if not settings_collapsed["text_color"]:
-                text_preset_rects = []
-                tp_w = 120
-                tp_h = 38
-                tp_gap = 12
-                total_tp_w = len(text_presets) * tp_w + (len(text_presets) - 1) * tp_gap
-                tp_start_x = WIDTH // 2 - total_tp_w // 2
+                arrow = "▼" if not settings_collapsed["text_color"] else "▶"
+                arrow_color = (255, 200, 100) if settings_collapsed["text_color"] else (200, 150, 200)
+                draw_text_center(f"{arrow} Text Color", FONT_MED, arrow_color, screen, header_rect.centerx, header_rect.centery)
+                all_rects["buttons"].append((header_rect, "toggle_text_color"))
+                current_y += 42
+
+                if not settings_collapsed["text_color"]:
+                    text_preset_rects = []
+                    tp_w = 120
+                    tp_h = 38
+                    tp_gap = 12
+                    total_tp_w = len(text_presets) * tp_w + (len(text_presets) - 1) * tp_gap
+                    tp_start_x = WIDTH // 2 - total_tp_w // 2
                 
-                for idx, (label, col) in enumerate(text_presets):
-                    tx = tp_start_x + idx * (tp_w + tp_gap)
-                    tbr = pygame.Rect(tx, current_y, tp_w, tp_h)
+                    for idx, (label, col) in enumerate(text_presets):
+                        tx = tp_start_x + idx * (tp_w + tp_gap)
+                        tbr = pygame.Rect(tx, current_y, tp_w, tp_h)
                     
-                    if label == "Black text":
-                        bg_col, txt_col = (255, 255, 255), (0, 0, 0)
-                    elif label == "White text":
-                        bg_col, txt_col = (0, 0, 0), (255, 255, 255)
-                    else:
-                        bg_col, txt_col = (0, 0, 0), (200, 200, 200)
+                        if label == "Black text":
+                            bg_col, txt_col = (255, 255, 255), (0, 0, 0)
+                        elif label == "White text":
+                            bg_col, txt_col = (0, 0, 0), (255, 255, 255)
+                        else:
+                            bg_col, txt_col = (0, 0, 0), (200, 200, 200)
                     
-                    pygame.draw.rect(screen, bg_col, tbr)
-                    if tbr.collidepoint(mouse_pos):
-                        pygame.draw.rect(screen, (255, 220, 40), tbr, 3)
-                        hand_cursor = True
-                    else:
-                        pygame.draw.rect(screen, (255, 255, 255), tbr, 2)
-                    draw_text_center(label, FONT_SMALL, txt_col, screen, tbr.centerx, tbr.centery)
-                    text_preset_rects.append((tbr, col))
+                        pygame.draw.rect(screen, bg_col, tbr)
+                        if tbr.collidepoint(mouse_pos):
+                            pygame.draw.rect(screen, (255, 220, 40), tbr, 3)
+                            hand_cursor = True
+                        else:
+                            pygame.draw.rect(screen, (255, 255, 255), tbr, 2)
+                        draw_text_center(label, FONT_SMALL, txt_col, screen, tbr.centerx, tbr.centery)
+                        text_preset_rects.append((tbr, col))
                 
-                all_rects["text_colors"] = text_preset_rects
-                current_y += 60
+                    all_rects["text_colors"] = text_preset_rects
+                    current_y += 60
 
-        # === AUDIO TAB ===
-        elif settings_current_tab == "Audio":
-            current_y = content_y + 30
+            # === AUDIO TAB ===
+            elif settings_current_tab == "Audio":
+                current_y = content_y + 30
             
-            # Effects Volume
-            draw_text_center(f"Sound Effects: {int(EFFECT_VOLUME * 100)}%", FONT_MED, TEXT_COLOR, screen, WIDTH // 2, current_y)
-            current_y += 32
+                # Effects Volume
+                draw_text_center(f"Sound Effects: {int(EFFECT_VOLUME * 100)}%", FONT_MED, TEXT_COLOR, screen, WIDTH // 2, current_y)
+                current_y += 32
             
-            slider_w = int(WIDTH * 0.4)
-            eff_rect = pygame.Rect(WIDTH // 2 - slider_w // 2, current_y, slider_w, 16)
-            pygame.draw.rect(screen, (70, 70, 70), eff_rect, border_radius=6)
-            fill_eff = int(eff_rect.w * EFFECT_VOLUME)
-            pygame.draw.rect(screen, (120, 180, 120), (eff_rect.x, eff_rect.y, fill_eff, eff_rect.h), border_radius=6)
+                slider_w = int(WIDTH * 0.4)
+                eff_rect = pygame.Rect(WIDTH // 2 - slider_w // 2, current_y, slider_w, 16)
+                pygame.draw.rect(screen, (70, 70, 70), eff_rect, border_radius=6)
+                fill_eff = int(eff_rect.w * EFFECT_VOLUME)
+                pygame.draw.rect(screen, (120, 180, 120), (eff_rect.x, eff_rect.y, fill_eff, eff_rect.h), border_radius=6)
             
-            eff_handle_pos = (eff_rect.x + fill_eff, eff_rect.y + eff_rect.h // 2)
-            eff_handle_radius = 12
-            eff_handle_color = (255, 255, 255)
-            if dragging == "eff":
-                eff_handle_color = HIGHLIGHT_COLOR
-                eff_handle_radius = 14
-            pygame.draw.circle(screen, eff_handle_color, eff_handle_pos, eff_handle_radius)
-            if eff_rect.collidepoint(mouse_pos):
-                hand_cursor = True
+                eff_handle_pos = (eff_rect.x + fill_eff, eff_rect.y + eff_rect.h // 2)
+                eff_handle_radius = 12
+                eff_handle_color = (255, 255, 255)
+                if dragging == "eff":
+                    eff_handle_color = HIGHLIGHT_COLOR
+                    eff_handle_radius = 14
+                pygame.draw.circle(screen, eff_handle_color, eff_handle_pos, eff_handle_radius)
+                if eff_rect.collidepoint(mouse_pos):
+                    hand_cursor = True
             
-            all_rects["eff_slider"] = eff_rect
-            current_y += 50
+                all_rects["eff_slider"] = eff_rect
+                current_y += 50
             
-            # Music Volume
-            draw_text_center(f"Music: {int(MUSIC_VOLUME * 100)}%", FONT_MED, TEXT_COLOR, screen, WIDTH // 2, current_y)
-            current_y += 32
+                # Music Volume
+                draw_text_center(f"Music: {int(MUSIC_VOLUME * 100)}%", FONT_MED, TEXT_COLOR, screen, WIDTH // 2, current_y)
+                current_y += 32
             
-            mus_rect = pygame.Rect(WIDTH // 2 - slider_w // 2, current_y, slider_w, 16)
-            pygame.draw.rect(screen, (70, 70, 70), mus_rect, border_radius=6)
-            fill_mus = int(mus_rect.w * MUSIC_VOLUME)
-            pygame.draw.rect(screen, (120, 180, 120), (mus_rect.x, mus_rect.y, fill_mus, mus_rect.h), border_radius=6)
+                mus_rect = pygame.Rect(WIDTH // 2 - slider_w // 2, current_y, slider_w, 16)
+                pygame.draw.rect(screen, (70, 70, 70), mus_rect, border_radius=6)
+                fill_mus = int(mus_rect.w * MUSIC_VOLUME)
+                pygame.draw.rect(screen, (120, 180, 120), (mus_rect.x, mus_rect.y, fill_mus, mus_rect.h), border_radius=6)
             
-            mus_handle_pos = (mus_rect.x + fill_mus, mus_rect.y + mus_rect.h // 2)
-            mus_handle_radius = 12
-            mus_handle_color = (255, 255, 255)
-            if dragging == "mus":
-                mus_handle_color = HIGHLIGHT_COLOR
-                mus_handle_radius = 14
-            pygame.draw.circle(screen, mus_handle_color, mus_handle_pos, mus_handle_radius)
-            if mus_rect.collidepoint(mouse_pos):
-                hand_cursor = True
+                mus_handle_pos = (mus_rect.x + fill_mus, mus_rect.y + mus_rect.h // 2)
+                mus_handle_radius = 12
+                mus_handle_color = (255, 255, 255)
+                if dragging == "mus":
+                    mus_handle_color = HIGHLIGHT_COLOR
+                    mus_handle_radius = 14
+                pygame.draw.circle(screen, mus_handle_color, mus_handle_pos, mus_handle_radius)
+                if mus_rect.collidepoint(mouse_pos):
+                    hand_cursor = True
             
-            all_rects["mus_slider"] = mus_rect
-            current_y += 50
+                all_rects["mus_slider"] = mus_rect
+                current_y += 50
             
-            # Music toggle
-            music_toggle_rect = pygame.Rect(WIDTH // 2 - 60, current_y, 24, 24)
-            pygame.draw.rect(screen, (0, 0, 0), music_toggle_rect)
-            pygame.draw.rect(screen, (255, 255, 255), music_toggle_rect, 2)
-            if music_on:
-                pygame.draw.rect(screen, (50, 200, 80), music_toggle_rect.inflate(-8, -8))
-            if music_toggle_rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), music_toggle_rect, 3)
-                hand_cursor = True
-            draw_text_center("Music On", FONT_MED, TEXT_COLOR, screen, music_toggle_rect.right + 60, music_toggle_rect.centery)
+                # Music toggle
+                music_toggle_rect = pygame.Rect(WIDTH // 2 - 60, current_y, 24, 24)
+                pygame.draw.rect(screen, (0, 0, 0), music_toggle_rect)
+                pygame.draw.rect(screen, (255, 255, 255), music_toggle_rect, 2)
+                if music_on:
+                    pygame.draw.rect(screen, (50, 200, 80), music_toggle_rect.inflate(-8, -8))
+                if music_toggle_rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), music_toggle_rect, 3)
+                    hand_cursor = True
+                draw_text_center("Music On", FONT_MED, TEXT_COLOR, screen, music_toggle_rect.right + 60, music_toggle_rect.centery)
             
-            all_rects["music_toggle"] = music_toggle_rect
+                all_rects["music_toggle"] = music_toggle_rect
 
-        # === GAME TAB ===
-        elif settings_current_tab == "Game":
-            current_y = content_y + 30
+            # === GAME TAB ===
+            elif settings_current_tab == "Game":
+                current_y = content_y + 30
             
-            # Board size
-            draw_text_center("Board Size", FONT_MED, TEXT_COLOR, screen, WIDTH // 2, current_y)
-            current_y += 36
+                # Board size
+                draw_text_center("Board Size", FONT_MED, TEXT_COLOR, screen, WIDTH // 2, current_y)
+                current_y += 36
             
-            sz_w = 140
-            sz_h = 36
-            sz1_rect = pygame.Rect(WIDTH // 2 - sz_w - 10, current_y, sz_w, sz_h)
-            sz2_rect = pygame.Rect(WIDTH // 2 + 10, current_y, sz_w, sz_h)
+                sz_w = 140
+                sz_h = 36
+                sz1_rect = pygame.Rect(WIDTH // 2 - sz_w - 10, current_y, sz_w, sz_h)
+                sz2_rect = pygame.Rect(WIDTH // 2 + 10, current_y, sz_w, sz_h)
             
-            for rect, label, size in [(sz1_rect, "Classic (3x3)", 3), (sz2_rect, "Connect 4 (4x4)", 4)]:
-                if GAME_SIZE == size:
-                    pygame.draw.rect(screen, (90, 160, 90), rect, border_radius=8)
-                    pygame.draw.rect(screen, (255, 255, 255), rect, 2, border_radius=8)
-                else:
-                    pygame.draw.rect(screen, (50, 50, 50), rect, border_radius=8)
-                    pygame.draw.rect(screen, (120, 120, 120), rect, 2, border_radius=8)
-                if rect.collidepoint(mouse_pos):
-                    pygame.draw.rect(screen, (255, 220, 40), rect, 3, border_radius=8)
-                    hand_cursor = True
-                draw_text_center(label, FONT_SMALL, (255, 255, 255), screen, rect.centerx, rect.centery)
+                for rect, label, size in [(sz1_rect, "Classic (3x3)", 3), (sz2_rect, "Connect 4 (4x4)", 4)]:
+                    if GAME_SIZE == size:
+                        pygame.draw.rect(screen, (90, 160, 90), rect, border_radius=8)
+                        pygame.draw.rect(screen, (255, 255, 255), rect, 2, border_radius=8)
+                    else:
+                        pygame.draw.rect(screen, (50, 50, 50), rect, border_radius=8)
+                        pygame.draw.rect(screen, (120, 120, 120), rect, 2, border_radius=8)
+                    if rect.collidepoint(mouse_pos):
+                        pygame.draw.rect(screen, (255, 220, 40), rect, 3, border_radius=8)
+                        hand_cursor = True
+                    draw_text_center(label, FONT_SMALL, (255, 255, 255), screen, rect.centerx, rect.centery)
             
-            all_rects["size_btns"] = [sz1_rect, sz2_rect]
-            current_y += 66
+                all_rects["size_btns"] = [sz1_rect, sz2_rect]
+                current_y += 66
             
-            # Reset Scores button
-            reset_scores_rect = pygame.Rect(WIDTH // 2 - 90, current_y, 180, 42)
-            pygame.draw.rect(screen, (120, 20, 120), reset_scores_rect, border_radius=8)
-            if reset_scores_rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), reset_scores_rect, 3, border_radius=8)
-                hand_cursor = True
-            else:
-                pygame.draw.rect(screen, (255, 255, 255), reset_scores_rect, 2, border_radius=8)
-            draw_text_center("Reset Scores", FONT_MED, (255, 255, 255), screen, reset_scores_rect.centerx, reset_scores_rect.centery)
-            all_rects["reset_scores"] = reset_scores_rect
-
-        # Bottom buttons: Save, Reset, Back
-        btn_y = HEIGHT - 80
-        btn_w = 130
-        btn_h = 44
-        btn_gap = 16
-        total_btn_w = btn_w * 3 + btn_gap * 2
-        btn_start_x = WIDTH // 2 - total_btn_w // 2
+                # Reset Scores button
+                reset_scores_rect = pygame.Rect(WIDTH // 2 - 90, current_y, 180, 42)
+                pygame.draw.rect(screen, (120, 20, 120), reset_scores_rect, border_radius=8)
+                if reset_scores_rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), reset_scores_rect, 3, border_radius=8)
+                    hand_cursor = True
+                else:
+                    pygame.draw.rect(screen, (255, 255, 255), reset_scores_rect, 2, border_radius=8)
+                draw_text_center("Reset Scores", FONT_MED, (255, 255, 255), screen, reset_scores_rect.centerx, reset_scores_rect.centery)
+                all_rects["reset_scores"] = reset_scores_rect
+
+            # Bottom buttons: Save, Reset, Back
+            btn_y = HEIGHT - 80
+            btn_w = 130
+            btn_h = 44
+            btn_gap = 16
+            total_btn_w = btn_w * 3 + btn_gap * 2
+            btn_start_x = WIDTH // 2 - total_btn_w // 2
         
-        save_rect = pygame.Rect(btn_start_x, btn_y, btn_w, btn_h)
-        reset_rect = pygame.Rect(btn_start_x + btn_w + btn_gap, btn_y, btn_w, btn_h)
-        back_rect = pygame.Rect(btn_start_x + (btn_w + btn_gap) * 2, btn_y, btn_w, btn_h)
+            save_rect = pygame.Rect(btn_start_x, btn_y, btn_w, btn_h)
+            reset_rect = pygame.Rect(btn_start_x + btn_w + btn_gap, btn_y, btn_w, btn_h)
+            back_rect = pygame.Rect(btn_start_x + (btn_w + btn_gap) * 2, btn_y, btn_w, btn_h)
         
-        unsaved_shapes = has_unsaved_shape_changes(X_SHAPE, O_SHAPE, preview_x_shape, preview_o_shape)
+            unsaved_shapes = has_unsaved_shape_changes(X_SHAPE, O_SHAPE, preview_x_shape, preview_o_shape)
         
-        for rect, label, color in [
-            (save_rect, "Save" + (" *" if unsaved_shapes else ""), (60, 180, 60)),
-            (reset_rect, "Reset Settings", (80, 80, 200)),
-            (back_rect, "Back", (180, 60, 60))
-        ]:
-            if pressed_button == label.split()[0].lower():
-                color = tuple(max(0, c - 40) for c in color)
-            pygame.draw.rect(screen, color, rect, border_radius=8)
-            if rect.collidepoint(mouse_pos):
-                pygame.draw.rect(screen, (255, 220, 40), rect, 3, border_radius=8)
-                hand_cursor = True
-            else:
-                pygame.draw.rect(screen, (255, 255, 255), rect, 2, border_radius=8)
-            # Use smaller font for Reset Settings button to fit text
-            font_to_use = FONT_SMALL if "Reset Settings" in label else FONT_MED
-            draw_text_center(label, font_to_use, (255, 255, 255), screen, rect.centerx, rect.centery)
+            for rect, label, color in [
+                (save_rect, "Save" + (" *" if unsaved_shapes else ""), (60, 180, 60)),
+                (reset_rect, "Reset Settings", (80, 80, 200)),
+                (back_rect, "Back", (180, 60, 60))
+            ]:
+                if pressed_button == label.split()[0].lower():
+                    color = tuple(max(0, c - 40) for c in color)
+                pygame.draw.rect(screen, color, rect, border_radius=8)
+                if rect.collidepoint(mouse_pos):
+                    pygame.draw.rect(screen, (255, 220, 40), rect, 3, border_radius=8)
+                    hand_cursor = True
+                else:
+                    pygame.draw.rect(screen, (255, 255, 255), rect, 2, border_radius=8)
+                # Use smaller font for Reset Settings button to fit text
+                font_to_use = FONT_SMALL if "Reset Settings" in label else FONT_MED
+                draw_text_center(label, font_to_use, (255, 255, 255), screen, rect.centerx, rect.centery)
         
-        all_rects["save"] = save_rect
-        all_rects["reset"] = reset_rect
-        all_rects["back"] = back_rect
+            all_rects["save"] = save_rect
+            all_rects["reset"] = reset_rect
+            all_rects["back"] = back_rect
 
-        # Set cursor
-        try:
-            if hand_cursor:
-                pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
-            else:
-                pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_ARROW))
-        except Exception:
-            pass
+            # Set cursor
+            try:
+                if hand_cursor:
+                    pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
+                else:
+                    pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_ARROW))
+            except Exception:
+                pass
 
-        # Display input text overlay when typing in RGB boxes
-        if selected_input:
-            target, idx = selected_input
-            # Find the corresponding input box rect
-            if target in all_rects.get("inputs", {}):
-                input_rects = all_rects["inputs"][target]
-                if idx < len(input_rects):
-                    input_box = input_rects[idx]
-                    # Draw the input text in the box (highlighted)
-                    pygame.draw.rect(screen, (60, 60, 100), input_box)
-                    pygame.draw.rect(screen, (255, 220, 40), input_box, 2)
-                    # Display the input_text being typed (blank if empty)
-                    if input_text:
-                        draw_text_center(input_text, FONT_SMALL, (255, 255, 100), screen, input_box.centerx, input_box.centery)
+            # Display input text overlay when typing in RGB boxes
+            if selected_input:
+                target, idx = selected_input
+                # Find the corresponding input box rect
+                if target in all_rects.get("inputs", {}):
+                    input_rects = all_rects["inputs"][target]
+                    if idx < len(input_rects):
+                        input_box = input_rects[idx]
+                        # Draw the input text in the box (highlighted)
+                        pygame.draw.rect(screen, (60, 60, 100), input_box)
+                        pygame.draw.rect(screen, (255, 220, 40), input_box, 2)
+                        # Display the input_text being typed (blank if empty)
+                        if input_text:
+                            draw_text_center(input_text, FONT_SMALL, (255, 255, 100), screen, input_box.centerx, input_box.centery)
 
-        present()
+            present()
 
         # Event handling
-        for event in pygame.event.get():
+        pending_drag_pos = None
+        events = pygame.event.get()
+        if events:
+            dirty = True
+        for event in events:
             if event.type == pygame.VIDEORESIZE:
                 set_display_mode(event.w, event.h, full=fullscreen)
                 break
             if event.type == pygame.QUIT:
-                save_settings(); pygame.quit(); sys.exit()
+                flush_settings(); pygame.quit(); sys.exit()
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 try:
@@ -3369,22 +3797,16 @@ def settings_screen():
                 if "eff_slider" in all_rects and all_rects["eff_slider"].collidepoint(mx, my):
                     dragging = "eff"
                     EFFECT_VOLUME = clamp01((mx - all_rects["eff_slider"].x) / all_rects["eff_slider"].w)
-                    try:
-                        for s in SOUNDS.values():
-                            if s: s.set_volume(EFFECT_VOLUME)
-                    except Exception:
-                        pass
-                    play_sound('menu_select')
+                    mark_settings_dirty()
+                    play_sound('menu')
                     continue
                 
                 if "mus_slider" in all_rects and all_rects["mus_slider"].collidepoint(mx, my):
                     dragging = "mus"
                     MUSIC_VOLUME = clamp01((mx - all_rects["mus_slider"].x) / all_rects["mus_slider"].w)
-                    try:
-                        pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                    except Exception:
-                        pass
-                    play_sound('menu_select')
+                    mark_settings_dirty()
+                    apply_music_volume()
+                    play_sound('menu')
                     continue
                 
                 # Music toggle
@@ -3466,17 +3888,9 @@ def settings_screen():
                 
                 # Theme buttons
                 if "themes" in all_rects:
-                    for rect, theme_name in all_rects["themes"]:
+                    for rect, theme_idx in all_rects["themes"]:
                         if rect.collidepoint(mx, my):
-                            theme = THEMES[theme_name]
-                            X_COLOR = theme["x_color"]
-                            O_COLOR = theme["o_color"]
-                            BG_COLOR = theme["bg_color"]
-                            TEXT_COLOR = theme["text_color"]
-                            LINE_COLOR = theme["line_color"]
-                            x_rels = rgb_to_rels(X_COLOR)
-                            o_rels = rgb_to_rels(O_COLOR)
-                            bg_rels = rgb_to_rels(BG_COLOR)
+                            _, X_COLOR, O_COLOR, BG_COLOR, TEXT_COLOR, LINE_COLOR = _THEMES[theme_idx]
                             play_sound('menu')
                             break
                 
@@ -3537,15 +3951,7 @@ def settings_screen():
                     TEXT_COLOR = DEFAULT_TEXT_COLOR
                     EFFECT_VOLUME = 1.0
                     MUSIC_VOLUME = 1.0
-                    x_rels = rgb_to_rels(X_COLOR)
-                    o_rels = rgb_to_rels(O_COLOR)
-                    bg_rels = rgb_to_rels(BG_COLOR)
-                    try:
-                        for s in SOUNDS.values():
-                            if s: s.set_volume(EFFECT_VOLUME)
-                        pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                    except Exception:
-                        pass
+                    apply_music_volume()
                     play_sound('menu')
                 elif pressed_button == 'reset_scores' and "reset_scores" in all_rects and all_rects["reset_scores"].collidepoint(mx, my):
                     # Show confirmation dialog before resetting scores
@@ -3555,33 +3961,22 @@ def settings_screen():
                     else:
                         play_sound('menu')
                 elif pressed_button == 'back' and all_rects["back"].collidepoint(mx, my):
+                    flush_settings()
                     play_sound('menu')
                     return
                 
+                # end of a slider drag: apply any motion from this batch, then persist once
+                if dragging is not None:
+                    if pending_drag_pos is not None:
+                        apply_drag(pending_drag_pos[0])
+                        pending_drag_pos = None
+                    flush_settings()
                 pressed_button = None
                 dragging = None
 
             elif event.type == pygame.MOUSEMOTION:
-                mx, my = event.pos
-                if dragging == "eff" and "eff_slider" in all_rects:
-                    EFFECT_VOLUME = clamp01((mx - all_rects["eff_slider"].x) / all_rects["eff_slider"].w)
-                    try:
-                        for s in SOUNDS.values():
-                            if s: s.set_volume(EFFECT_VOLUME)
-                    except Exception:
-                        pass
-                elif dragging == "mus" and "mus_slider" in all_rects:
-                    MUSIC_VOLUME = clamp01((mx - all_rects["mus_slider"].x) / all_rects["mus_slider"].w)
-                    try:
-                        pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                    except Exception:
-                        pass
-                elif isinstance(dragging, tuple) and "sliders" in all_rects:
-                    target, idx = dragging
-                    if target in all_rects["sliders"] and idx < len(all_rects["sliders"][target]):
-                        rect, base_x = all_rects["sliders"][target][idx]
-                        new_color = update_color_from_mouse(target, idx, mx, base_x, rect.w)
-                        set_color(target, new_color)
+                # only the latest position matters; applied once after the event batch
+                pending_drag_pos = event.pos
 
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
@@ -3604,6 +3999,7 @@ def settings_screen():
                             input_text += ch
                 else:
                     if event.key == pygame.K_ESCAPE:
+                        # several settings edits don't mark dirty; leaving the screen is the commit point
                         save_settings()
                         try:
                             force_reinit_display()
@@ -3611,13 +4007,63 @@ def settings_screen():
                             pass
                         return
 
+        if dragging is not None and pending_drag_pos is not None:
+            apply_drag(pending_drag_pos[0])
+        # motion events are only queued while a slider is being dragged
+        set_motion_events(dragging is not None)
+
         clock.tick(60)
 
 # -------------------------
 # Play loop & events
 # -------------------------
+# High-volume event types no loop here handles. Blocking them keeps SDL from
+# queueing (and pygame from allocating) an Event object per mouse move.
+# Window/resize events are deliberately left alone: VIDEORESIZE and the
+# SCALED display path depend on them. TEXTINPUT stays too, since KEYDOWN's
+# .unicode (typed RGB values) is filled from it. That is also why this is a
+# blocklist rather than set_blocked(None) plus an allowlist: the window events
+# pygame and SDL rely on vary by version. Loops still drain the whole
+# queue with event.get(): a type-filtered get() would leave everything else
+# queued until SDL's queue fills and starts dropping events, QUIT included.
+_UNUSED_EVENT_TYPES = [getattr(pygame, name) for name in (
+    "KEYUP", "MOUSEWHEEL", "JOYAXISMOTION", "JOYBALLMOTION", "JOYHATMOTION",
+    "JOYBUTTONDOWN", "JOYBUTTONUP", "JOYDEVICEADDED", "JOYDEVICEREMOVED",
+    "CONTROLLERAXISMOTION", "CONTROLLERBUTTONDOWN", "CONTROLLERBUTTONUP",
+    "CONTROLLERDEVICEADDED", "CONTROLLERDEVICEREMOVED", "CONTROLLERDEVICEREMAPPED",
+    "CONTROLLERTOUCHPADDOWN", "CONTROLLERTOUCHPADMOTION", "CONTROLLERTOUCHPADUP",
+    "CONTROLLERSENSORUPDATE", "FINGERMOTION", "FINGERDOWN", "FINGERUP", "MULTIGESTURE",
+    "TEXTEDITING", "AUDIODEVICEADDED", "AUDIODEVICEREMOVED", "DROPFILE", "DROPTEXT",
+    "DROPBEGIN", "DROPCOMPLETE", "CLIPBOARDUPDATE", "KEYMAPCHANGED", "LOCALECHANGED",
+    "SYSWMEVENT") if hasattr(pygame, name)]
+_motion_events_enabled = True
+
+def set_motion_events(enabled):
+    """Allow MOUSEMOTION into the queue only while something consumes it (slider drags).
+    Hover effects poll pygame.mouse.get_pos() and don't need the events."""
+    global _motion_events_enabled
+    if enabled == _motion_events_enabled:
+        return
+    try:
+        if enabled:
+            pygame.event.set_allowed(pygame.MOUSEMOTION)
+        else:
+            pygame.event.set_blocked(pygame.MOUSEMOTION)
+        _motion_events_enabled = enabled
+    except Exception:
+        pass
+
+def restrict_event_queue():
+    """Block event types that are never handled so event.get() only returns useful events."""
+    try:
+        pygame.event.set_blocked(_UNUSED_EVENT_TYPES)
+    except Exception:
+        pass
+    set_motion_events(False)
+
 def play_one_game():
     global player, _volume_changed_time, game_mode, move_history, game_start_time, move_count
+    global DEBUG_DISPLAY_OVERLAY
     
     # ensure board is sized correctly before starting
     try:
@@ -3634,106 +4080,162 @@ def play_one_game():
     move_history = []
     move_count = 0
     game_start_time = pygame.time.get_ticks()
-    for r in range(BOARD_ROWS):
-        for c in range(BOARD_COLS):
-            board[r][c] = None
+    new_board()
     
     # Button dimensions (constant)
     menu_btn_w, menu_btn_h = 180, 45
     new_game_btn_w, new_game_btn_h = 140, 45
     undo_btn_w, undo_btn_h = 120, 45
     btn_gap = 20  # Gap between buttons
+    total_btn_width = menu_btn_w + new_game_btn_w + undo_btn_w + (2 * btn_gap)
+    btn_layout_size = None
+
+    # set once the game is decided; the loop then only runs the end animation
+    end_anim = None
+    end_message = None
+    # set by any handled event; see the redraw check in the loop
+    dirty = True
+    last_frame_key = None
+    overlay_was_active = False
+    last_tooltip_rect = None
+    # ensure bgm is playing for this game; nothing in the loop stops it
+    start_bgm(loop=True)
+    # the mode is fixed for the whole game (leaving it returns), so the
+    # click handler branches on these instead of comparing strings per click
+    vs_ai = game_mode in AI_MODES
+    ai_move = {"AI_EASY": ai_move_easy, "AI_MEDIUM": ai_move_medium}.get(game_mode)
     
     while running:
-        # always ensure bgm is playing per user's selection 1
-        start_bgm(loop=True)
-        draw_lines(); draw_figures(); display_scoreboard()
-        display_volume_hud_if_needed()
-        display_undo_feedback()
-        
-        # Recalculate button positions every frame (so they stay centered after fullscreen toggle)
-        total_btn_width = menu_btn_w + new_game_btn_w + undo_btn_w + (2 * btn_gap)
-        start_x = (WIDTH - total_btn_width) // 2
-        btn_y = HEIGHT - 70
-        
-        # Position buttons from left to right
-        menu_btn_x = start_x
-        back_to_menu_rect = pygame.Rect(menu_btn_x, btn_y, menu_btn_w, menu_btn_h)
-        
-        new_game_btn_x = menu_btn_x + menu_btn_w + btn_gap
-        new_game_rect = pygame.Rect(new_game_btn_x, btn_y, new_game_btn_w, new_game_btn_h)
+        if end_anim is not None:
+            if advance_end_animation(end_anim, pygame.time.get_ticks()):
+                return end_screen_loop(end_message)
+            present(end_anim["update_rects"])
+            # keep servicing the window while the animation plays; board clicks are ignored
+            for event in pygame.event.get():
+                if event.type == pygame.VIDEORESIZE:
+                    set_display_mode(event.w, event.h, full=fullscreen)
+                elif event.type == pygame.QUIT:
+                    flush_settings(); pygame.quit(); sys.exit()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                    toggle_fullscreen()
+            clock.tick(60)
+            continue
         
-        undo_btn_x = new_game_btn_x + new_game_btn_w + btn_gap
-        undo_rect = pygame.Rect(undo_btn_x, btn_y, undo_btn_w, undo_btn_h)
+        # Recalculate button positions when the window size changes (so they
+        # stay centered after fullscreen toggle or resize)
+        if btn_layout_size != (WIDTH, HEIGHT):
+            btn_layout_size = (WIDTH, HEIGHT)
+            start_x = (WIDTH - total_btn_width) // 2
+            btn_y = HEIGHT - 70
+            
+            # Position buttons from left to right
+            menu_btn_x = start_x
+            back_to_menu_rect = pygame.Rect(menu_btn_x, btn_y, menu_btn_w, menu_btn_h)
+            
+            new_game_btn_x = menu_btn_x + menu_btn_w + btn_gap
+            new_game_rect = pygame.Rect(new_game_btn_x, btn_y, new_game_btn_w, new_game_btn_h)
+            
+            undo_btn_x = new_game_btn_x + new_game_btn_w + btn_gap
+            undo_rect = pygame.Rect(undo_btn_x, btn_y, undo_btn_w, undo_btn_h)
         
-        # Draw "Back to Main Menu" button with hover effect
+        # Redraw only when something visible can have changed: an event was
+        # handled, the mouse moved (hover), the clock ticked over a second, or
+        # a timed overlay / post-reinit counter is active.
         mouse_pos = map_mouse_pos(pygame.mouse.get_pos())
-        pygame.draw.rect(screen, (180,60,60), back_to_menu_rect, border_radius=8)
-        # Yellow border on hover
-        if back_to_menu_rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, (255,220,40), back_to_menu_rect, 3, border_radius=8)
-            try:
-                pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
-            except Exception:
-                pass
-        else:
-            pygame.draw.rect(screen, (255,255,255), back_to_menu_rect, 2, border_radius=8)
-        draw_text_center("Back to Menu", FONT_SMALL, (255,255,255), screen, back_to_menu_rect.centerx, back_to_menu_rect.centery)
-        
-        # Draw "New Game" button with hover effect
-        pygame.draw.rect(screen, (60,180,60), new_game_rect, border_radius=8)
-        if new_game_rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, (255,220,40), new_game_rect, 3, border_radius=8)
-            try:
-                pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
-            except Exception:
-                pass
-        else:
-            pygame.draw.rect(screen, (255,255,255), new_game_rect, 2, border_radius=8)
-        draw_text_center("New Game", FONT_SMALL, (255,255,255), screen, new_game_rect.centerx, new_game_rect.centery)
+        now = pygame.time.get_ticks()
+        frame_key = (mouse_pos, (now - game_start_time) // 1000, screen.get_size(), id(screen))
+        overlay_active = timed_overlays_active(now)
+        # one extra frame after an overlay expires so it gets erased
+        if dirty or overlay_active or overlay_was_active or frame_key != last_frame_key:
+            # Frames caused only by the pointer moving or the clock ticking change
+            # nothing but the button strip, the tooltips and the clock; present
+            # just those areas. Everything else presents the whole frame.
+            partial = not (dirty or overlay_active or overlay_was_active
+                           or last_frame_key is None or frame_key[2:] != last_frame_key[2:])
+            dirty = False
+            last_frame_key = frame_key
+            overlay_was_active = overlay_active
+            draw_board(); display_scoreboard()
+            # one clock read per frame, shared with the redraw check above
+            display_volume_hud_if_needed(now)
+            display_undo_feedback(now)
+
+            # Draw "Back to Main Menu" button with hover effect
+            pygame.draw.rect(screen, (180,60,60), back_to_menu_rect, border_radius=8)
+            # Yellow border on hover
+            if back_to_menu_rect.collidepoint(mouse_pos):
+                pygame.draw.rect(screen, (255,220,40), back_to_menu_rect, 3, border_radius=8)
+                try:
+                    pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
+                except Exception:
+                    pass
+            else:
+                pygame.draw.rect(screen, (255,255,255), back_to_menu_rect, 2, border_radius=8)
+            draw_text_center("Back to Menu", FONT_SMALL, (255,255,255), screen, back_to_menu_rect.centerx, back_to_menu_rect.centery)
         
-        # Draw "Undo" button with hover effect
-        undo_available = len(move_history) > 0
-        undo_color = (80, 120, 180) if undo_available else (60, 60, 60)
-        pygame.draw.rect(screen, undo_color, undo_rect, border_radius=8)
-        if undo_available and undo_rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, (255,220,40), undo_rect, 3, border_radius=8)
-            try:
-                pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
-            except Exception:
-                pass
-        else:
-            outline_color = (255,255,255) if undo_available else (100,100,100)
-            pygame.draw.rect(screen, outline_color, undo_rect, 2, border_radius=8)
-            if not back_to_menu_rect.collidepoint(mouse_pos) and not undo_rect.collidepoint(mouse_pos):
+            # Draw "New Game" button with hover effect
+            pygame.draw.rect(screen, (60,180,60), new_game_rect, border_radius=8)
+            if new_game_rect.collidepoint(mouse_pos):
+                pygame.draw.rect(screen, (255,220,40), new_game_rect, 3, border_radius=8)
                 try:
-                    pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_ARROW))
+                    pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
                 except Exception:
                     pass
-        undo_text_color = (255,255,255) if undo_available else (120,120,120)
-        draw_text_center("Undo (Ctrl+Z)", FONT_SMALL, undo_text_color, screen, undo_rect.centerx, undo_rect.centery)
+            else:
+                pygame.draw.rect(screen, (255,255,255), new_game_rect, 2, border_radius=8)
+            draw_text_center("New Game", FONT_SMALL, (255,255,255), screen, new_game_rect.centerx, new_game_rect.centery)
         
-        # Draw tooltips for buttons on hover
-        mx, my = mouse_pos
-        if back_to_menu_rect.collidepoint(mouse_pos):
-            draw_tooltip("Return to main menu", mx, my)
-        elif new_game_rect.collidepoint(mouse_pos):
-            draw_tooltip("Start a fresh game with same mode", mx, my)
-        elif undo_rect.collidepoint(mouse_pos):
-            if undo_available:
-                tooltip_text = "Undo last move (undoes AI move too)" if game_mode in ["AI_EASY", "AI_MEDIUM", "AI_HARD"] else "Undo last move"
-                draw_tooltip(tooltip_text, mx, my)
+            # Draw "Undo" button with hover effect
+            undo_available = len(move_history) > 0
+            undo_color = (80, 120, 180) if undo_available else (60, 60, 60)
+            pygame.draw.rect(screen, undo_color, undo_rect, border_radius=8)
+            if undo_available and undo_rect.collidepoint(mouse_pos):
+                pygame.draw.rect(screen, (255,220,40), undo_rect, 3, border_radius=8)
+                try:
+                    pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_HAND))
+                except Exception:
+                    pass
             else:
-                draw_tooltip("No moves to undo", mx, my)
+                outline_color = (255,255,255) if undo_available else (100,100,100)
+                pygame.draw.rect(screen, outline_color, undo_rect, 2, border_radius=8)
+                if not back_to_menu_rect.collidepoint(mouse_pos) and not undo_rect.collidepoint(mouse_pos):
+                    try:
+                        pygame.mouse.set_cursor(pygame.cursors.Cursor(pygame.SYSTEM_CURSOR_ARROW))
+                    except Exception:
+                        pass
+            undo_text_color = (255,255,255) if undo_available else (120,120,120)
+            draw_text_center("Undo (Ctrl+Z)", FONT_SMALL, undo_text_color, screen, undo_rect.centerx, undo_rect.centery)
         
-        present()
+            # Draw tooltips for buttons on hover
+            mx, my = mouse_pos
+            tooltip_rect = None
+            if back_to_menu_rect.collidepoint(mouse_pos):
+                tooltip_rect = draw_tooltip("Return to main menu", mx, my)
+            elif new_game_rect.collidepoint(mouse_pos):
+                tooltip_rect = draw_tooltip("Start a fresh game with same mode", mx, my)
+            elif undo_rect.collidepoint(mouse_pos):
+                if undo_available:
+                    tooltip_text = "Undo last move (undoes AI move too)" if vs_ai else "Undo last move"
+                    tooltip_rect = draw_tooltip(tooltip_text, mx, my)
+                else:
+                    tooltip_rect = draw_tooltip("No moves to undo", mx, my)
+        
+            if partial:
+                # hovered buttons are drawn inflated by up to 8px
+                update_rects = [back_to_menu_rect.union(new_game_rect).union(undo_rect).inflate(16, 16)]
+                update_rects += [r for r in (_TIME_RECT, tooltip_rect, last_tooltip_rect) if r is not None]
+                present(update_rects)
+            else:
+                present()
+            last_tooltip_rect = tooltip_rect
+        volume_delta = 0.0
         for event in pygame.event.get():
+            dirty = True
             if event.type == pygame.VIDEORESIZE:
                 set_display_mode(event.w, event.h, full=fullscreen)
-                draw_lines(); draw_figures(); display_scoreboard(); present()
                 continue
             if event.type == pygame.QUIT:
-                save_settings(); pygame.quit(); sys.exit()
+                flush_settings(); pygame.quit(); sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 try:
                     if _SKIP_INPUT_FRAMES > 0:
@@ -3759,16 +4261,14 @@ def play_one_game():
                     move_history = []
                     move_count = 0
                     game_start_time = pygame.time.get_ticks()
-                    for r in range(BOARD_ROWS):
-                        for c in range(BOARD_COLS):
-                            board[r][c] = None
+                    new_board()
                     play_sound('menu')
                     continue
                 
                 # Check if "Back to Main Menu" button was clicked
                 if back_to_menu_rect.collidepoint(mx, my):
                     game_mode = None
-                    save_settings()
+                    flush_settings()
                     try:
                         force_reinit_display()
                     except Exception:
@@ -3776,53 +4276,42 @@ def play_one_game():
                     return False
                 
                 # map to board coords (support variable board size)
-                if BOARD_LEFT <= mx < BOARD_LEFT + BOARD_COLS * SQUARE_SIZE and BOARD_TOP <= my < BOARD_TOP + BOARD_ROWS * SQUARE_SIZE:
-                    cell_x = (mx - BOARD_LEFT) // SQUARE_SIZE
-                    cell_y = (my - BOARD_TOP) // SQUARE_SIZE
-                    if game_mode == "PVP":
+                cell = cell_at(mx, my)
+                if cell is not None:
+                    cell_y, cell_x = cell
+                    if not vs_ai:
                         if available_square(cell_y, cell_x):
                             mark_square(cell_y, cell_x, player)
                             play_sound('move')
-                            if check_win(player):
-                                win_cells = get_winning_line(player)
-                                draw_winning_line(win_cells); draw_pulsing_circles(win_cells)
-                                handle_win(player)
-                                draw_lines(); draw_figures(); display_scoreboard(); present()
-                                pygame.time.delay(600)  # Brief celebratory pause
-                                save_settings(); return end_screen_loop(get_win_message(player, game_mode))
+                            # one mask scan: the winning cells double as the win test
+                            win_line = get_winning_line(player)
+                            if win_line:
+                                end_anim, end_message = finish_game(player, win_line)
+                                break
                             elif is_board_full():
-                                handle_draw(); draw_lines(); draw_figures(); display_scoreboard(); present()
-                                pygame.time.delay(400)  # Brief pause for draw
-                                save_settings(); return end_screen_loop(get_draw_message())
+                                end_anim, end_message = finish_game(None)
+                                break
                             else:
                                 player = "O" if player == "X" else "X"
-                    elif game_mode in ("AI_EASY", "AI_MEDIUM", "AI_HARD"):
+                    else:
                         if available_square(cell_y, cell_x):
                             mark_square(cell_y, cell_x, player)
                             play_sound('move')
-                            if check_win("X"):
-                                win_cells = get_winning_line("X")
-                                draw_winning_line(win_cells); draw_pulsing_circles(win_cells)
-                                handle_win("X")
-                                draw_lines(); draw_figures(); display_scoreboard(); present()
-                                pygame.time.delay(600)  # Brief celebratory pause
-                                save_settings(); return end_screen_loop(get_win_message("X", game_mode))
+                            win_line = get_winning_line("X")
+                            if win_line:
+                                end_anim, end_message = finish_game("X", win_line)
+                                break
                             elif is_board_full():
-                                handle_draw(); draw_lines(); draw_figures(); display_scoreboard(); present()
-                                pygame.time.delay(400)  # Brief pause for draw
-                                save_settings(); return end_screen_loop(get_draw_message())
+                                end_anim, end_message = finish_game(None)
+                                break
                             # AI turn
-                            if game_mode == "AI_EASY":
-                                ai_move_easy()
-                            elif game_mode == "AI_MEDIUM":
-                                ai_move_medium()
+                            if ai_move is not None:
+                                ai_move()
                             else:
                                 # Show loading indicator for Hard mode
                                 if BOARD_ROWS >= 4:
                                     # Draw "AI Thinking..." overlay
-                                    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                                    overlay.fill((0, 0, 0, 160))
-                                    screen.blit(overlay, (0, 0))
+                                    screen.blit(dim_layer(160), (0, 0))
                                     
                                     # Draw loading box
                                     box_w, box_h = 300, 100
@@ -3850,39 +4339,36 @@ def play_one_game():
                                     present()
                                 
                                 ai_move_hard()
-                            if check_win("O"):
-                                win_cells = get_winning_line("O")
-                                draw_winning_line(win_cells); draw_pulsing_circles(win_cells)
-                                handle_win("O")
-                                draw_lines(); draw_figures(); display_scoreboard(); present()
-                                pygame.time.delay(600)  # Brief pause to show AI victory
-                                save_settings(); return end_screen_loop(get_win_message("O", game_mode))
+                            win_line = get_winning_line("O")
+                            if win_line:
+                                end_anim, end_message = finish_game("O", win_line)
+                                break
                             elif is_board_full():
-                                handle_draw(); draw_lines(); draw_figures(); display_scoreboard(); present()
-                                pygame.time.delay(400)  # Brief pause for draw
-                                save_settings(); return end_screen_loop(get_draw_message())
+                                end_anim, end_message = finish_game(None)
+                                break
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
                     toggle_fullscreen()
-                    draw_lines(); draw_figures(); display_scoreboard(); present()
                     continue
                 # Ctrl+Z to undo move
                 if (pygame.key.get_mods() & pygame.KMOD_CTRL) and event.key == pygame.K_z:
                     if undo_last_move():
                         play_sound('menu')
-                        draw_lines(); draw_figures(); display_scoreboard(); present()
                     continue
                 # Ctrl+D toggles debug overlay
                 if (pygame.key.get_mods() & pygame.KMOD_CTRL) and event.key == pygame.K_d:
-                    global DEBUG_DISPLAY_OVERLAY
                     DEBUG_DISPLAY_OVERLAY = not DEBUG_DISPLAY_OVERLAY
                     play_sound('menu')
                     continue
                 if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
-                    change_volume(-0.05)
+                    volume_delta -= 0.05
                 elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
-                    change_volume(0.05)
-        pygame.time.delay(8)
+                    volume_delta += 0.05
+        # key repeats queue several volume steps per frame; apply them as one change
+        if volume_delta:
+            change_volume(volume_delta)
+        # frame pacing: the loop body draws and presents exactly once per tick
+        clock.tick(60)
     return False
 
 # -------------------------
@@ -3892,7 +4378,7 @@ def display_end_options(message):
     screen.fill(END_BG)
     
     # Display message with slight animation on first frame
-    result = FONT_LARGE.render(message, True, TEXT_COLOR)
+    result = render_cached(message, FONT_LARGE, TEXT_COLOR)
     screen.blit(result, (WIDTH//2 - result.get_width()//2, HEIGHT//2 - 120))
     
     # Get mouse position for hover detection
@@ -3952,64 +4438,100 @@ def end_screen_loop(message):
     global game_mode, running
     global DEBUG_DISPLAY_OVERLAY
     clock = pygame.time.Clock()
-    while True:
-        # Redraw the end screen every frame to show hover effects
-        restart_rect, menu_rect = display_end_options(message)
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                save_settings(); pygame.quit(); sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                try:
-                    if _SKIP_INPUT_FRAMES > 0:
-                        now = pygame.time.get_ticks()
-                        if getattr(end_screen_loop, '_last_skip_dbg_ms', 0) + 500 < now:
-                            print(f"[INPUT-BLOCK] end_screen_loop skipping mouse (frames={_SKIP_INPUT_FRAMES})")
-                            end_screen_loop._last_skip_dbg_ms = now
-                        continue
-                except Exception:
-                    pass
-                mx, my = map_mouse_pos(event.pos)
-                if restart_rect.collidepoint(mx, my):
-                    # Return True to restart the current game mode (board will be cleared in play_one_game)
-                    return True
-                if menu_rect.collidepoint(mx, my):
-                    game_mode = None
+    # The end screen is static apart from button hover, so hover is driven by
+    # motion events here and the loop sleeps in event.wait() while nothing
+    # happens instead of redrawing at 60 Hz.
+    set_motion_events(True)
+    try:
+        dirty = True
+        last_mouse = None
+        overlay_was_active = False
+        while True:
+            mouse_pos = pygame.mouse.get_pos()
+            overlay_active = timed_overlays_active(pygame.time.get_ticks())
+            if dirty or overlay_active or overlay_was_active or mouse_pos != last_mouse:
+                restart_rect, menu_rect = display_end_options(message)
+                dirty = False
+                last_mouse = mouse_pos
+                overlay_was_active = overlay_active
+
+            events = pygame.event.get()
+            if not events and not overlay_active:
+                first = pygame.event.wait(250)
+                events = [first] + pygame.event.get() if first.type != pygame.NOEVENT else []
+            if events:
+                dirty = True
+
+            for event in events:
+                if event.type == pygame.QUIT:
+                    flush_settings(); pygame.quit(); sys.exit()
+                if event.type == pygame.MOUSEBUTTONDOWN:
                     try:
-                        force_reinit_display()
+                        if _SKIP_INPUT_FRAMES > 0:
+                            now = pygame.time.get_ticks()
+                            if getattr(end_screen_loop, '_last_skip_dbg_ms', 0) + 500 < now:
+                                print(f"[INPUT-BLOCK] end_screen_loop skipping mouse (frames={_SKIP_INPUT_FRAMES})")
+                                end_screen_loop._last_skip_dbg_ms = now
+                            continue
                     except Exception:
                         pass
-                    return False
-            if event.type == pygame.KEYDOWN:
-                if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
-                    change_volume(-0.05)
-                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
-                    change_volume(0.05)
-                # Ctrl+D toggles debug overlay
-                if (pygame.key.get_mods() & pygame.KMOD_CTRL) and event.key == pygame.K_d:
-                    DEBUG_DISPLAY_OVERLAY = not DEBUG_DISPLAY_OVERLAY
-                    continue
+                    mx, my = map_mouse_pos(event.pos)
+                    if restart_rect.collidepoint(mx, my):
+                        # Return True to restart the current game mode (board will be cleared in play_one_game)
+                        return True
+                    if menu_rect.collidepoint(mx, my):
+                        game_mode = None
+                        try:
+                            force_reinit_display()
+                        except Exception:
+                            pass
+                        return False
+                if event.type == pygame.KEYDOWN:
+                    if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                        change_volume(-0.05)
+                    elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                        change_volume(0.05)
+                    # Ctrl+D toggles debug overlay
+                    if (pygame.key.get_mods() & pygame.KMOD_CTRL) and event.key == pygame.K_d:
+                        DEBUG_DISPLAY_OVERLAY = not DEBUG_DISPLAY_OVERLAY
+                        continue
         
-        clock.tick(60)
+            clock.tick(60)
+    finally:
+        set_motion_events(False)
 
 # -------------------------
 # Main
 # -------------------------
 def main():
+    load_settings()
+    # scores and volume changes are only marked dirty as they happen; write
+    # them once on the way out, whichever exit path is taken
+    atexit.register(flush_settings)
     # Initialize pygame subsystems early. Some platforms require calling
     # pygame.init() before initializing the mixer or creating surfaces.
     try:
         pygame.init()
     except Exception:
         pass
-    # Try to initialize the mixer; if it fails we'll continue without audio.
+    # pygame.init() also opens the audio device; close it again and let
+    # init_sounds() reopen it (with AUDIO_BUFFER) only if there are sounds.
     try:
-        pygame.mixer.init()
-    except Exception as e:
-        print(f"[WARN] pygame.mixer.init() failed: {e}; continuing without audio.")
+        pygame.mixer.quit()
+    except Exception:
+        pass
 
-    load_settings()
     init_sounds()
+    # prime the hard AI for the saved board size so the first move of a session
+    # doesn't pay for the opening search: 3x3 gets its full answer table
+    try:
+        new_board()
+        if BOARD_ROWS == 3:
+            precompute_best_moves()
+        else:
+            minimax(0, 0, True)
+    except Exception as e:
+        print(f"[WARN] AI warm-up failed: {e}")
     # Try to initialize a real display mode now that we're running.
     # This may fail in headless/CI environments; fall back to the headless Surface setup.
     global display_initialized
@@ -4028,22 +4550,11 @@ def main():
     except Exception:
         display_initialized = False
     # Perform an immediate atomic startup redraw to avoid a black window on some
-    # platforms/compositors. Clear the physical display a few times, render the
-    # menu to the logical surface, then manual-blit+flip to the physical display
-    # so the user sees the menu immediately.
+    # platforms/compositors. Clear the physical display, render the menu to the
+    # logical surface, then manual-blit+flip to the physical display so the
+    # user sees the menu immediately.
     try:
-        ds_start = pygame.display.get_surface()
-        if ds_start is not None:
-            try:
-                for _ in range(3):
-                    ds_start.fill(BG_COLOR)
-                    pygame.display.flip()
-                    try:
-                        pygame.time.delay(20)
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+        blank_display(3)
         # redraw menu onto logical surface without presenting via present()
         try:
             draw_menu_with_shape_choices(globals().get('X_SHAPE', None), globals().get('O_SHAPE', None), {}, do_present=False)
@@ -4067,39 +4578,30 @@ def main():
             present()
         except Exception:
             pass
-        try:
-            pygame.time.delay(40)
-        except Exception:
-            pass
-    except Exception:
-        pass
-    # apply volumes to sounds & music
-    try:
-        for s in SOUNDS.values():
-            if s: s.set_volume(EFFECT_VOLUME)
-    except Exception:
-        pass
-    try:
-        pygame.mixer.music.set_volume(MUSIC_VOLUME)
+        if _ENABLE_COMPOSITOR_NUDGE:
+            try:
+                pygame.time.delay(_BLANK_DELAY_MS)
+            except Exception:
+                pass
     except Exception:
         pass
+    # apply music volume (effect volume is applied per play in play_sound)
+    apply_music_volume()
     # attempt to start bgm loop if loaded
     try:
         start_bgm(loop=True)
     except Exception:
         pass
+    restrict_event_queue()
 
-    global game_mode, running
     while True:
         if game_mode is None:
             # menu_loop is a placeholder; use reset_board() which contains the
             # interactive menu implementation (handles shape pickers and options)
             reset_board()
-        restart_same = play_one_game()
-        if restart_same:
-            continue
-        else:
-            continue
+        # play_one_game's return value only says how the game ended; either way
+        # the loop goes round again and the menu runs if game_mode was cleared
+        play_one_game()
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,277 @@
 """Small pure helpers for game logic used by tests.
 Keep side-effect free so tests can import this module without initializing pygame.
 """
+from itertools import product
 from typing import Tuple
 
 def has_unsaved_shape_changes(saved_x: str, saved_o: str, preview_x: str, preview_o: str) -> bool:
     """Return True if preview shapes differ from saved shapes."""
     return (saved_x != preview_x) or (saved_o != preview_o)
+
+
+# -------------------------
+# Bitboard minimax core
+# -------------------------
+# Boards are two ints (X bits, O bits) with cell (r, c) at bit r*cols + c.
+# Everything here is pure integer work so it can be memoized freely and
+# exercised without pygame.
+
+# Terminal score for a win; depth is subtracted so quicker wins (and slower
+# losses) are preferred. Must stay well above any heuristic_score() result.
+AI_WIN_SCORE = 100
+
+# Transposition-table entry kinds: the stored score is exact, or only a lower /
+# upper bound because the search that produced it was cut off by the window.
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+
+def heuristic_score(x_bits: int, o_bits: int, win_masks: Tuple[int, ...], win_len: int) -> float:
+    """Estimate a non-terminal position for O (positive is good for O)."""
+    score = 0
+    for m in win_masks:
+        o_count = bin(o_bits & m).count("1")
+        x_count = bin(x_bits & m).count("1")
+        empty = win_len - o_count - x_count
+
+        # Line with only O's and empty spaces is an opportunity
+        if o_count > 0 and x_count == 0:
+            if o_count == win_len - 1 and empty == 1:
+                score += 0.5  # One move from winning
+            elif o_count == win_len - 2 and empty == 2:
+                score += 0.2  # Two moves from winning
+            else:
+                score += 0.05 * o_count
+
+        # Line with only X's and empty spaces is a threat
+        elif x_count > 0 and o_count == 0:
+            if x_count == win_len - 1 and empty == 1:
+                score -= 0.5  # Opponent one move from winning
+            elif x_count == win_len - 2 and empty == 2:
+                score -= 0.2  # Opponent two moves from winning
+            else:
+                score -= 0.05 * x_count
+
+    return score
+
+
+def move_order(rows: int, cols: int) -> Tuple[int, ...]:
+    """Cell bits ordered best-first for alpha-beta: center(s), corners, then the rest.
+
+    For 3x3 this is bits (4, 0, 2, 6, 8, 1, 3, 5, 7).
+    """
+    corners = {(0, 0), (0, cols - 1), (rows - 1, 0), (rows - 1, cols - 1)}
+
+    def priority(i):
+        r, c = divmod(i, cols)
+        # distance from the board center, doubled to stay in integers
+        dist = abs(2 * r - (rows - 1)) + abs(2 * c - (cols - 1))
+        if dist <= 1 or (rows % 2 == 0 and dist <= 2):
+            return 0
+        return 1 if (r, c) in corners else 2
+
+    return tuple(1 << i for i in sorted(range(rows * cols), key=priority))
+
+
+def make_minimax(win_masks: Tuple[int, ...], full_mask: int, win_len: int,
+                 order: Tuple[int, ...] = (), cache_size: int = 1 << 18):
+    """Return a memoized alpha-beta search bound to one board geometry.
+
+    The returned function has the signature
+    ``search(x_bits, o_bits, is_maximizing, alpha, beta, depth, max_depth)``
+    with O as the maximizing side. Children are tried in ``order`` (cell bits,
+    see move_order()); an empty order means ascending bit order.
+
+    The search runs on an explicit stack instead of recursing, so a deep
+    search costs list operations rather than Python frames. Results are kept
+    in a per-geometry transposition table keyed on the position, side to move,
+    depth and depth limit, each stored as an exact score or a lower/upper bound
+    so it can settle later searches of the same node under any alpha-beta
+    window. The table is cleared when it reaches ``cache_size`` entries, and
+    switching board size never reuses stale results.
+    """
+    if not order:
+        order = tuple(1 << i for i in range(full_mask.bit_length()))
+    n_moves = len(order)
+    table = {}
+    # A child position is only a new win through a line containing the cell
+    # just played, so children test the few masks through that cell for the
+    # side that moved instead of every mask for both sides.
+    masks_through = {bit: tuple(m for m in win_masks if m & bit) for bit in order}
+
+    # heuristic_score() split into per-line lookup tables: for each mask, every
+    # X/O filling of its cells packed into one int (x | o << shift) maps to that
+    # line's term, so a depth-limited leaf costs one dict lookup per line
+    # instead of two bin().count() string conversions.
+    shift = full_mask.bit_length()
+    line_tables = []
+    for m in win_masks:
+        cells = [1 << i for i in range(shift) if m >> i & 1]
+        terms = {}
+        for fill in product((0, 1, 2), repeat=len(cells)):
+            xb = sum(c for c, v in zip(cells, fill) if v == 1)
+            ob = sum(c for c, v in zip(cells, fill) if v == 2)
+            terms[xb | ob << shift] = heuristic_score(xb, ob, (m,), win_len)
+        line_tables.append((m, terms))
+
+    def heuristic(x_bits, o_bits):
+        """heuristic_score() for this geometry, via the line tables."""
+        score = 0
+        for m, terms in line_tables:
+            score += terms[(x_bits & m) | (o_bits & m) << shift]
+        return score
+
+    def leaf_value(x_bits, o_bits, depth, max_depth):
+        """Score a position without expanding it, or None if it must be searched."""
+        for m in win_masks:
+            if o_bits & m == m:
+                return AI_WIN_SCORE - depth
+            if x_bits & m == m:
+                return depth - AI_WIN_SCORE
+        if (x_bits | o_bits) == full_mask:
+            return 0
+        # Depth limit reached: use heuristic evaluation
+        if depth >= max_depth:
+            return heuristic(x_bits, o_bits)
+        return None
+
+    def child_value(x_bits, o_bits, bit, o_moved, depth, max_depth):
+        """leaf_value() for a child of a non-terminal position reached by playing bit."""
+        if o_moved:
+            for m in masks_through[bit]:
+                if o_bits & m == m:
+                    return AI_WIN_SCORE - depth
+        else:
+            for m in masks_through[bit]:
+                if x_bits & m == m:
+                    return depth - AI_WIN_SCORE
+        if (x_bits | o_bits) == full_mask:
+            return 0
+        if depth >= max_depth:
+            return heuristic(x_bits, o_bits)
+        return None
+
+    def probe(key, alpha, beta):
+        """Score stored for key that settles a node searched with (alpha, beta), else None."""
+        entry = table.get(key)
+        if entry is None:
+            return None
+        flag, value = entry
+        if flag == _EXACT or (flag == _LOWER and value >= beta) or (flag == _UPPER and value <= alpha):
+            return value
+        return None
+
+    def store(key, best, alpha0, beta0):
+        # fail-soft result: outside the node's original window it is only a bound
+        if best <= alpha0:
+            table[key] = (_UPPER, best)
+        elif best >= beta0:
+            table[key] = (_LOWER, best)
+        else:
+            table[key] = (_EXACT, best)
+
+    def search(x_bits, o_bits, is_maximizing, alpha, beta, depth, max_depth):
+        key = (x_bits, o_bits, is_maximizing, depth, max_depth)
+        value = probe(key, alpha, beta)
+        if value is not None:
+            return value
+        value = leaf_value(x_bits, o_bits, depth, max_depth)
+        if value is not None:
+            return value
+        if len(table) >= cache_size:
+            table.clear()
+
+        # frame: [x_bits, o_bits, is_max, alpha, beta, depth, best, next move index,
+        #         key, alpha at entry, beta at entry]
+        stack = [[x_bits, o_bits, is_maximizing, alpha, beta, depth,
+                  -999 if is_maximizing else 999, 0, key, alpha, beta]]
+        ret = None
+        while stack:
+            f = stack[-1]
+            xb, ob, is_max, a, b, d, best, idx, fkey = f[:9]
+            if ret is not None:
+                # a child just finished: fold its score into this frame
+                if is_max:
+                    if ret > best:
+                        best = ret
+                    if best > a:
+                        a = best
+                else:
+                    if ret < best:
+                        best = ret
+                    if best < b:
+                        b = best
+                ret = None
+                f[3] = a; f[4] = b; f[6] = best
+                if b <= a:
+                    idx = n_moves  # cutoff
+            occupied = xb | ob
+            while idx < n_moves and order[idx] & occupied:
+                idx += 1
+            if idx >= n_moves:
+                store(fkey, best, f[9], f[10])
+                stack.pop()
+                ret = best
+                continue
+            bit = order[idx]
+            f[7] = idx + 1
+            if is_max:
+                cx, co = xb, ob | bit
+            else:
+                cx, co = xb | bit, ob
+            ckey = (cx, co, not is_max, d + 1, max_depth)
+            value = probe(ckey, a, b)
+            if value is None:
+                value = child_value(cx, co, bit, is_max, d + 1, max_depth)
+            if value is not None:
+                ret = value
+            else:
+                stack.append([cx, co, not is_max, a, b, d + 1,
+                              999 if is_max else -999, 0, ckey, a, b])
+        return ret
+
+    return search
+
+
+# -------------------------
+# Board symmetries
+# -------------------------
+def symmetry_permutations(n: int) -> Tuple[Tuple[int, ...], ...]:
+    """Return the 8 symmetries of an n x n board as bit-index permutations.
+
+    Entry ``perm[i]`` is where cell i (= r*n + c) lands under that rotation or
+    reflection. The identity is always first.
+    """
+    perms = []
+    for transform in (
+        lambda r, c: (r, c),
+        lambda r, c: (c, n - 1 - r),
+        lambda r, c: (n - 1 - r, n - 1 - c),
+        lambda r, c: (n - 1 - c, r),
+        lambda r, c: (r, n - 1 - c),
+        lambda r, c: (n - 1 - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (n - 1 - c, n - 1 - r),
+    ):
+        perm = []
+        for i in range(n * n):
+            tr, tc = transform(*divmod(i, n))
+            perm.append(tr * n + tc)
+        perms.append(tuple(perm))
+    return tuple(perms)
+
+
+def permute_bits(bits: int, perm: Tuple[int, ...]) -> int:
+    """Apply a cell permutation from symmetry_permutations() to a bitboard."""
+    out = 0
+    i = 0
+    while bits:
+        if bits & 1:
+            out |= 1 << perm[i]
+        bits >>= 1
+        i += 1
+    return out
+
+
+def canonical_position(x_bits: int, o_bits: int, perms: Tuple[Tuple[int, ...], ...]) -> Tuple[int, int]:
+    """Smallest (x_bits, o_bits) over all board symmetries; equal for equivalent positions."""
+    return min((permute_bits(x_bits, p), permute_bits(o_bits, p)) for p in perms)